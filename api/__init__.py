@@ -1,22 +1,30 @@
 from flask import Flask
 from flask_cors import CORS
 from .middleware import resolve_tenant
+from .instrumentation import start_request, finish_request
+from .fanout import start_deadline
 
 def create_app():
     app = Flask(__name__)
-    CORS(app)
+    CORS(app, expose_headers=["X-Next-Cursor", "X-Total-Count"])
 
-    # Tenant resolver
+    # Tenant resolver (skipped for routes whose policy needs no tenant)
     @app.before_request
     def before():
-        resolve_tenant()
+        start_request()
+        # Auth and tenant resolution count against the request deadline too
+        start_deadline()
+        return resolve_tenant()
+
+    # Server-Timing header, request log line and round-trip budget check
+    app.after_request(finish_request)
 
     # Tenant endpoint
     @app.route("/api/tenant", methods=["GET"])
     def get_tenant():
         from flask import g, jsonify
-        if hasattr(g, 'client_data') and g.client_data:
-            return jsonify(g.client_data)
+        if g.tenant:
+            return jsonify(g.tenant.to_dict())
         else:
             return jsonify({"error": "Tenant not found"}), 404
 
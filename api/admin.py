@@ -1,41 +1,25 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .fanout import gather, DeadlineExceeded
+from .loader import load_related
+from .principal import require_principal
+from .pagination import Page, InvalidPageRequest, iter_rows
+from .fields import ACTIVITY_LOG_FIELDS, InvalidFields
 from datetime import datetime, timedelta
 import uuid
 
 admin_bp = Blueprint("admin", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access(module_name):
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if module_name not in g.modules:
-        return jsonify({"error": f"Module '{module_name}' is not enabled for this tenant"}), 403
-        
-    return None
-
 # Middleware to check if user has admin role
 def require_admin_role():
-    auth_header = request.headers.get("Authorization")
-    
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Missing or invalid authorization header"}), 401
-        
-    token = auth_header.split(" ")[1]
-    
     try:
-        # Verify token and get user
-        user = supabase.auth.get_user(token)
-        
-        if not user:
-            return jsonify({"error": "Invalid token"}), 401
-            
-        # Get user profile
-        profile = supabase.table("user_profiles").select("*") \
-                .eq("auth_user_id", user.user.id).single().execute()
+        # Token and profile are resolved once per request and shared
+        principal, auth_error = require_principal()
+        if auth_error:
+            return auth_error
                 
-        if not profile.data or profile.data["role"] != "admin":
+        if not principal.profile or principal.role != "admin":
             return jsonify({"error": "Unauthorized - Admin access required"}), 403
             
         return None
@@ -59,41 +43,30 @@ def get_admin_metrics():
         # Get today's date
         today = datetime.now().strftime("%Y-%m-%d")
         
-        # Get today's revenue from completed invoices
-        revenue_query = supabase.table("invoices") \
-                      .select("paid_amount") \
-                      .eq("client_id", g.tenant_id) \
-                      .eq("status", "paid") \
-                      .gte("paid_at", f"{today}T00:00:00") \
-                      .execute()
+        # Today's collections (from the daily billing rollups), today's
+        # appointments, active staff and low inventory items, fetched concurrently
+        revenue_query, appointments_query, staff_query, inventory_query = gather(
+            db.table("billing_daily_rollups") \
+              .select("collected") \
+              .eq("client_id", g.tenant_id) \
+              .eq("day", today),
+            db.table("appointments") \
+              .select("id") \
+              .eq("client_id", g.tenant_id) \
+              .eq("date", today),
+            db.table("staff") \
+              .select("id") \
+              .eq("client_id", g.tenant_id) \
+              .eq("status", "active"),
+            db.table("products") \
+              .select("id") \
+              .eq("client_id", g.tenant_id) \
+              .filter("current_stock", "lte", "min_stock_level")
+        )
                       
-        revenue_today = sum([invoice.get("paid_amount", 0) for invoice in revenue_query.data])
-        
-        # Get today's appointments
-        appointments_query = supabase.table("appointments") \
-                           .select("id") \
-                           .eq("client_id", g.tenant_id) \
-                           .eq("date", today) \
-                           .execute()
-                           
+        revenue_today = sum([rollup["collected"] for rollup in revenue_query.data])
         total_appointments = len(appointments_query.data)
-        
-        # Get active staff
-        staff_query = supabase.table("staff") \
-                    .select("id") \
-                    .eq("client_id", g.tenant_id) \
-                    .eq("status", "active") \
-                    .execute()
-                    
         active_staff = len(staff_query.data)
-        
-        # Get low inventory items
-        inventory_query = supabase.table("products") \
-                        .select("id") \
-                        .eq("client_id", g.tenant_id) \
-                        .filter("current_stock", "lte", "min_stock_level") \
-                        .execute()
-                        
         low_inventory = len(inventory_query.data)
         
         # Calculate changes (mock data for now)
@@ -110,6 +83,8 @@ def get_admin_metrics():
         }
         
         return jsonify(metrics), 200
+    except DeadlineExceeded as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -133,33 +108,46 @@ def get_revenue_report():
         department = request.args.get("department")
         branch = request.args.get("branch")
         
-        # Build query
-        query = supabase.table("invoices").select("*").eq("client_id", g.tenant_id)
-        
-        if date_from and date_to:
-            query = query.gte("created_at", date_from).lte("created_at", date_to)
+        # Read the daily billing rollups: O(days) rows, not O(invoices)
+        def rollups():
+            # Rows with only collections (invoices paid that day) have no invoices
+            query = db.table("billing_daily_rollups") \
+                      .select("day, invoiced") \
+                      .eq("client_id", g.tenant_id) \
+                      .gt("invoice_count", 0)
+            
+            if date_from and date_to:
+                query = query.gte("day", date_from[:10]).lte("day", date_to[:10])
+            return query
+            
+        def patients():
+            query = db.table("billing_daily_patients").select("day").eq("client_id", g.tenant_id)
+            
+            if date_from and date_to:
+                query = query.gte("day", date_from[:10]).lte("day", date_to[:10])
+            return query
             
-        # Execute query
-        result = query.execute()
-        
         # Process data for report
         report = []
         
         # Group by date
         dates = {}
-        for invoice in result.data:
-            date = invoice["created_at"].split("T")[0]
-            if date not in dates:
-                dates[date] = {
+        for rollup in iter_rows(rollups, prefetch=True, order=("day", "doctor_id", "payment_mode")):
+            if rollup["day"] not in dates:
+                dates[rollup["day"]] = {
                     "revenue": 0,
-                    "patients": set(),
+                    "patients": 0,
                 }
-            dates[date]["revenue"] += invoice["total_amount"]
-            dates[date]["patients"].add(invoice["patient_id"])
+            dates[rollup["day"]]["revenue"] += rollup["invoiced"]
+            
+        # One row per patient invoiced that day
+        for patient in iter_rows(patients, prefetch=True, order=("day", "patient_id")):
+            if patient["day"] in dates:
+                dates[patient["day"]]["patients"] += 1
             
         # Format report
         for date, data in dates.items():
-            patients_count = len(data["patients"])
+            patients_count = data["patients"]
             avg_bill = data["revenue"] / patients_count if patients_count > 0 else 0
             
             report.append({
@@ -194,7 +182,7 @@ def get_performance_report():
         role = request.args.get("role")
         
         # Build query
-        query = supabase.table("staff").select("*").eq("client_id", g.tenant_id)
+        query = db.table("staff").select("id, name").eq("client_id", g.tenant_id)
         
         if role and role != "all":
             query = query.eq("role", role)
@@ -202,39 +190,29 @@ def get_performance_report():
         # Execute query
         staff_result = query.execute()
         
-        # Get appointments and treatments for each staff
+        staff_ids = [staff["id"] for staff in staff_result.data]
+        
+        # Appointments, shifts and treatments for all staff at once, grouped
+        # by staff id (one query per table rather than three per staff)
+        appointments, shifts, procedures = gather(
+            lambda: load_related("appointments", "doctor_id", staff_ids, "doctor_id, patient_id"),
+            lambda: load_related("shifts", "staff_id", staff_ids, "staff_id, start_time, end_time", status="completed"),
+            lambda: load_related("treatment_records", "performed_by_id", staff_ids, "id, performed_by_id")
+        )
+        
         report = []
         for staff in staff_result.data:
             # Get patient count
-            patients_query = supabase.table("appointments") \
-                           .select("patient_id") \
-                           .eq("client_id", g.tenant_id) \
-                           .eq("doctor_id", staff["id"]) \
-                           .execute()
-                           
-            unique_patients = set([apt["patient_id"] for apt in patients_query.data])
+            unique_patients = set([apt["patient_id"] for apt in appointments[staff["id"]]])
             
             # Get hours worked (from shifts)
-            hours_query = supabase.table("shifts") \
-                        .select("*") \
-                        .eq("client_id", g.tenant_id) \
-                        .eq("staff_id", staff["id"]) \
-                        .eq("status", "completed") \
-                        .execute()
-                        
             total_hours = sum([
                 (datetime.fromisoformat(shift["end_time"]) - datetime.fromisoformat(shift["start_time"])).total_seconds() / 3600
-                for shift in hours_query.data
+                for shift in shifts[staff["id"]]
             ])
             
             # Get procedures count
-            procedures_query = supabase.table("treatment_records") \
-                             .select("id") \
-                             .eq("client_id", g.tenant_id) \
-                             .eq("performed_by_id", staff["id"]) \
-                             .execute()
-                             
-            procedures_count = len(procedures_query.data)
+            procedures_count = len(procedures[staff["id"]])
             
             # Get rating (mock data for now)
             rating = 4.5 + (hash(staff["id"]) % 5) / 10  # Random rating between 4.5 and 5.0
@@ -248,6 +226,8 @@ def get_performance_report():
             })
             
         return jsonify(report), 200
+    except DeadlineExceeded as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -266,13 +246,13 @@ def get_inventory_report():
         
     try:
         # Get products with low stock
-        products_query = supabase.table("products") \
-                       .select("*") \
+        products_query = db.table("products") \
+                       .select("id, name, current_stock, min_stock_level") \
                        .eq("client_id", g.tenant_id) \
                        .execute()
                        
         # Get usage logs
-        logs_query = supabase.table("inventory_logs") \
+        logs_query = db.table("inventory_logs") \
                    .select("product_id, quantity") \
                    .eq("client_id", g.tenant_id) \
                    .eq("type", "stock-out") \
@@ -315,15 +295,13 @@ def get_crm_report():
         return role_error
         
     try:
-        # Get leads
-        leads_query = supabase.table("leads") \
-                    .select("status") \
-                    .eq("client_id", g.tenant_id) \
-                    .execute()
-                    
-        # Count leads by status
-        leads = leads_query.data
-        total_leads = len(leads)
+        # Lead counts grouped by status and source, computed in the database
+        counts = db.rpc("crm_lead_counts", {
+            "p_client_id": g.tenant_id,
+            "p_follow_up_before": (datetime.now() - timedelta(days=1)).isoformat()
+        }).execute()
+        
+        total_leads = 0
         
         # Count by status
         status_counts = {
@@ -333,10 +311,10 @@ def get_crm_report():
             "converted": 0
         }
         
-        for lead in leads:
-            status = lead["status"]
-            if status in status_counts:
-                status_counts[status] += 1
+        for group in counts.data:
+            total_leads += group["leads"]
+            if group["status"] in status_counts:
+                status_counts[group["status"]] += group["leads"]
                 
         # Calculate conversion rates
         report = []
@@ -393,6 +371,9 @@ def get_activity_logs():
         return role_error
         
     try:
+        page = Page.from_request()
+        columns = ACTIVITY_LOG_FIELDS.from_request("id", "timestamp")
+        
         # Get filter parameters
         date_filter = request.args.get("date", "all")
         role_filter = request.args.get("role")
@@ -400,7 +381,7 @@ def get_activity_logs():
         search = request.args.get("search")
         
         # Build query
-        query = supabase.table("activity_logs").select("*").eq("client_id", g.tenant_id)
+        query = db.table("activity_logs").select(columns, count=page.count).eq("client_id", g.tenant_id)
         
         # Apply date filter
         if date_filter != "all":
@@ -428,12 +409,12 @@ def get_activity_logs():
         if search:
             query = query.or_(f"user.ilike.%{search}%,module.ilike.%{search}%,action.ilike.%{search}%,ip_address.ilike.%{search}%")
             
-        # Order by timestamp (newest first)
-        query = query.order("timestamp", desc=True)
-        
-        result = query.execute()
+        # Order by timestamp (newest first), one page at a time
+        result = page.apply(query, "timestamp", desc=True).execute()
         
-        return jsonify(result.data), 200
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1,5 +1,10 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import supabase, db
+from .principal import (require_principal, cache_profile, build_user_payload,
+                        user_payload_cache, PROFILE_SELECT)
+from .tokens import forget_token
+from .instrumentation import track
+from .reference import invalidate_references
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -10,37 +15,28 @@ def login():
     
     try:
         # Authenticate with Supabase Auth
-        result = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        with track("auth", "sign_in"):
+            result = supabase.auth.sign_in_with_password({"email": email, "password": password})
         
         if not result.user:
             return jsonify({"error": "Invalid credentials"}), 401
             
-        # Get user profile with role and client information
-        profile = supabase.table("user_profiles").select("*") \
+        # Get user profile together with its client in one embedded select
+        profile = db.table("user_profiles").select(PROFILE_SELECT) \
                 .eq("auth_user_id", result.user.id).single().execute()
                 
         if not profile.data:
             return jsonify({"error": "User profile not found"}), 404
             
-        # Get client information and enabled modules
-        client = None
-        if profile.data.get("client_id"):
-            client_result = supabase.table("clients").select("*") \
-                        .eq("id", profile.data["client_id"]).single().execute()
-            client = client_result.data
+        # Prime the caches used by /me and the role guards
+        cache_profile(profile.data)
+        user = build_user_payload(profile.data, email)
+        user_payload_cache.set(result.user.id, user)
             
         return {
             "access_token": result.session.access_token,
             "refresh_token": result.session.refresh_token,
-            "user": {
-                "id": profile.data["id"],
-                "auth_user_id": profile.data["auth_user_id"],
-                "name": profile.data["name"],
-                "email": email,
-                "role": profile.data["role"],
-                "client_id": profile.data.get("client_id"),
-                "client": client
-            }
+            "user": user
         }, 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -55,10 +51,11 @@ def signup():
     
     try:
         # Create user in Supabase Auth
-        auth_result = supabase.auth.sign_up({
-            "email": email,
-            "password": password
-        })
+        with track("auth", "sign_up"):
+            auth_result = supabase.auth.sign_up({
+                "email": email,
+                "password": password
+            })
         
         if not auth_result.user:
             return jsonify({"error": "Failed to create user"}), 400
@@ -75,7 +72,9 @@ def signup():
         if client_id:
             profile_data["client_id"] = client_id
             
-        profile_result = supabase.table("user_profiles").insert(profile_data).execute()
+        profile_result = db.table("user_profiles").insert(profile_data).execute()
+        if client_id:
+            invalidate_references(client_id)
         
         return {
             "message": "User created successfully",
@@ -89,7 +88,8 @@ def refresh_token():
     refresh_token = request.json.get("refresh_token")
     
     try:
-        result = supabase.auth.refresh_session(refresh_token)
+        with track("auth", "refresh"):
+            result = supabase.auth.refresh_session(refresh_token)
         return {
             "access_token": result.session.access_token,
             "refresh_token": result.session.refresh_token
@@ -99,45 +99,25 @@ def refresh_token():
 
 @auth_bp.route("/me", methods=["GET"])
 def get_current_user():
-    auth_header = request.headers.get("Authorization")
-    
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Missing or invalid authorization header"}), 401
-        
-    token = auth_header.split(" ")[1]
-    
     try:
-        # Verify token and get user
-        user = supabase.auth.get_user(token)
-        
-        if not user:
-            return jsonify({"error": "Invalid token"}), 401
+        # Verify token and get the request's principal
+        principal, auth_error = require_principal()
+        if auth_error:
+            return auth_error
             
-        # Get user profile
-        profile = supabase.table("user_profiles").select("*") \
-                .eq("auth_user_id", user.user.id).single().execute()
+        # Serve the composed payload from cache when this user was seen recently
+        user = user_payload_cache.get(principal.auth_user_id)
+        if user is None:
+            # Profile and client come from one embedded select
+            profile = principal.profile
+                    
+            if not profile:
+                return jsonify({"error": "User profile not found"}), 404
                 
-        if not profile.data:
-            return jsonify({"error": "User profile not found"}), 404
-            
-        # Get client information
-        client = None
-        if profile.data.get("client_id"):
-            client_result = supabase.table("clients").select("*") \
-                        .eq("id", profile.data["client_id"]).single().execute()
-            client = client_result.data
+            user = build_user_payload(profile, principal.email)
+            user_payload_cache.set(principal.auth_user_id, user)
             
-        return {
-            "user": {
-                "id": profile.data["id"],
-                "auth_user_id": profile.data["auth_user_id"],
-                "name": profile.data["name"],
-                "email": user.user.email,
-                "role": profile.data["role"],
-                "client_id": profile.data.get("client_id"),
-                "client": client
-            }
-        }, 200
+        return {"user": user}, 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -151,7 +131,9 @@ def logout():
     token = auth_header.split(" ")[1]
     
     try:
-        supabase.auth.sign_out(token)
+        forget_token(token)
+        with track("auth", "sign_out"):
+            supabase.auth.sign_out(token)
         return {"message": "Logged out successfully"}, 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
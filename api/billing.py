@@ -1,20 +1,14 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .pagination import Page, InvalidPageRequest
+from .fields import INVOICE_FIELDS, InvalidFields
+import click
 import uuid
 from datetime import datetime
 
 billing_bp = Blueprint("billing", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "billing" not in g.modules:
-        return jsonify({"error": "Billing module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get all invoices
 @billing_bp.route("/billing/invoices", methods=["GET"])
 def get_invoices():
@@ -24,31 +18,38 @@ def get_invoices():
         return module_error
         
     try:
-        # Apply filters if provided
-        query = supabase.table("invoices").select("*").eq("client_id", g.tenant_id)
+        page = Page.from_request()
+        columns = INVOICE_FIELDS.from_request("id", "created_at")
         
-        status = request.args.get("status")
-        if status and status != "all":
-            query = query.eq("status", status)
-            
-        payment_mode = request.args.get("payment_mode")
-        if payment_mode and payment_mode != "all":
-            query = query.eq("payment_mode", payment_mode)
+        # Filters from the query string; rebuilt per chunk when streaming
+        def invoices():
+            query = db.table("invoices").select(columns, count=page.count).eq("client_id", g.tenant_id)
+        
+            status = request.args.get("status")
+            if status and status != "all":
+                query = query.eq("status", status)
             
-        doctor = request.args.get("doctor")
-        if doctor and doctor != "all":
-            query = query.eq("doctor_name", doctor)
+            payment_mode = request.args.get("payment_mode")
+            if payment_mode and payment_mode != "all":
+                query = query.eq("payment_mode", payment_mode)
             
-        search = request.args.get("search")
-        if search:
-            query = query.or_(f"invoice_number.ilike.%{search}%,patient_name.ilike.%{search}%,doctor_name.ilike.%{search}%")
+            doctor = request.args.get("doctor")
+            if doctor and doctor != "all":
+                query = query.eq("doctor_name", doctor)
             
-        # Order by creation date (newest first)
-        query = query.order("created_at", desc=True)
-        
-        result = query.execute()
-        
-        return jsonify(result.data), 200
+            search = request.args.get("search")
+            if search:
+                query = query.or_(f"invoice_number.ilike.%{search}%,patient_name.ilike.%{search}%,doctor_name.ilike.%{search}%")
+            return query
+        
+        # Order by created_at (newest first): streamed in full, or one page at a time
+        if page.stream:
+            return page.stream_response(invoices, "created_at", desc=True)
+        result = page.apply(invoices(), "created_at", desc=True).execute()
+        
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -61,7 +62,7 @@ def get_invoice_details(invoice_id):
         return module_error
         
     try:
-        result = supabase.table("invoices").select("*").eq("id", invoice_id).eq("client_id", g.tenant_id).single().execute()
+        result = db.table("invoices").select("*").eq("id", invoice_id).eq("client_id", g.tenant_id).single().execute()
         
         if not result.data:
             return jsonify({"error": "Invoice not found"}), 404
@@ -105,7 +106,7 @@ def create_invoice():
         }
         
         # Insert invoice
-        result = supabase.table("invoices").insert(invoice_data).execute()
+        result = db.table("invoices").insert(invoice_data).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -123,7 +124,7 @@ def mark_as_paid(invoice_id):
         payment_data = request.json
         
         # Get current invoice
-        invoice = supabase.table("invoices").select("*").eq("id", invoice_id).eq("client_id", g.tenant_id).single().execute()
+        invoice = db.table("invoices").select("*").eq("id", invoice_id).eq("client_id", g.tenant_id).single().execute()
         
         if not invoice.data:
             return jsonify({"error": "Invoice not found"}), 404
@@ -149,7 +150,7 @@ def mark_as_paid(invoice_id):
         if new_status == "paid":
             update_data["paid_at"] = now
             
-        invoice_result = supabase.table("invoices").update(update_data).eq("id", invoice_id).execute()
+        invoice_result = db.table("invoices").update(update_data).eq("id", invoice_id).execute()
         
         # Add payment record
         payment_record = {
@@ -163,7 +164,7 @@ def mark_as_paid(invoice_id):
             "notes": payment_data.get("notes")
         }
         
-        supabase.table("payments").insert(payment_record).execute()
+        db.table("payments").insert(payment_record).execute()
         
         return jsonify(invoice_result.data[0]), 200
     except Exception as e:
@@ -181,7 +182,7 @@ def refund_invoice(invoice_id):
         refund_data = request.json
         
         # Get current invoice
-        invoice = supabase.table("invoices").select("*").eq("id", invoice_id).eq("client_id", g.tenant_id).single().execute()
+        invoice = db.table("invoices").select("*").eq("id", invoice_id).eq("client_id", g.tenant_id).single().execute()
         
         if not invoice.data:
             return jsonify({"error": "Invoice not found"}), 404
@@ -196,7 +197,7 @@ def refund_invoice(invoice_id):
             "updated_at": now
         }
         
-        result = supabase.table("invoices").update(update_data).eq("id", invoice_id).execute()
+        result = db.table("invoices").update(update_data).eq("id", invoice_id).execute()
         
         return jsonify(result.data[0]), 200
     except Exception as e:
@@ -214,57 +215,13 @@ def get_billing_stats():
         # Get today's date
         today = datetime.now().strftime("%Y-%m-%d")
         
-        # Get today's invoices
-        today_invoices_query = supabase.table("invoices") \
-                             .select("*") \
-                             .eq("client_id", g.tenant_id) \
-                             .gte("created_at", f"{today}T00:00:00") \
-                             .execute()
-                             
-        today_invoices = today_invoices_query.data
-        
-        # Get all invoices
-        all_invoices_query = supabase.table("invoices") \
-                           .select("*") \
-                           .eq("client_id", g.tenant_id) \
-                           .execute()
-                           
-        all_invoices = all_invoices_query.data
-        
-        # Calculate stats
-        today_revenue = sum([
-            invoice["paid_amount"] for invoice in today_invoices 
-            if invoice["status"] == "paid"
-        ])
-        
-        invoices_generated = len(today_invoices)
-        
-        pending_payments = sum([
-            invoice["balance_amount"] for invoice in all_invoices 
-            if invoice["status"] in ["sent", "partially-paid", "overdue"]
-        ])
-        
-        refunded_today = sum([
-            invoice.get("refund_amount", 0) for invoice in today_invoices 
-            if invoice["status"] == "refunded" and invoice.get("refunded_at", "").startswith(today)
-        ])
-        
-        total_revenue = sum([
-            invoice["paid_amount"] for invoice in all_invoices 
-            if invoice["status"] == "paid"
-        ])
-        
-        paid_invoices = [invoice for invoice in all_invoices if invoice["status"] == "paid"]
-        average_invoice_value = total_revenue / len(paid_invoices) if paid_invoices else 0
-        
-        stats = {
-            "todayRevenue": today_revenue,
-            "invoicesGenerated": invoices_generated,
-            "pendingPayments": pending_payments,
-            "refundedToday": refunded_today,
-            "totalRevenue": total_revenue,
-            "averageInvoiceValue": average_invoice_value
-        }
+        # Today's and all-time totals in one aggregate query (see the
+        # billing_stats migration)
+        result = db.rpc("billing_stats", {
+            "p_client_id": g.tenant_id,
+            "p_day_start": f"{today}T00:00:00"
+        }).execute()
+        stats = result.data
         
         return jsonify(stats), 200
     except Exception as e:
@@ -294,4 +251,12 @@ def get_procedures():
         
         return jsonify(procedures), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+# Rebuild the daily billing rollups (flask billing rebuild-rollups)
+@billing_bp.cli.command("rebuild-rollups")
+@click.option("--client-id", default=None, help="Only rebuild this client's rollups")
+def rebuild_rollups(client_id):
+    """Recompute billing_daily_rollups from the invoices table"""
+    result = db.rpc("rebuild_billing_rollups", {"p_client_id": client_id}).execute()
+    click.echo(f"Rebuilt {result.data} rollup rows")
@@ -1,20 +1,15 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .principal import current_user_name
+from .pagination import Page, InvalidPageRequest
+from .fields import LEAD_FIELDS, InvalidFields
+from .reference import reference_response
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
 crm_bp = Blueprint("crm", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "crm" not in g.modules:
-        return jsonify({"error": "CRM module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get all leads
 @crm_bp.route("/crm/leads", methods=["GET"])
 def get_leads():
@@ -24,8 +19,11 @@ def get_leads():
         return module_error
         
     try:
+        page = Page.from_request()
+        columns = LEAD_FIELDS.from_request("id", "created_at")
+        
         # Apply filters if provided
-        query = supabase.table("leads").select("*").eq("client_id", g.tenant_id)
+        query = db.table("leads").select(columns, count=page.count).eq("client_id", g.tenant_id)
         
         status = request.args.get("status")
         if status and status != "all":
@@ -49,12 +47,12 @@ def get_leads():
         if search:
             query = query.or_(f"full_name.ilike.%{search}%,mobile.ilike.%{search}%,email.ilike.%{search}%")
             
-        # Order by creation date (newest first)
-        query = query.order("created_at", desc=True)
-        
-        result = query.execute()
+        # Order by created_at (newest first), one page at a time
+        result = page.apply(query, "created_at", desc=True).execute()
         
-        return jsonify(result.data), 200
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -91,19 +89,19 @@ def add_lead():
                     "notes": f"Lead created from {lead_data.get('source')}"
                 }
             ],
-            "notes_history": lead_data.get("notes") ? [
+            "notes_history": [
                 {
                     "id": str(uuid.uuid4()),
                     "note": lead_data.get("notes"),
                     "added_by": lead_data.get("assigned_to"),
                     "added_at": now
                 }
-            ] : [],
+            ] if lead_data.get("notes") else [],
             **lead_data
         }
         
         # Insert lead
-        result = supabase.table("leads").insert(new_lead).execute()
+        result = db.table("leads").insert(new_lead).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -118,7 +116,7 @@ def get_lead(lead_id):
         return module_error
         
     try:
-        result = supabase.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
+        result = db.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
         
         if not result.data:
             return jsonify({"error": "Lead not found"}), 404
@@ -143,7 +141,7 @@ def update_lead_status(lead_id):
             return jsonify({"error": "Status is required"}), 400
             
         # Get current lead
-        lead = supabase.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
+        lead = db.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
         
         if not lead.data:
             return jsonify({"error": "Lead not found"}), 404
@@ -153,7 +151,7 @@ def update_lead_status(lead_id):
         status_entry = {
             "id": str(uuid.uuid4()),
             "status": status,
-            "changed_by": "Current User",  # In a real app, get from auth context
+            "changed_by": current_user_name(),
             "changed_at": now,
             "notes": notes
         }
@@ -172,7 +170,7 @@ def update_lead_status(lead_id):
         if status == "converted":
             update_data["converted_at"] = now
             
-        result = supabase.table("leads").update(update_data).eq("id", lead_id).execute()
+        result = db.table("leads").update(update_data).eq("id", lead_id).execute()
         
         return jsonify(result.data[0]), 200
     except Exception as e:
@@ -193,7 +191,7 @@ def add_lead_note(lead_id):
             return jsonify({"error": "Note is required"}), 400
             
         # Get current lead
-        lead = supabase.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
+        lead = db.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
         
         if not lead.data:
             return jsonify({"error": "Lead not found"}), 404
@@ -203,7 +201,7 @@ def add_lead_note(lead_id):
         note_entry = {
             "id": str(uuid.uuid4()),
             "note": note,
-            "added_by": "Current User",  # In a real app, get from auth context
+            "added_by": current_user_name(),
             "added_at": now
         }
         
@@ -211,7 +209,7 @@ def add_lead_note(lead_id):
         notes_history = lead.data.get("notes_history", [])
         notes_history.append(note_entry)
         
-        result = supabase.table("leads").update({
+        result = db.table("leads").update({
             "updated_at": now,
             "notes_history": notes_history
         }).eq("id", lead_id).execute()
@@ -230,7 +228,7 @@ def convert_lead(lead_id):
         
     try:
         # Get current lead
-        lead = supabase.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
+        lead = db.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
         
         if not lead.data:
             return jsonify({"error": "Lead not found"}), 404
@@ -242,7 +240,7 @@ def convert_lead(lead_id):
         status_entry = {
             "id": str(uuid.uuid4()),
             "status": "converted",
-            "changed_by": "Current User",  # In a real app, get from auth context
+            "changed_by": current_user_name(),
             "changed_at": now,
             "notes": "Lead converted to patient"
         }
@@ -250,7 +248,7 @@ def convert_lead(lead_id):
         status_history = lead.data.get("status_history", [])
         status_history.append(status_entry)
         
-        lead_result = supabase.table("leads").update({
+        lead_result = db.table("leads").update({
             "status": "converted",
             "updated_at": now,
             "converted_at": now,
@@ -269,11 +267,11 @@ def convert_lead(lead_id):
             "mobile": lead.data["mobile"],
             "email": lead.data.get("email"),
             "converted_at": now,
-            "converted_by": "Current User",  # In a real app, get from auth context
+            "converted_by": current_user_name(),
             "source": lead.data["source"]
         }
         
-        converted_result = supabase.table("converted_leads").insert(converted_lead).execute()
+        converted_result = db.table("converted_leads").insert(converted_lead).execute()
         
         return jsonify(converted_result.data[0]), 200
     except Exception as e:
@@ -294,7 +292,7 @@ def drop_lead(lead_id):
             return jsonify({"error": "Reason is required"}), 400
             
         # Get current lead
-        lead = supabase.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
+        lead = db.table("leads").select("*").eq("id", lead_id).eq("client_id", g.tenant_id).single().execute()
         
         if not lead.data:
             return jsonify({"error": "Lead not found"}), 404
@@ -306,7 +304,7 @@ def drop_lead(lead_id):
         status_entry = {
             "id": str(uuid.uuid4()),
             "status": "dropped",
-            "changed_by": "Current User",  # In a real app, get from auth context
+            "changed_by": current_user_name(),
             "changed_at": now,
             "notes": f"Lead dropped: {reason}"
         }
@@ -314,7 +312,7 @@ def drop_lead(lead_id):
         status_history = lead.data.get("status_history", [])
         status_history.append(status_entry)
         
-        result = supabase.table("leads").update({
+        result = db.table("leads").update({
             "status": "dropped",
             "updated_at": now,
             "drop_reason": reason,
@@ -334,7 +332,7 @@ def get_converted_leads():
         return module_error
         
     try:
-        result = supabase.table("converted_leads").select("*").eq("client_id", g.tenant_id).order("converted_at", desc=True).execute()
+        result = db.table("converted_leads").select("*").eq("client_id", g.tenant_id).order("converted_at", desc=True).execute()
         
         return jsonify(result.data), 200
     except Exception as e:
@@ -349,28 +347,33 @@ def get_crm_stats():
         return module_error
         
     try:
-        # Get all leads
-        leads_query = supabase.table("leads").select("*").eq("client_id", g.tenant_id).execute()
-        leads = leads_query.data
-        
-        # Get converted leads
-        converted_leads_query = supabase.table("converted_leads").select("*").eq("client_id", g.tenant_id).execute()
-        
-        # Calculate stats
-        total_leads = len(leads)
-        converted = len([lead for lead in leads if lead["status"] == "converted"])
-        new_leads = len([lead for lead in leads if lead["status"] == "new"])
-        contacted_leads = len([lead for lead in leads if lead["status"] == "contacted"])
-        consulted_leads = len([lead for lead in leads if lead["status"] == "consulted"])
-        dropped_leads = len([lead for lead in leads if lead["status"] == "dropped"])
-        whatsapp_leads = len([lead for lead in leads if lead["source"] == "whatsapp"])
-        
-        # Calculate follow-ups due today (contacted leads that haven't been updated in 24 hours)
+        # Lead counts grouped by status and source, computed in the
+        # database (see the crm_lead_counts migration)
         one_day_ago = (datetime.now() - timedelta(days=1)).isoformat()
-        follow_ups_due = len([
-            lead for lead in leads 
-            if lead["status"] == "contacted" and lead["updated_at"] < one_day_ago
-        ])
+        counts = db.rpc("crm_lead_counts", {
+            "p_client_id": g.tenant_id,
+            "p_follow_up_before": one_day_ago
+        }).execute()
+        
+        statuses = {"converted": 0, "new": 0, "contacted": 0, "consulted": 0, "dropped": 0}
+        total_leads = 0
+        whatsapp_leads = 0
+        # Follow-ups due today: contacted leads that haven't been updated in 24 hours
+        follow_ups_due = 0
+        
+        for group in counts.data:
+            total_leads += group["leads"]
+            if group["status"] in statuses:
+                statuses[group["status"]] += group["leads"]
+            if group["source"] == "whatsapp":
+                whatsapp_leads += group["leads"]
+            follow_ups_due += group["follow_ups_due"]
+        
+        converted = statuses["converted"]
+        new_leads = statuses["new"]
+        contacted_leads = statuses["contacted"]
+        consulted_leads = statuses["consulted"]
+        dropped_leads = statuses["dropped"]
         
         conversion_rate = round((converted / total_leads) * 100) if total_leads > 0 else 0
         
@@ -399,14 +402,7 @@ def get_crm_users():
         return module_error
         
     try:
-        # Get users with CRM-related roles
-        query = supabase.table("user_profiles") \
-              .select("id, name, role") \
-              .eq("client_id", g.tenant_id) \
-              .in_("role", ["crm_manager", "lead_specialist", "customer_success", "sales_representative"]) \
-              .eq("is_active", True) \
-              .execute()
-              
-        return jsonify(query.data), 200
+        # Get users with CRM-related roles (cached per tenant, revalidated by ETag)
+        return reference_response("crm_users")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Data-access layer used by the blueprints instead of calling the Supabase
+client directly. Database.table() / Database.rpc() hand out builders from
+the configured backend (Supabase/PostgREST, or the in-process SQLite
+stand-in) wrapped in Query, which records the chain so execution has one
+place to hook into.
+"""
+from .instrumentation import record_query
+from .resilience import call, IDEMPOTENT_ACTIONS
+import time
+
+class Query:
+    """
+    Thin wrapper around a backend request builder. Chained calls are
+    forwarded to the builder and recorded in .ops as (method, args).
+    """
+    __slots__ = ("builder", "table_name", "ops")
+
+    def __init__(self, builder, table_name, ops=()):
+        self.builder = builder
+        self.table_name = table_name
+        self.ops = ops
+
+    def __getattr__(self, name):
+        method = getattr(self.builder, name)
+
+        def call(*args, **kwargs):
+            builder = method(*args, **kwargs)
+            return Query(builder, self.table_name, self.ops + ((name, args),))
+        return call
+
+    def or_(self, filters, reference_table=None):
+        # Older postgrest-py releases have no or_(); PostgREST itself takes
+        # the same logic tree as an "or" query parameter
+        if hasattr(self.builder, "or_"):
+            builder = self.builder.or_(filters, reference_table=reference_table)
+        else:
+            key = f"{reference_table}.or" if reference_table else "or"
+            self.builder.params = self.builder.params.add(key, f"({filters})")
+            builder = self.builder
+        return Query(builder, self.table_name, self.ops + (("or_", (filters,)),))
+
+    def order_by(self, *columns, desc=False):
+        # postgrest-py adds one "order" parameter per .order() call, and
+        # PostgREST reads only one of them; a multi-column sort has to be a
+        # single comma-separated list
+        if hasattr(self.builder, "params"):
+            direction = "desc" if desc else "asc"
+            order = ",".join(f"{column}.{direction}" for column in columns)
+            self.builder.params = self.builder.params.add("order", order)
+            builder = self.builder
+        else:
+            builder = self.builder
+            for column in columns:
+                builder = builder.order(column, desc=desc)
+        return Query(builder, self.table_name, self.ops + (("order", columns),))
+
+    @property
+    def action(self):
+        # First recorded call is the verb: select / insert / update / ...
+        return self.ops[0][0] if self.ops else "select"
+
+    def execute(self):
+        # Reads are retried on transient failures; every call goes through
+        # the table's circuit breaker and respects the request deadline.
+        # Retries of one execute() are recorded as one round-trip.
+        attempts = 0
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1
+            return self.builder.execute()
+
+        started = time.perf_counter()
+        try:
+            result = call(self.table_name, attempt, idempotent=self.action in IDEMPOTENT_ACTIONS)
+        except Exception as e:
+            # Nothing reached the upstream if the breaker or deadline refused it
+            if attempts:
+                record_query(self, time.perf_counter() - started, error=e, attempts=attempts)
+            raise
+        record_query(self, time.perf_counter() - started, result, attempts=attempts)
+        return result
+
+class Database:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def table(self, name):
+        return Query(self.backend.table(name), name)
+
+    def rpc(self, name, params=None):
+        return Query(self.backend.rpc(name, params or {}), name, (("rpc", ()),))
@@ -1,20 +1,14 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .fanout import gather, DeadlineExceeded
+from .principal import current_user_name
+from .reference import reference_response
 import uuid
 from datetime import datetime
 
 doctor_bp = Blueprint("doctor", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "doctor" not in g.modules:
-        return jsonify({"error": "Doctor module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get doctor appointments
 @doctor_bp.route("/doctor/appointments", methods=["GET"])
 def get_doctor_appointments():
@@ -25,7 +19,7 @@ def get_doctor_appointments():
         
     try:
         # Apply filters if provided
-        query = supabase.table("appointments").select("*").eq("client_id", g.tenant_id)
+        query = db.table("appointments").select("*").eq("client_id", g.tenant_id)
         
         status = request.args.get("status")
         if status and status != "all":
@@ -54,24 +48,24 @@ def get_patient_details(patient_id):
         return module_error
         
     try:
-        # Get patient
-        patient = supabase.table("patients").select("*").eq("id", patient_id).eq("client_id", g.tenant_id).single().execute()
+        # Patient, visit history and SOAP notes are fetched concurrently
+        patient, treatment_history, soap_notes = gather(
+            db.table("patients").select("*").eq("id", patient_id).eq("client_id", g.tenant_id).single(),
+            db.table("treatment_records").select("*").eq("patient_id", patient_id).eq("client_id", g.tenant_id),
+            db.table("soap_notes").select("*").eq("patient_id", patient_id).eq("client_id", g.tenant_id)
+        )
         
         if not patient.data:
             return jsonify({"error": "Patient not found"}), 404
             
-        # Get patient's visit history
-        treatment_history = supabase.table("treatment_records").select("*").eq("patient_id", patient_id).eq("client_id", g.tenant_id).execute()
-        
-        # Get SOAP notes
-        soap_notes = supabase.table("soap_notes").select("*").eq("patient_id", patient_id).eq("client_id", g.tenant_id).execute()
-        
         # Combine data
         patient_data = patient.data
         patient_data["visit_history"] = treatment_history.data
         patient_data["soap_notes"] = soap_notes.data
         
         return jsonify(patient_data), 200
+    except DeadlineExceeded as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -103,7 +97,7 @@ def submit_soap_note():
         }
         
         # Insert SOAP note
-        result = supabase.table("soap_notes").insert(soap_note).execute()
+        result = db.table("soap_notes").insert(soap_note).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -133,7 +127,7 @@ def assign_technician():
         }
         
         # Insert assignment
-        result = supabase.table("technician_assignments").insert(assignment).execute()
+        result = db.table("technician_assignments").insert(assignment).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -176,11 +170,11 @@ def upload_photo():
             "file_name": file_name,
             "file_size": file_size,
             "uploaded_at": datetime.now().isoformat(),
-            "uploaded_by": "Dr. Sarah Johnson"  # In a real app, get from auth context
+            "uploaded_by": current_user_name("Dr. Sarah Johnson")
         }
         
         # Insert photo record
-        result = supabase.table("patient_photos").insert(photo).execute()
+        result = db.table("patient_photos").insert(photo).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -196,7 +190,7 @@ def get_treatment_history():
         
     try:
         # Apply filters if provided
-        query = supabase.table("treatment_records").select("*").eq("client_id", g.tenant_id)
+        query = db.table("treatment_records").select("*").eq("client_id", g.tenant_id)
         
         patient_id = request.args.get("patientId")
         if patient_id:
@@ -228,15 +222,8 @@ def get_technicians():
         return module_error
         
     try:
-        # Get technicians
-        query = supabase.table("staff") \
-              .select("id, name, specialization, available") \
-              .eq("client_id", g.tenant_id) \
-              .eq("role", "technician") \
-              .eq("available", True) \
-              .execute()
-              
-        return jsonify(query.data), 200
+        # Get technicians (cached per tenant, revalidated by ETag)
+        return reference_response("technicians")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -278,24 +265,19 @@ def get_doctor_stats():
         # Get today's date
         today = datetime.now().strftime("%Y-%m-%d")
         
-        # Get today's appointments
-        appointments_query = supabase.table("appointments") \
-                           .select("*") \
-                           .eq("client_id", g.tenant_id) \
-                           .eq("date", today) \
-                           .execute()
-                           
-        # Get patients
-        patients_query = supabase.table("patients") \
-                       .select("id") \
-                       .eq("client_id", g.tenant_id) \
-                       .execute()
-                       
-        # Get treatment records
-        treatments_query = supabase.table("treatment_records") \
-                         .select("*") \
-                         .eq("client_id", g.tenant_id) \
-                         .execute()
+        # Today's appointments, patients and treatment records, fetched concurrently
+        appointments_query, patients_query, treatments_query = gather(
+            db.table("appointments") \
+              .select("status") \
+              .eq("client_id", g.tenant_id) \
+              .eq("date", today),
+            db.table("patients") \
+              .select("id") \
+              .eq("client_id", g.tenant_id),
+            db.table("treatment_records") \
+              .select("id") \
+              .eq("client_id", g.tenant_id)
+        )
                          
         # Calculate stats
         today_appointments = len(appointments_query.data)
@@ -311,6 +293,8 @@ def get_doctor_stats():
         }
         
         return jsonify(stats), 200
+    except DeadlineExceeded as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -329,7 +313,7 @@ def update_appointment_status(appointment_id):
             return jsonify({"error": "Status is required"}), 400
             
         # Update appointment
-        result = supabase.table("appointments").update({
+        result = db.table("appointments").update({
             "status": status
         }).eq("id", appointment_id).eq("client_id", g.tenant_id).execute()
         
@@ -1,9 +1,104 @@
-from supabase import create_client, Client
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
+from supabase._sync.auth_client import SyncSupabaseAuthClient
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient as PostgrestHTTPClient
+from gotrue.http_clients import SyncClient as AuthHTTPClient
+from .db import Database
+from .http_pool import PooledTransport, timeout as http_timeout
 import os
+import threading
+
+class PooledClient(Client):
+    """
+    Supabase client whose PostgREST and GoTrue traffic goes through this
+    process's pooled transports. The client rebuilds its PostgREST client
+    on auth events; the transport (and its open connections) survives that.
+    """
+
+    def __init__(self, supabase_url, supabase_key, options=None):
+        self._transports = {"rest": PooledTransport("rest"), "auth": PooledTransport("auth")}
+        super().__init__(supabase_url, supabase_key, options or ClientOptions())
+
+    def _init_supabase_auth_client(self, auth_url, client_options):
+        return SyncSupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=client_options.auto_refresh_token,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            flow_type=client_options.flow_type,
+            http_client=AuthHTTPClient(transport=self._transports["auth"], timeout=http_timeout())
+        )
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=None):
+        client = SyncPostgrestClient(rest_url, headers=headers, schema=schema)
+        default_session = client.session
+        client.session = PostgrestHTTPClient(
+            base_url=rest_url,
+            headers=client.session.headers,
+            transport=self._transports["rest"],
+            timeout=http_timeout()
+        )
+        default_session.close()
+        return client
 
 def init_supabase() -> Client:
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_KEY")
-    return create_client(url, key)
+    return PooledClient.create(url, key, ClientOptions())
+
+# The client (and its sockets) belongs to the process that built it. It is
+# created lazily on first use, so gunicorn --preload never builds it in the
+# master, and dropped in forked children so each worker opens its own pool.
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def get_supabase() -> Client:
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = init_supabase()
+                _client_pid = os.getpid()
+    return _client
+
+def _reset_after_fork():
+    # Don't close the inherited client: its sockets are still the parent's
+    global _client, _client_pid, _client_lock
+    _client = None
+    _client_pid = None
+    _client_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def pool_stats():
+    # Connection pool utilization for this worker, or None before first use
+    if _client is None or _client_pid != os.getpid():
+        return None
+    return {name: transport.stats() for name, transport in _client._transports.items()}
+
+class _SupabaseProxy:
+    """Module-level stand-in that forwards to this process's client"""
+
+    def __getattr__(self, name):
+        return getattr(get_supabase(), name)
+
+def init_db(client) -> Database:
+    # DATA_BACKEND=sqlite serves table reads/writes from an in-process SQLite
+    # database built from supabase/migrations (auth still goes to Supabase)
+    backend = os.getenv("DATA_BACKEND", "supabase").lower()
+
+    if backend == "sqlite":
+        from .sqlite_backend import SQLiteBackend
+        max_rows = os.getenv("SQLITE_MAX_ROWS")
+        return Database(SQLiteBackend(os.getenv("SQLITE_PATH", ":memory:"), max_rows=int(max_rows) if max_rows else None))
+
+    if backend != "supabase":
+        raise ValueError(f"Unknown DATA_BACKEND: {backend}")
+
+    return Database(client)
 
-supabase = init_supabase()
\ No newline at end of file
+supabase = _SupabaseProxy()
+db = init_db(supabase)
@@ -0,0 +1,99 @@
+"""
+Run independent queries of one request concurrently.
+
+    staff, documents = gather(
+        db.table("staff").select("*").eq("id", staff_id),
+        db.table("staff_documents").select("*").eq("staff_id", staff_id)
+    )
+
+Work runs on a bounded per-process thread pool, inside a copy of the
+caller's context so flask.g / request stay available. Results come back
+in argument order; the first error is re-raised, and nothing waits past
+the request deadline.
+"""
+from flask import g, has_request_context
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+import contextvars
+import os
+import time
+
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "32"))
+
+# Seconds a request may take, counted from before_request
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "10"))
+
+_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+# Set inside pool threads; nested gather() calls run inline there instead
+# of queueing behind (and possibly waiting on) their own parents
+_in_worker = contextvars.ContextVar("fanout_in_worker", default=False)
+
+class DeadlineExceeded(Exception):
+    pass
+
+def _reset_after_fork():
+    # Pool threads don't survive fork; give the child a fresh pool
+    global _pool
+    _pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def start_deadline():
+    """Start the current request's REQUEST_DEADLINE clock (before_request)"""
+    g.deadline = time.monotonic() + REQUEST_DEADLINE
+
+def deadline():
+    """Monotonic time by which the current request must be done, or None"""
+    if not has_request_context():
+        return None
+    return g.get("deadline")
+
+def remaining():
+    """Seconds left before the request deadline (None outside a request)"""
+    limit = deadline()
+    if limit is None:
+        return None
+    return limit - time.monotonic()
+
+def _run(fn, args, kwargs):
+    _in_worker.set(True)
+    return fn(*args, **kwargs)
+
+def submit(fn, *args, **kwargs):
+    """Schedule fn on the fan-out pool with the caller's context"""
+    context = contextvars.copy_context()
+    return _pool.submit(context.run, _run, fn, args, kwargs)
+
+def _callable(task):
+    # Queries are executed; anything else is called
+    return task.execute if hasattr(task, "execute") else task
+
+def gather(*tasks):
+    """
+    Run tasks (queries or zero-argument callables) concurrently and return
+    their results in order. Raises the first task error, or
+    DeadlineExceeded if the request deadline passes first.
+    """
+    calls = [_callable(task) for task in tasks]
+
+    if len(calls) < 2 or _in_worker.get():
+        return [call() for call in calls]
+
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+    futures = [submit(call) for call in calls]
+    done, pending = wait(futures, timeout=left, return_when=FIRST_EXCEPTION)
+
+    for future in pending:
+        future.cancel()
+
+    for future in futures:
+        if future in done and future.exception() is not None:
+            raise future.exception()
+
+    if pending:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+    return [future.result() for future in futures]
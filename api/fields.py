@@ -0,0 +1,101 @@
+"""
+Column projections for read endpoints.
+
+Each list endpoint has a Projection: the columns a caller may ask for and
+a lean default that leaves out wide or embedded-JSON columns (invoice
+procedures, lead histories, ...). Callers pick columns with
+?fields=a,b,c; unknown names are rejected with InvalidFields.
+"""
+from flask import request
+
+class InvalidFields(ValueError):
+    pass
+
+class Projection:
+    __slots__ = ("columns", "default")
+
+    def __init__(self, columns, exclude=()):
+        self.columns = tuple(c.strip() for c in columns.split(","))
+        self.default = tuple(c for c in self.columns if c not in exclude)
+
+    def from_request(self, *required):
+        """
+        Select string for ?fields= (or the lean default). Columns in
+        required, e.g. the id and sort key pagination relies on, are
+        always included.
+        """
+        fields = request.args.get("fields")
+        if not fields:
+            selected = list(self.default)
+        else:
+            selected = []
+            for field in fields.split(","):
+                field = field.strip()
+                if not field:
+                    continue
+                if field not in self.columns:
+                    raise InvalidFields(f"Unknown field '{field}'. Allowed fields: {', '.join(self.columns)}")
+                if field not in selected:
+                    selected.append(field)
+
+        for field in required:
+            if field not in selected:
+                selected.append(field)
+
+        return ", ".join(selected)
+
+INVOICE_FIELDS = Projection(
+    "id, client_id, invoice_number, patient_id, patient_name, patient_phone, doctor_id, doctor_name, "
+    "session_id, procedures, subtotal, tax_rate, tax_amount, discount_rate, discount_amount, "
+    "total_amount, paid_amount, balance_amount, payment_mode, status, notes, created_at, updated_at, "
+    "due_date, paid_at, refunded_at, refund_amount, refund_reason",
+    exclude=("procedures",)
+)
+
+LEAD_FIELDS = Projection(
+    "id, client_id, full_name, mobile, email, source, status, assigned_to, assigned_to_id, notes, "
+    "created_at, updated_at, converted_at, drop_reason, status_history, notes_history",
+    exclude=("status_history", "notes_history")
+)
+
+PRODUCT_FIELDS = Projection(
+    "id, client_id, name, category, batch_number, vendor, cost_price, selling_price, current_stock, "
+    "min_stock_level, max_stock_level, unit, expiry_date, manufacturing_date, location, description, "
+    "is_active, created_at, updated_at, last_used, auto_deduct_enabled, treatment_types",
+    exclude=("description",)
+)
+
+INVENTORY_LOG_FIELDS = Projection(
+    "id, client_id, product_id, product_name, type, quantity, previous_stock, new_stock, reason, "
+    "treatment_id, patient_name, performed_by, created_at, notes"
+)
+
+PHOTO_FIELDS = Projection(
+    "id, client_id, patient_id, patient_name, session_id, session_date, type, image_url, "
+    "thumbnail_url, uploaded_by, uploaded_at, notes, doctor_id, doctor_name"
+)
+
+SESSION_HISTORY_FIELDS = Projection(
+    "id, client_id, patient_id, patient_name, procedure, duration, assigned_by, date, start_time, "
+    "end_time, status, notes"
+)
+
+ACTIVITY_LOG_FIELDS = Projection(
+    "id, client_id, timestamp, username, user_role, module, action, action_type, ip_address, details"
+)
+
+SYSTEM_LOG_FIELDS = Projection(
+    "id, timestamp, client_id, client_name, type, action, details, ip_address"
+)
+
+USAGE_LOG_FIELDS = Projection(
+    "id, client_id, client_name, timestamp, endpoint, method, response_time, status_code, "
+    "user_agent, ip_address",
+    exclude=("user_agent",)
+)
+
+STAFF_FIELDS = Projection(
+    "id, client_id, name, role, department, branch, email, phone, join_date, status, avatar, "
+    "personal_details, employment_details",
+    exclude=("personal_details", "employment_details")
+)
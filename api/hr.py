@@ -1,20 +1,15 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .fanout import gather, DeadlineExceeded
+from .principal import current_user_name
+from .fields import STAFF_FIELDS, InvalidFields
+from .reference import load_reference, invalidate_references
 import uuid
 from datetime import datetime, timedelta
 
 hr_bp = Blueprint("hr", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "hr" not in g.modules:
-        return jsonify({"error": "HR module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get all staff
 @hr_bp.route("/hr/staff", methods=["GET"])
 def get_all_staff():
@@ -24,8 +19,11 @@ def get_all_staff():
         return module_error
         
     try:
+        # Lean columns unless ?fields= asks for more
+        columns = STAFF_FIELDS.from_request("id")
+        
         # Apply filters if provided
-        query = supabase.table("staff").select("*").eq("client_id", g.tenant_id)
+        query = db.table("staff").select(columns).eq("client_id", g.tenant_id)
         
         branch = request.args.get("branch")
         if branch and branch != "all":
@@ -49,6 +47,8 @@ def get_all_staff():
         result = query.execute()
         
         return jsonify(result.data), 200
+    except InvalidFields as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -61,24 +61,19 @@ def get_staff_details(staff_id):
         return module_error
         
     try:
-        # Get staff
-        staff = supabase.table("staff").select("*").eq("id", staff_id).eq("client_id", g.tenant_id).single().execute()
+        # Staff, documents, shifts, performance notes and salary structure
+        # are independent lookups, so fetch them concurrently
+        staff, documents, shifts, performance, salary = gather(
+            db.table("staff").select("*").eq("id", staff_id).eq("client_id", g.tenant_id).single(),
+            db.table("staff_documents").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id),
+            db.table("shifts").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id),
+            db.table("performance_notes").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id),
+            db.table("salary_structures").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id).single()
+        )
         
         if not staff.data:
             return jsonify({"error": "Staff member not found"}), 404
             
-        # Get documents
-        documents = supabase.table("staff_documents").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id).execute()
-        
-        # Get shifts
-        shifts = supabase.table("shifts").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id).execute()
-        
-        # Get performance notes
-        performance = supabase.table("performance_notes").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id).execute()
-        
-        # Get salary structure
-        salary = supabase.table("salary_structures").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id).single().execute()
-        
         # Combine data
         staff_data = staff.data
         staff_data["documents"] = documents.data
@@ -87,6 +82,8 @@ def get_staff_details(staff_id):
         staff_data["salary"] = salary.data
         
         return jsonify(staff_data), 200
+    except DeadlineExceeded as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -112,7 +109,8 @@ def add_staff():
         }
         
         # Insert staff
-        result = supabase.table("staff").insert(new_staff).execute()
+        result = db.table("staff").insert(new_staff).execute()
+        invalidate_references(g.tenant_id)
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -130,10 +128,11 @@ def update_staff(staff_id):
         staff_data = request.json
         
         # Update staff
-        result = supabase.table("staff").update(staff_data).eq("id", staff_id).eq("client_id", g.tenant_id).execute()
+        result = db.table("staff").update(staff_data).eq("id", staff_id).eq("client_id", g.tenant_id).execute()
         
         if not result.data:
             return jsonify({"error": "Staff member not found"}), 404
+        invalidate_references(g.tenant_id)
             
         return jsonify(result.data[0]), 200
     except Exception as e:
@@ -182,7 +181,7 @@ def upload_staff_document(staff_id):
         }
         
         # Insert document record
-        result = supabase.table("staff_documents").insert(document).execute()
+        result = db.table("staff_documents").insert(document).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -202,7 +201,7 @@ def get_attendance_log(staff_id):
         year = request.args.get("year")
         
         # Build query
-        query = supabase.table("attendance").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id)
+        query = db.table("attendance").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id)
         
         # Filter by month and year if provided
         if month and year:
@@ -230,7 +229,7 @@ def log_performance(staff_id):
         performance_data = request.json
         
         # Check if staff exists
-        staff = supabase.table("staff").select("id").eq("id", staff_id).eq("client_id", g.tenant_id).single().execute()
+        staff = db.table("staff").select("id").eq("id", staff_id).eq("client_id", g.tenant_id).single().execute()
         
         if not staff.data:
             return jsonify({"error": "Staff member not found"}), 404
@@ -243,12 +242,12 @@ def log_performance(staff_id):
             "id": note_id,
             "client_id": g.tenant_id,
             "staff_id": staff_id,
-            "added_by": "Current User",  # In a real app, get from auth context
+            "added_by": current_user_name(),
             **performance_data
         }
         
         # Insert performance note
-        result = supabase.table("performance_notes").insert(note).execute()
+        result = db.table("performance_notes").insert(note).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -263,43 +262,41 @@ def get_hr_stats():
         return module_error
         
     try:
-        # Get staff
-        staff_query = supabase.table("staff").select("*").eq("client_id", g.tenant_id).execute()
-        staff = staff_query.data
-        
-        # Get today's attendance
-        today = datetime.now().strftime("%Y-%m-%d")
-        attendance_query = supabase.table("attendance").select("*").eq("client_id", g.tenant_id).eq("date", today).execute()
-        
-        # Calculate stats
-        total_staff = len(staff)
+        # Staff counts by department and branch, with this month's joins,
+        # cached per tenant until staff is next written
+        current_month = datetime.now().strftime("%Y-%m")
+        headcount = load_reference("headcount").data
+        if headcount["month"] != current_month:
+            # Counted last month: its new joins are not this month's
+            invalidate_references(g.tenant_id, "headcount")
+            headcount = load_reference("headcount").data
         
         # Staff on leave today
-        on_leave_today = len([a for a in attendance_query.data if a["status"] == "leave"])
-        
+        today = datetime.now().strftime("%Y-%m-%d")
+        on_leave_query = db.table("attendance") \
+                       .select("id", count="exact") \
+                       .eq("client_id", g.tenant_id) \
+                       .eq("date", today) \
+                       .eq("status", "leave") \
+                       .limit(1) \
+                       .execute()
+        on_leave_today = on_leave_query.count or 0
+        
+        total_staff = 0
         # New joins this month
-        current_month = datetime.now().strftime("%Y-%m")
-        new_joins_this_month = len([s for s in staff if s["join_date"].startswith(current_month)])
+        new_joins_this_month = 0
+        department_counts = {}
+        branch_counts = {}
+        
+        for group in headcount["groups"]:
+            total_staff += group["staff"]
+            new_joins_this_month += group["new_joins"]
+            department_counts[group["department"]] = department_counts.get(group["department"], 0) + group["staff"]
+            branch_counts[group["branch"]] = branch_counts.get(group["branch"], 0) + group["staff"]
         
         # Upcoming reviews (mock data)
         upcoming_reviews = 3
         
-        # Department counts
-        department_counts = {}
-        for s in staff:
-            dept = s["department"]
-            if dept not in department_counts:
-                department_counts[dept] = 0
-            department_counts[dept] += 1
-            
-        # Branch counts
-        branch_counts = {}
-        for s in staff:
-            branch = s["branch"]
-            if branch not in branch_counts:
-                branch_counts[branch] = 0
-            branch_counts[branch] += 1
-            
         stats = {
             "totalStaff": total_staff,
             "onLeaveToday": on_leave_today,
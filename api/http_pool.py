@@ -0,0 +1,98 @@
+"""
+Pooled HTTP transports for the Supabase client.
+
+One transport per upstream (PostgREST, GoTrue) per worker process, so
+connections and TLS sessions are reused across requests instead of being
+re-established, and never shared with a parent process after fork.
+"""
+from .fanout import remaining, DeadlineExceeded
+import os
+import threading
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("SUPABASE_HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_POOL_TIMEOUT = float(os.getenv("SUPABASE_HTTP_POOL_TIMEOUT", "5"))
+
+def _http2_enabled():
+    # "auto" turns HTTP/2 on when the h2 package is installed
+    setting = os.getenv("SUPABASE_HTTP2", "auto").lower()
+    if setting in ("0", "false", "no"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+HTTP2 = _http2_enabled()
+
+def timeout():
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT)
+
+class PooledTransport(httpx.HTTPTransport):
+    """
+    httpx transport with the configured pool limits that also counts
+    requests and newly opened connections (each one a TCP + TLS handshake).
+    """
+
+    def __init__(self, name):
+        super().__init__(
+            http2=HTTP2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        self.name = name
+        self.requests = 0
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+
+        create_connection = self._pool.create_connection
+
+        def counting_create_connection(origin):
+            with self._lock:
+                self.connections_opened += 1
+            return create_connection(origin)
+
+        self._pool.create_connection = counting_create_connection
+
+    def handle_request(self, request):
+        with self._lock:
+            self.requests += 1
+
+        # No call may outlive its request: cap every timeout at the time
+        # left before the request deadline
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                raise DeadlineExceeded("Request deadline exceeded")
+            timeouts = request.extensions.get("timeout", {})
+            request.extensions["timeout"] = {
+                name: left if value is None else min(value, left)
+                for name, value in timeouts.items()
+            }
+
+        return super().handle_request(request)
+
+    def stats(self):
+        connections = list(self._pool.connections)
+        pending = list(getattr(self._pool, "_requests", ()))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections": len(connections),
+            "active": len(connections) - idle,
+            "idle": idle,
+            "in_flight": len(pending),
+            "queued": sum(1 for request in pending if request.is_queued()),
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive": HTTP_MAX_KEEPALIVE,
+            "http2": HTTP2
+        }
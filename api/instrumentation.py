@@ -0,0 +1,140 @@
+"""
+Per-request accounting of data-API round-trips.
+
+Every Query.execute() (and other upstream calls wrapped in track()) is
+recorded on flask.g with its table, operation, filtered columns, duration,
+row count and attempts (retries of one call are one round-trip).
+after_request turns that into a Server-Timing header, a structured log
+line, and a check against the endpoint's round-trip budget (see
+QUERY_BUDGETS in policies.py).
+"""
+from flask import g, request, jsonify, has_request_context
+from contextlib import contextmanager
+from collections import namedtuple
+from .policies import QUERY_BUDGETS, DEFAULT_QUERY_BUDGET
+import contextvars
+import json
+import logging
+import os
+import time
+
+# off: don't check budgets; warn: log overruns; strict: fail the request
+# with a 500 (for tests and benchmark runs)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "warn").lower()
+
+logger = logging.getLogger("api.requests")
+
+QueryRecord = namedtuple("QueryRecord", ["table", "op", "filters", "duration", "rows", "error", "exempt", "attempts"])
+
+# Filter methods whose column name is worth recording (values never are)
+FILTER_OPS = frozenset(["eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "in_", "is_", "filter", "contains", "contained_by"])
+
+# Set while loading shared per-process state (tenant, profile, ...), which
+# is cached and so not charged to the endpoint's budget
+_exempt = contextvars.ContextVar("budget_exempt", default=False)
+
+@contextmanager
+def budget_exempt():
+    token = _exempt.set(True)
+    try:
+        yield
+    finally:
+        _exempt.reset(token)
+
+def _filters(ops):
+    filters = []
+    for name, args in ops:
+        if name in FILTER_OPS and args:
+            filters.append(f"{args[0]}:{name.rstrip('_')}")
+        elif name == "or_":
+            filters.append("or")
+    return tuple(filters)
+
+def _row_count(result):
+    data = getattr(result, "data", None)
+    if isinstance(data, list):
+        return len(data)
+    return 0 if data is None else 1
+
+def record(table, op, filters=(), duration=0.0, rows=0, error=None, attempts=1):
+    if not has_request_context():
+        return
+    # Created by start_request, before any fan-out; list.append is atomic,
+    # so fanned-out threads can share the list
+    queries = g.get("queries")
+    if queries is not None:
+        queries.append(QueryRecord(table, op, filters, duration, rows, error, _exempt.get(), attempts))
+
+def record_query(query, duration, result=None, error=None, attempts=1):
+    record(
+        query.table_name,
+        query.action,
+        _filters(query.ops),
+        duration,
+        _row_count(result) if result is not None else 0,
+        type(error).__name__ if error is not None else None,
+        attempts
+    )
+
+@contextmanager
+def track(table, op):
+    """Record a non-PostgREST upstream call (e.g. GoTrue) as a round-trip"""
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record(table, op, duration=time.perf_counter() - started, error=error)
+
+def start_request():
+    g.request_started = time.perf_counter()
+    g.queries = []
+
+def _server_timing(queries, total):
+    db_time = sum(q.duration for q in queries) * 1000
+    return f'db;dur={db_time:.1f};desc="{len(queries)} calls", total;dur={total * 1000:.1f}'
+
+def budget_for(endpoint):
+    return QUERY_BUDGETS.get(endpoint, DEFAULT_QUERY_BUDGET)
+
+def finish_request(response):
+    """after_request hook: Server-Timing, log line and budget check"""
+    queries = g.get("queries", [])
+    started = g.get("request_started")
+    total = time.perf_counter() - started if started is not None else 0.0
+
+    response.headers["Server-Timing"] = _server_timing(queries, total)
+
+    charged = sum(1 for q in queries if not q.exempt)
+    budget = budget_for(request.endpoint)
+    over_budget = QUERY_BUDGET_MODE != "off" and request.endpoint is not None and charged > budget
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": round(total * 1000, 1),
+            "db_calls": len(queries),
+            "db_ms": round(sum(q.duration for q in queries) * 1000, 1),
+            "budget": budget,
+            "queries": [
+                {"table": q.table, "op": q.op, "filters": list(q.filters), "ms": round(q.duration * 1000, 1), "rows": q.rows, "error": q.error, "attempts": q.attempts}
+                for q in queries
+            ]
+        }))
+
+    if over_budget:
+        message = f"{request.endpoint} made {charged} round-trips (budget {budget})"
+        if QUERY_BUDGET_MODE == "strict":
+            failed = jsonify({"error": f"Query budget exceeded: {message}"})
+            failed.status_code = 500
+            failed.headers["Server-Timing"] = response.headers["Server-Timing"]
+            return failed
+        logger.warning("Query budget exceeded: %s", message)
+
+    return response
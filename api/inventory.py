@@ -1,20 +1,15 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .principal import current_user_name
+from .pagination import Page, InvalidPageRequest
+from .fields import PRODUCT_FIELDS, INVENTORY_LOG_FIELDS, InvalidFields
+import click
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
 inventory_bp = Blueprint("inventory", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "inventory" not in g.modules:
-        return jsonify({"error": "Inventory module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get all products
 @inventory_bp.route("/inventory/products", methods=["GET"])
 def get_products():
@@ -24,8 +19,11 @@ def get_products():
         return module_error
         
     try:
+        page = Page.from_request()
+        columns = PRODUCT_FIELDS.from_request("id", "name")
+        
         # Apply filters if provided
-        query = supabase.table("products").select("*").eq("client_id", g.tenant_id)
+        query = db.table("products").select(columns, count=page.count).eq("client_id", g.tenant_id)
         
         category = request.args.get("category")
         if category and category != "all":
@@ -50,12 +48,12 @@ def get_products():
         if search:
             query = query.or_(f"name.ilike.%{search}%,batch_number.ilike.%{search}%,vendor.ilike.%{search}%")
             
-        # Order by name
-        query = query.order("name")
-        
-        result = query.execute()
+        # Order by name (alphabetical), one page at a time
+        result = page.apply(query, "name", desc=False).execute()
         
-        return jsonify(result.data), 200
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -68,7 +66,7 @@ def get_product_details(product_id):
         return module_error
         
     try:
-        result = supabase.table("products").select("*").eq("id", product_id).eq("client_id", g.tenant_id).single().execute()
+        result = db.table("products").select("*").eq("id", product_id).eq("client_id", g.tenant_id).single().execute()
         
         if not result.data:
             return jsonify({"error": "Product not found"}), 404
@@ -93,7 +91,7 @@ def add_stock(product_id):
             return jsonify({"error": "Valid quantity is required"}), 400
             
         # Get current product
-        product = supabase.table("products").select("*").eq("id", product_id).eq("client_id", g.tenant_id).single().execute()
+        product = db.table("products").select("*").eq("id", product_id).eq("client_id", g.tenant_id).single().execute()
         
         if not product.data:
             return jsonify({"error": "Product not found"}), 404
@@ -103,7 +101,7 @@ def add_stock(product_id):
         new_stock = previous_stock + int(quantity)
         
         # Update product
-        product_result = supabase.table("products").update({
+        product_result = db.table("products").update({
             "current_stock": new_stock,
             "updated_at": datetime.now().isoformat()
         }).eq("id", product_id).execute()
@@ -120,12 +118,12 @@ def add_stock(product_id):
             "previous_stock": previous_stock,
             "new_stock": new_stock,
             "reason": "Stock added",
-            "performed_by": "Current User",  # In a real app, get from auth context
+            "performed_by": current_user_name(),
             "created_at": datetime.now().isoformat(),
             "notes": notes
         }
         
-        supabase.table("inventory_logs").insert(log).execute()
+        db.table("inventory_logs").insert(log).execute()
         
         return jsonify(product_result.data[0]), 200
     except Exception as e:
@@ -152,7 +150,7 @@ def deduct_product(product_id):
             return jsonify({"error": "Reason is required"}), 400
             
         # Get current product
-        product = supabase.table("products").select("*").eq("id", product_id).eq("client_id", g.tenant_id).single().execute()
+        product = db.table("products").select("*").eq("id", product_id).eq("client_id", g.tenant_id).single().execute()
         
         if not product.data:
             return jsonify({"error": "Product not found"}), 404
@@ -169,7 +167,7 @@ def deduct_product(product_id):
         
         # Update product
         now = datetime.now().isoformat()
-        product_result = supabase.table("products").update({
+        product_result = db.table("products").update({
             "current_stock": new_stock,
             "last_used": now,
             "updated_at": now
@@ -193,7 +191,7 @@ def deduct_product(product_id):
             "created_at": now
         }
         
-        supabase.table("inventory_logs").insert(log).execute()
+        db.table("inventory_logs").insert(log).execute()
         
         return jsonify(product_result.data[0]), 200
     except Exception as e:
@@ -226,7 +224,7 @@ def adjust_stock():
             return jsonify({"error": "Reason is required"}), 400
             
         # Get current product
-        product = supabase.table("products").select("*").eq("id", product_id).eq("client_id", g.tenant_id).single().execute()
+        product = db.table("products").select("*").eq("id", product_id).eq("client_id", g.tenant_id).single().execute()
         
         if not product.data:
             return jsonify({"error": "Product not found"}), 404
@@ -243,7 +241,7 @@ def adjust_stock():
             new_stock = previous_stock - quantity_int
             
         # Update product
-        product_result = supabase.table("products").update({
+        product_result = db.table("products").update({
             "current_stock": new_stock,
             "updated_at": datetime.now().isoformat()
         }).eq("id", product_id).execute()
@@ -260,12 +258,12 @@ def adjust_stock():
             "previous_stock": previous_stock,
             "new_stock": new_stock,
             "reason": reason,
-            "performed_by": "Current User",  # In a real app, get from auth context
+            "performed_by": current_user_name(),
             "created_at": datetime.now().isoformat(),
             "notes": notes
         }
         
-        supabase.table("inventory_logs").insert(log).execute()
+        db.table("inventory_logs").insert(log).execute()
         
         return jsonify(product_result.data[0]), 200
     except Exception as e:
@@ -280,19 +278,26 @@ def get_inventory_logs():
         return module_error
         
     try:
-        # Apply filters if provided
-        query = supabase.table("inventory_logs").select("*").eq("client_id", g.tenant_id)
-        
-        product_id = request.args.get("productId")
-        if product_id:
-            query = query.eq("product_id", product_id)
-            
-        # Order by creation date (newest first)
-        query = query.order("created_at", desc=True)
-        
-        result = query.execute()
-        
-        return jsonify(result.data), 200
+        page = Page.from_request()
+        columns = INVENTORY_LOG_FIELDS.from_request("id", "created_at")
+        
+        # Filters from the query string; rebuilt per chunk when streaming
+        def inventory_logs():
+            query = db.table("inventory_logs").select(columns, count=page.count).eq("client_id", g.tenant_id)
+        
+            product_id = request.args.get("productId")
+            if product_id:
+                query = query.eq("product_id", product_id)
+            return query
+        
+        # Order by created_at (newest first): streamed in full, or one page at a time
+        if page.stream:
+            return page.stream_response(inventory_logs, "created_at", desc=True)
+        result = page.apply(inventory_logs(), "created_at", desc=True).execute()
+        
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -305,54 +310,18 @@ def get_inventory_stats():
         return module_error
         
     try:
-        # Get products
-        products_query = supabase.table("products").select("*").eq("client_id", g.tenant_id).execute()
-        products = products_query.data
-        
-        # Get logs
-        logs_query = supabase.table("inventory_logs").select("*").eq("client_id", g.tenant_id).execute()
-        logs = logs_query.data
-        
-        # Calculate stats
-        total_products = len([p for p in products if p["is_active"]])
-        
-        low_stock_alerts = len([
-            p for p in products 
-            if p["is_active"] and p["current_stock"] <= p["min_stock_level"]
-        ])
-        
+        # Read from the inventory summary the triggers maintain (see the
+        # inventory_summary migration), whatever the log volume
+        today = datetime.now().strftime("%Y-%m-%d")
         # Products expiring in next 30 days
         thirty_days_from_now = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d")
-        expiring_soon = len([
-            p for p in products 
-            if p["is_active"] and p.get("expiry_date") and p["expiry_date"] <= thirty_days_from_now
-        ])
         
-        # Auto-deductions today
-        today = datetime.now().strftime("%Y-%m-%d")
-        auto_deduct_today = len([
-            log for log in logs 
-            if log["type"] == "auto-deduct" and log["created_at"].startswith(today)
-        ])
-        
-        # Calculate total value
-        total_value = sum([
-            p["current_stock"] * p["cost_price"] 
-            for p in products if p["is_active"]
-        ])
-        
-        # Count unique categories
-        categories = set([p["category"] for p in products if p["is_active"]])
-        categories_count = len(categories)
-        
-        stats = {
-            "totalProducts": total_products,
-            "lowStockAlerts": low_stock_alerts,
-            "expiringSoon": expiring_soon,
-            "autoDeductToday": auto_deduct_today,
-            "totalValue": total_value,
-            "categoriesCount": categories_count
-        }
+        result = db.rpc("inventory_stats", {
+            "p_client_id": g.tenant_id,
+            "p_day_start": f"{today}T00:00:00",
+            "p_expiry_before": thirty_days_from_now
+        }).execute()
+        stats = result.data
         
         return jsonify(stats), 200
     except Exception as e:
@@ -406,4 +375,12 @@ def get_treatment_types():
         
         return jsonify(treatment_types), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+# Rebuild the inventory summary (flask inventory rebuild-summary)
+@inventory_bp.cli.command("rebuild-summary")
+@click.option("--client-id", default=None, help="Only rebuild this client's summary")
+def rebuild_summary(client_id):
+    """Recompute the inventory summary from the products and inventory_logs tables"""
+    result = db.rpc("rebuild_inventory_summary", {"p_client_id": client_id}).execute()
+    click.echo(f"Rebuilt {result.data} summary rows")
@@ -0,0 +1,116 @@
+"""
+Request-scoped batching of by-id lookups.
+
+    staff = loader("staff", "id, name")
+    staff.want(*doctor_ids)            # queue ids, no round-trip yet
+    doctor = staff.load(doctor_id)     # one in_("id", [...]) for everything queued
+
+Each (table, columns) pair gets one Loader per request, kept on flask.g.
+Ids queued with want() or asked for with load()/load_many() are fetched
+together in a single query per table, scoped to the current tenant, and
+memoized for the rest of the request (missing ids memoize as None).
+Code that writes a row it loaded should prime() or forget() it.
+"""
+from flask import g
+from collections import defaultdict
+from .extensions import db
+from .pagination import iter_rows
+import os
+
+# Ids per in_() query; keeps PostgREST URLs well under proxy limits
+LOADER_BATCH_SIZE = int(os.getenv("LOADER_BATCH_SIZE", "100"))
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class Loader:
+    __slots__ = ("table", "columns", "scoped", "rows", "pending")
+
+    def __init__(self, table, columns="*", scoped=True):
+        self.table = table
+        self.columns = columns
+        self.scoped = scoped
+        self.rows = {}
+        self.pending = []
+
+    def want(self, *ids):
+        """Queue ids for the next batch"""
+        for row_id in ids:
+            if row_id is not None and row_id not in self.rows and row_id not in self.pending:
+                self.pending.append(row_id)
+        return self
+
+    def _select(self):
+        # The id is needed to match rows back to the ids asked for
+        if self.columns == "*" or "id" in (c.strip() for c in self.columns.split(",")):
+            return self.columns
+        return f"id, {self.columns}"
+
+    def flush(self):
+        """Fetch every queued id not loaded yet"""
+        pending, self.pending = self.pending, []
+        for ids in _chunks(pending, LOADER_BATCH_SIZE):
+            query = db.table(self.table).select(self._select()).in_("id", ids)
+            if self.scoped:
+                query = query.eq("client_id", g.tenant_id)
+            found = {row["id"]: row for row in query.execute().data}
+            for row_id in ids:
+                self.rows[row_id] = found.get(row_id)
+
+    def load(self, row_id):
+        """Row with this id (or None), batched with anything queued"""
+        if row_id is None:
+            return None
+        self.want(row_id)
+        if self.pending:
+            self.flush()
+        return self.rows[row_id]
+
+    def load_many(self, ids):
+        """Rows for ids, in order (None for missing ones)"""
+        self.want(*ids)
+        if self.pending:
+            self.flush()
+        return [self.rows.get(row_id) for row_id in ids]
+
+    def prime(self, row_id, row):
+        """Record a row this request wrote, so later loads see it"""
+        self.rows[row_id] = row
+        return self
+
+    def forget(self, row_id):
+        self.rows.pop(row_id, None)
+        return self
+
+def loader(table, columns="*", scoped=True):
+    """This request's Loader for table/columns"""
+    if "loaders" not in g:
+        g.loaders = {}
+    key = (table, columns, scoped)
+    if key not in g.loaders:
+        g.loaders[key] = Loader(table, columns, scoped)
+    return g.loaders[key]
+
+def load_related(table, column, keys, columns="*", scoped=True, order=("id",), **equals):
+    """
+    Rows of table whose column is one of keys (and whose other columns
+    match equals), grouped by that column: one in_() scan per batch of
+    keys instead of one query per key. Each scan is paged in order (unique
+    columns, see pagination.iter_rows), so every matching row is returned.
+    """
+    grouped = defaultdict(list)
+    keys = list(dict.fromkeys(k for k in keys if k is not None))
+    for batch in _chunks(keys, LOADER_BATCH_SIZE):
+        def related(batch=batch):
+            query = db.table(table).select(columns).in_(column, batch)
+            if scoped:
+                query = query.eq("client_id", g.tenant_id)
+            for name, value in equals.items():
+                query = query.eq(name, value)
+            return query
+
+        # A batch can match more rows than PostgREST returns per query
+        for row in iter_rows(related, order=order):
+            grouped[row[column]].append(row)
+    return grouped
@@ -1,64 +1,137 @@
-from flask import request, g
-from .extensions import supabase
+from flask import request, g, jsonify
+from .extensions import db
+from .cache import TTLCache, SingleFlight, MISSING
+from .policies import route_policy, TENANT_NONE, TENANT_REQUIRED
+from .permissions import module_disabled_error
+from .tenants import Tenant, TENANT_COLUMNS
+from .instrumentation import budget_exempt
+import logging
+import os
+
+logger = logging.getLogger("api.middleware")
+
+# Per-process tenant cache keyed by subdomain, holding Tenant records
+tenant_cache = TTLCache(
+    maxsize=int(os.getenv("TENANT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TENANT_CACHE_TTL", "60"))
+)
+
+# Unknown subdomains, remembered for a shorter time so probes don't reach
+# the database. Kept apart from tenant_cache so a flood of random
+# subdomains can only evict other unknown ones, never real tenants.
+TENANT_NEGATIVE_TTL = float(os.getenv("TENANT_NEGATIVE_TTL", "10"))
+unknown_tenant_cache = TTLCache(
+    maxsize=int(os.getenv("TENANT_NEGATIVE_CACHE_SIZE", "256")),
+    ttl=TENANT_NEGATIVE_TTL
+)
+
+# Concurrent misses for the same subdomain share one lookup
+tenant_lookups = SingleFlight()
+
+def invalidate_tenant(client_id=None, subdomain=None):
+    """
+    Drop cached tenant rows so the next request reloads them.
+    Called by super-admin writes; other workers pick the change up
+    once their entry's TTL runs out.
+    """
+    if subdomain:
+        tenant_cache.pop(subdomain)
+        unknown_tenant_cache.pop(subdomain)
+    if client_id:
+        tenant_cache.pop_where(lambda tenant: tenant.id == client_id)
+
+def _cached_tenant(sub):
+    # A Tenant, None for a known-unknown subdomain, or MISSING
+    tenant = tenant_cache.get(sub, MISSING)
+    if tenant is MISSING and sub in unknown_tenant_cache:
+        return None
+    return tenant
+
+def _fetch_tenant(sub):
+    # Another request may have filled the entry while we waited for the flight
+    tenant = _cached_tenant(sub)
+    if tenant is not MISSING:
+        return tenant
+
+    with budget_exempt():
+        data = db.table("clients").select(TENANT_COLUMNS).eq("subdomain", sub).limit(1).execute()
+    if data.data:
+        tenant = Tenant.from_row(data.data[0])
+        tenant_cache.set(sub, tenant)
+    else:
+        tenant = None
+        unknown_tenant_cache.set(sub, True)
+    return tenant
+
+def load_tenant(sub):
+    """
+    Return the Tenant for a subdomain, or None if no such client exists.
+    """
+    tenant = _cached_tenant(sub)
+    if tenant is MISSING:
+        tenant = tenant_lookups.do(sub, lambda: _fetch_tenant(sub))
+    return tenant
+
+# For local development, always use mock data for 'skinova' tenant
+DEV_TENANT = Tenant(
+    id="00000000-0000-0000-0000-000000000000",
+    name="Skinova Clinic (Dev)",
+    subdomain="skinova",
+    plan="enterprise",
+    status="active",
+    modules=["reception", "doctor", "billing", "inventory", "hr", "crm", "photo-manager", "technician", "payroll"],
+    permissions={}
+)
+
+def set_tenant(tenant):
+    g.tenant = tenant
+    g.tenant_id = tenant.id if tenant else None
+    g.modules = tenant.modules if tenant else frozenset()
 
 def resolve_tenant():
     """
     BEFORE every request:
+    0. Look up the route policy → skip everything for preflights and tenant-agnostic routes
     1. Get sub-domain  →  skinova.hospverse.com  =>  'skinova'
-    2. Lookup clients table → grab client_id + modules_enabled
-    3. Store on flask.g   (g.tenant_id, g.modules)
+    2. Lookup clients table (cached per process) → grab client_id + modules_enabled
+    3. Store on flask.g   (g.tenant, g.tenant_id, g.modules)
+    4. Enforce the policy → 404 / 403 response if the tenant or module is missing
     """
+    set_tenant(None)
+
+    policy = route_policy(request)
+    if policy.tenant == TENANT_NONE:
+        return None
+
     host = request.headers.get("Host", "")
-    
-    # Skip tenant resolution for super admin endpoints
-    if request.path.startswith("/api/super-admin"):
-        g.tenant_id = None
-        g.modules = []
-        return
         
     # Local development handling
     if "localhost" in host or "127.0.0.1" in host:
         # For local testing, use a query param to simulate subdomain
         sub = request.args.get("tenant", "skinova")
         
-        # For local development, always use mock data for 'skinova' tenant
-        if sub == "skinova":
-            g.tenant_id = "00000000-0000-0000-0000-000000000000"
-            g.modules = ["reception", "doctor", "billing", "inventory", "hr", "crm", "photo-manager", "technician", "payroll"]
-            g.client_data = {
-                "id": "00000000-0000-0000-0000-000000000000",
-                "name": "Skinova Clinic (Dev)",
-                "subdomain": "skinova",
-                "logo": None,
-                "plan": "enterprise",
-                "status": "active",
-                "contact_name": "Dev Admin",
-                "contact_email": "admin@skinova.dev",
-                "contact_phone": "+1234567890",
-                "modules_enabled": ["reception", "doctor", "billing", "inventory", "hr", "crm", "photo-manager", "technician", "payroll"],
-                "role_permissions": {},
-                "api_usage": 0,
-                "active_users": 1,
-                "max_users": 100,
-                "max_storage_mb": 10000
-            }
-            return
+        if sub == DEV_TENANT.subdomain:
+            set_tenant(DEV_TENANT)
+            return enforce_policy(policy)
     else:
         # Production - extract subdomain
         sub = host.split(".")[0]
     
     try:
-        data = supabase.table("clients").select("*").eq("subdomain", sub).single().execute()
-        if data.data is None:
-            g.tenant_id = None
-            g.modules = []
-            g.client_data = None
-        else:
-            g.tenant_id = data.data["id"]
-            g.modules = data.data["modules_enabled"]
-            g.client_data = data.data
-    except Exception as e:
-        print(f"Error resolving tenant: {e}")
-        g.tenant_id = None
-        g.modules = []
-        g.client_data = None
\ No newline at end of file
+        set_tenant(load_tenant(sub))
+    except Exception:
+        logger.exception("Error resolving tenant %r", sub)
+
+    return enforce_policy(policy)
+
+def enforce_policy(policy):
+    if policy.tenant != TENANT_REQUIRED:
+        return None
+
+    if not g.tenant_id:
+        return jsonify({"error": "Tenant not found"}), 404
+
+    if policy.module and policy.module not in g.modules:
+        return module_disabled_error(policy.module)
+
+    return None
@@ -0,0 +1,234 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+    page = Page.from_request()
+    query = db.table("invoices").select("*", count=page.count).eq("client_id", g.tenant_id)
+    ...
+    result = page.apply(query, "created_at", desc=True).execute()
+    return page.response(result)
+
+Query parameters:
+    limit   page size (default PAGE_SIZE, at most MAX_PAGE_SIZE)
+    cursor  opaque value from a previous response's X-Next-Cursor header
+    count   exact | planned | estimated; adds X-Total-Count (first page only)
+    stream  true: every row after the cursor as one streamed array
+            (see streaming.py); limit and count don't apply
+
+Streaming re-runs the query once per chunk, so those endpoints build it
+in a function:
+
+    def invoices():
+        return db.table("invoices").select("*").eq("client_id", g.tenant_id)
+
+    if page.stream:
+        return page.stream_response(invoices, "created_at", desc=True)
+    result = page.apply(invoices(), "created_at", desc=True).execute()
+
+Rows are ordered by the sort column with "id" as tiebreaker, so a cursor
+(the last row's sort value and id) resumes exactly after that row, even
+when rows are inserted meanwhile. NULL sort values follow Postgres
+ordering: last when ascending, first when descending.
+"""
+from flask import request, jsonify
+from .streaming import wants_stream, stream_response, STREAM_CHUNK_SIZE
+from .fanout import submit, remaining, DeadlineExceeded
+from .instrumentation import budget_exempt
+from concurrent.futures import TimeoutError as FutureTimeout
+import base64
+import json
+import os
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+COUNT_MODES = ("exact", "planned", "estimated")
+
+# Rows per query for exhaustive scans (iter_rows). Must not exceed
+# PostgREST's db-max-rows (1000 by default): a chunk cut short by the
+# cap would be taken for the last one.
+SCAN_CHUNK_SIZE = int(os.getenv("SCAN_CHUNK_SIZE", "1000"))
+
+class InvalidPageRequest(ValueError):
+    pass
+
+def encode_cursor(sort, value, row_id):
+    raw = json.dumps([sort, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise InvalidPageRequest("Invalid cursor")
+
+    # A cursor only makes sense for the ordering it was issued for
+    if cursor_sort != sort or row_id is None:
+        raise InvalidPageRequest("Invalid cursor")
+    return value, row_id
+
+def _quote(value):
+    # Values inside PostgREST logic trees are double-quoted so commas,
+    # dots and parentheses in them are not parsed as syntax
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+def keyset_filter(sort, value, row_id, desc=False):
+    """PostgREST or=() filter selecting the rows after (value, row_id)"""
+    op = "lt" if desc else "gt"
+    after_id = f"id.{op}.{_quote(row_id)}"
+
+    if value is None:
+        if desc:
+            # NULLs come first descending: the rest of the NULLs, then everything else
+            return f"and({sort}.is.null,{after_id}),{sort}.not.is.null"
+        return f"and({sort}.is.null,{after_id})"
+
+    quoted = _quote(value)
+    conditions = f"{sort}.{op}.{quoted},and({sort}.eq.{quoted},{after_id})"
+    if not desc:
+        # NULLs come last ascending
+        conditions += f",{sort}.is.null"
+    return conditions
+
+def iter_keyset(query_factory, sort, desc=False, chunk_size=PAGE_SIZE, cursor=None):
+    """
+    Yield every row of query_factory() ordered by (sort, id), as lists of
+    at most chunk_size rows, one keyset-filtered query per list.
+    """
+    after = decode_cursor(cursor, sort) if cursor else None
+    first = True
+    while True:
+        query = query_factory()
+        if after is not None:
+            query = query.or_(keyset_filter(sort, after[0], after[1], desc))
+        query = query.order_by(sort, "id", desc=desc).limit(chunk_size)
+
+        if first:
+            rows = query.execute().data
+            first = False
+        else:
+            # Continuation chunks aren't charged to the round-trip budget
+            with budget_exempt():
+                rows = query.execute().data
+
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = (rows[-1].get(sort), rows[-1]["id"])
+
+def _offset_chunks(query_factory, chunk_size, prefetch, order):
+    def fetch(offset):
+        query = query_factory().order_by(*order).limit(chunk_size).offset(offset)
+        if not offset:
+            return query.execute().data
+        # A scan is one logical read: only its first chunk is charged to
+        # the endpoint's round-trip budget
+        with budget_exempt():
+            return query.execute().data
+
+    offset = 0
+    rows = fetch(0)
+    while True:
+        full = len(rows) == chunk_size
+        # Fetch the next chunk while the caller works through this one
+        upcoming = submit(fetch, offset + chunk_size) if full and prefetch else None
+
+        if rows:
+            yield rows
+        if not full:
+            return
+
+        offset += chunk_size
+        if upcoming is None:
+            rows = fetch(offset)
+            continue
+        try:
+            rows = upcoming.result(timeout=remaining())
+        except FutureTimeout:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+def iter_rows(query_factory, chunk_size=SCAN_CHUNK_SIZE, prefetch=False, keyset=None, desc=False, order=("id",)):
+    """
+    Yield every row of query_factory(), however many there are, fetching
+    chunk_size rows per query so aggregations see the full result in
+    constant memory:
+
+        for invoice in iter_rows(lambda: db.table("invoices").select("status").eq("client_id", client_id)):
+            ...
+
+    By default chunks are limit/offset slices in id order (or the given
+    order, which must be unique, for tables keyed otherwise), and
+    prefetch=True fetches the next one concurrently. With keyset=<column>
+    they are keyset pages ordered by (column, id) instead, which stay
+    exact under concurrent inserts but can't be prefetched; the rows must
+    then include that column and id.
+    """
+    if keyset:
+        chunks = iter_keyset(query_factory, keyset, desc, chunk_size)
+    else:
+        chunks = _offset_chunks(query_factory, chunk_size, prefetch, order)
+    for chunk in chunks:
+        yield from chunk
+
+class Page:
+    """Page request parsed from the query string"""
+    __slots__ = ("limit", "cursor", "count", "stream", "sort")
+
+    def __init__(self, limit=PAGE_SIZE, cursor=None, count=None, stream=False):
+        self.limit = limit
+        self.cursor = cursor
+        self.count = count
+        self.stream = stream
+        self.sort = None
+
+    @classmethod
+    def from_request(cls):
+        limit = request.args.get("limit", PAGE_SIZE)
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise InvalidPageRequest("limit must be an integer")
+        if limit < 1:
+            raise InvalidPageRequest("limit must be positive")
+
+        count = request.args.get("count") or None
+        if count is not None and count not in COUNT_MODES:
+            raise InvalidPageRequest(f"count must be one of: {', '.join(COUNT_MODES)}")
+
+        cursor = request.args.get("cursor") or None
+        stream = wants_stream()
+
+        # Totals are only reported for the first page; later pages would
+        # count just the rows after the cursor
+        return cls(min(limit, MAX_PAGE_SIZE), cursor, None if cursor or stream else count, stream)
+
+    def apply(self, query, sort, desc=False):
+        """Order by (sort, id), resume after the cursor, and fetch one extra row"""
+        self.sort = sort
+
+        if self.cursor:
+            value, row_id = decode_cursor(self.cursor, sort)
+            query = query.or_(keyset_filter(sort, value, row_id, desc))
+
+        # The extra row tells whether there is a next page
+        return query.order_by(sort, "id", desc=desc).limit(self.limit + 1)
+
+    def response(self, result, status=200):
+        rows = result.data
+        headers = {}
+
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            last = rows[-1]
+            headers["X-Next-Cursor"] = encode_cursor(self.sort, last.get(self.sort), last["id"])
+
+        if self.count and result.count is not None:
+            headers["X-Total-Count"] = str(result.count)
+
+        return jsonify(rows), status, headers
+
+    def stream_response(self, query_factory, sort, desc=False):
+        """Stream every row after the cursor, fetched in keyset chunks"""
+        self.sort = sort
+        return stream_response(iter_keyset(query_factory, sort, desc, STREAM_CHUNK_SIZE, self.cursor))
@@ -1,20 +1,11 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
 import uuid
 from datetime import datetime
 
 payroll_bp = Blueprint("payroll", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "payroll" not in g.modules:
-        return jsonify({"error": "Payroll module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get payslips
 @payroll_bp.route("/payroll/payslips/<user_id>", methods=["GET"])
 def get_payslips(user_id):
@@ -25,7 +16,7 @@ def get_payslips(user_id):
         
     try:
         # Apply filters if provided
-        query = supabase.table("payslips").select("*").eq("staff_id", user_id).eq("client_id", g.tenant_id)
+        query = db.table("payslips").select("*").eq("staff_id", user_id).eq("client_id", g.tenant_id)
         
         month = request.args.get("month")
         if month is not None:
@@ -36,7 +27,7 @@ def get_payslips(user_id):
             query = query.eq("year", int(year))
             
         # Sort by date (newest first)
-        query = query.order("year", desc=True).order("month", desc=True)
+        query = query.order_by("year", "month", desc=True)
         
         result = query.execute()
         
@@ -53,7 +44,7 @@ def get_payslip_details(payslip_id):
         return module_error
         
     try:
-        result = supabase.table("payslips").select("*").eq("id", payslip_id).eq("client_id", g.tenant_id).single().execute()
+        result = db.table("payslips").select("*").eq("id", payslip_id).eq("client_id", g.tenant_id).single().execute()
         
         if not result.data:
             return jsonify({"error": "Payslip not found"}), 404
@@ -72,7 +63,7 @@ def download_payslip(payslip_id):
         
     try:
         # Get payslip
-        payslip = supabase.table("payslips").select("*").eq("id", payslip_id).eq("client_id", g.tenant_id).single().execute()
+        payslip = db.table("payslips").select("*").eq("id", payslip_id).eq("client_id", g.tenant_id).single().execute()
         
         if not payslip.data:
             return jsonify({"error": "Payslip not found"}), 404
@@ -95,7 +86,7 @@ def get_leave_balance(staff_id):
         return module_error
         
     try:
-        result = supabase.table("leave_balances").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id).single().execute()
+        result = db.table("leave_balances").select("*").eq("staff_id", staff_id).eq("client_id", g.tenant_id).single().execute()
         
         if not result.data:
             return jsonify({"error": "Leave balance not found"}), 404
@@ -114,7 +105,7 @@ def get_payroll_stats():
         
     try:
         # Get payslips
-        payslips_query = supabase.table("payslips").select("*").eq("client_id", g.tenant_id).execute()
+        payslips_query = db.table("payslips").select("month, year, net_salary, payment_status").eq("client_id", g.tenant_id).execute()
         
         # Filter to current month
         current_month = datetime.now().month
@@ -0,0 +1,115 @@
+from flask import request, jsonify, g
+from .policies import BLUEPRINT_POLICIES
+from .principal import require_principal
+import threading
+
+# Display names used in "module is not enabled" errors
+MODULE_LABELS = {
+    "billing": "Billing",
+    "crm": "CRM",
+    "doctor": "Doctor",
+    "hr": "HR",
+    "inventory": "Inventory",
+    "payroll": "Payroll",
+    "photo_manager": "Photo Manager",
+    "reception": "Reception",
+    "technician": "Technician",
+}
+
+# Grants every identifier
+ALL_PERMISSIONS = -1
+
+class PermissionRegistry:
+    """
+    Assigns each permission identifier (module / blueprint name such as
+    "billing", or endpoint such as "billing.get_invoices") a bit position,
+    so a role's grants compile to one int and a check is a single AND.
+    """
+
+    def __init__(self):
+        self._bits = {}
+        self._endpoint_masks = {}
+        self._lock = threading.Lock()
+
+    def bit(self, identifier):
+        bit = self._bits.get(identifier)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(identifier, 1 << len(self._bits))
+        return bit
+
+    def endpoint_mask(self, endpoint, blueprint):
+        # Bits that grant access to an endpoint: the endpoint itself or its blueprint
+        mask = self._endpoint_masks.get(endpoint)
+        if mask is None:
+            mask = self.bit(endpoint)
+            if blueprint:
+                mask |= self.bit(blueprint)
+            self._endpoint_masks[endpoint] = mask
+        return mask
+
+registry = PermissionRegistry()
+
+def _normalize(permission):
+    # The dashboard uses "photo-manager" style names, blueprints use "photo_manager"
+    return permission.strip().replace("-", "_")
+
+def compile_role_permissions(role_permissions):
+    """
+    Compile clients.role_permissions ({role: [permission, ...]}) into
+    {role: bitmask}. Permissions may also be given as {permission: bool}.
+    Roles without an entry are unrestricted.
+    """
+    compiled = {}
+    for role, permissions in (role_permissions or {}).items():
+        if isinstance(permissions, dict):
+            permissions = [name for name, granted in permissions.items() if granted]
+
+        mask = 0
+        for permission in permissions or []:
+            if permission == "*":
+                mask = ALL_PERMISSIONS
+                break
+            mask |= registry.bit(_normalize(permission))
+        compiled[role] = mask
+    return compiled
+
+def is_allowed(compiled, role, endpoint, blueprint):
+    mask = compiled.get(role)
+    if mask is None:
+        return True
+    return bool(mask & registry.endpoint_mask(endpoint, blueprint))
+
+def module_disabled_error(module_name):
+    label = MODULE_LABELS.get(module_name)
+    if label:
+        return jsonify({"error": f"{label} module is not enabled for this tenant"}), 403
+    return jsonify({"error": f"Module '{module_name}' is not enabled for this tenant"}), 403
+
+# Middleware to check if module is enabled and the caller's role may use this endpoint
+def check_module_access(module_name=None):
+    if module_name is None:
+        module_name = BLUEPRINT_POLICIES[request.blueprint].module
+
+    if not g.tenant_id:
+        return jsonify({"error": "Tenant not found"}), 404
+
+    if module_name not in g.modules:
+        return module_disabled_error(module_name)
+
+    # Only tenants that configured role permissions pay for resolving the caller
+    permissions = g.tenant.permissions
+    if not permissions:
+        return None
+
+    principal, auth_error = require_principal()
+    if auth_error:
+        return auth_error
+
+    if not principal.role:
+        return jsonify({"error": "User profile not found"}), 403
+
+    if not is_allowed(permissions, principal.role, request.endpoint, request.blueprint):
+        return jsonify({"error": f"Role '{principal.role}' is not permitted to access this resource"}), 403
+
+    return None
@@ -1,20 +1,15 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .principal import current_user_name
+from .pagination import Page, InvalidPageRequest
+from .fields import PHOTO_FIELDS, InvalidFields
+from .loader import loader
 import uuid
 from datetime import datetime
 
 photo_bp = Blueprint("photo_manager", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "photo_manager" not in g.modules:
-        return jsonify({"error": "Photo Manager module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get all patient photos
 @photo_bp.route("/photo-manager/photos", methods=["GET"])
 def get_all_patient_photos():
@@ -24,8 +19,11 @@ def get_all_patient_photos():
         return module_error
         
     try:
+        page = Page.from_request()
+        columns = PHOTO_FIELDS.from_request("id", "uploaded_at")
+        
         # Apply filters if provided
-        query = supabase.table("patient_photos").select("*").eq("client_id", g.tenant_id)
+        query = db.table("patient_photos").select(columns, count=page.count).eq("client_id", g.tenant_id)
         
         patient_id = request.args.get("patientId")
         if patient_id:
@@ -45,12 +43,12 @@ def get_all_patient_photos():
         if date_from and date_to:
             query = query.gte("session_date", date_from).lte("session_date", date_to)
             
-        # Order by upload date (newest first)
-        query = query.order("uploaded_at", desc=True)
+        # Order by uploaded_at (newest first), one page at a time
+        result = page.apply(query, "uploaded_at", desc=True).execute()
         
-        result = query.execute()
-        
-        return jsonify(result.data), 200
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -64,7 +62,7 @@ def get_photo_sessions():
         
     try:
         # Apply filters if provided
-        query = supabase.table("photo_sessions").select("*").eq("client_id", g.tenant_id)
+        query = db.table("photo_sessions").select("*").eq("client_id", g.tenant_id)
         
         patient_id = request.args.get("patientId")
         if patient_id:
@@ -89,11 +87,11 @@ def get_photo_stats():
         
     try:
         # Get photos
-        photos_query = supabase.table("patient_photos").select("*").eq("client_id", g.tenant_id).execute()
+        photos_query = db.table("patient_photos").select("patient_id, uploaded_at").eq("client_id", g.tenant_id).execute()
         photos = photos_query.data
         
         # Get sessions
-        sessions_query = supabase.table("photo_sessions").select("*").eq("client_id", g.tenant_id).execute()
+        sessions_query = db.table("photo_sessions").select("before_count, after_count").eq("client_id", g.tenant_id).execute()
         sessions = sessions_query.data
         
         # Calculate stats
@@ -147,9 +145,10 @@ def upload_patient_photo():
             return jsonify({"error": "Patient ID, session ID, and photo type are required"}), 400
             
         # Get or create session
-        session = supabase.table("photo_sessions").select("*").eq("id", session_id).eq("client_id", g.tenant_id).single().execute()
+        sessions = loader("photo_sessions")
+        session = sessions.load(session_id)
         
-        if not session.data:
+        if not session:
             # Create new session
             session_data = {
                 "id": session_id,
@@ -165,11 +164,12 @@ def upload_patient_photo():
                 "in_progress_count": 1 if photo_type == "in-progress" else 0
             }
             
-            supabase.table("photo_sessions").insert(session_data).execute()
+            db.table("photo_sessions").insert(session_data).execute()
             session_obj = session_data
+            sessions.prime(session_id, session_obj)
         else:
             # Update existing session
-            session_obj = session.data
+            session_obj = session
             update_data = {}
             
             if photo_type == "before":
@@ -179,10 +179,11 @@ def upload_patient_photo():
             else:
                 update_data["in_progress_count"] = session_obj["in_progress_count"] + 1
                 
-            supabase.table("photo_sessions").update(update_data).eq("id", session_id).execute()
+            db.table("photo_sessions").update(update_data).eq("id", session_id).execute()
             
             # Update session object for response
             session_obj = {**session_obj, **update_data}
+            sessions.prime(session_id, session_obj)
             
         # Generate photo ID
         photo_id = str(uuid.uuid4())
@@ -207,7 +208,7 @@ def upload_patient_photo():
             "type": photo_type,
             "image_url": image_url,
             "thumbnail_url": thumbnail_url,
-            "uploaded_by": "Current User",  # In a real app, get from auth context
+            "uploaded_by": current_user_name(),
             "uploaded_at": datetime.now().isoformat(),
             "notes": notes,
             "doctor_id": session_obj["doctor_id"],
@@ -215,7 +216,7 @@ def upload_patient_photo():
         }
         
         # Insert photo
-        result = supabase.table("patient_photos").insert(photo).execute()
+        result = db.table("patient_photos").insert(photo).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -231,37 +232,37 @@ def delete_photo(photo_id):
         
     try:
         # Get photo
-        photo = supabase.table("patient_photos").select("*").eq("id", photo_id).eq("client_id", g.tenant_id).single().execute()
+        photo = db.table("patient_photos").select("*").eq("id", photo_id).eq("client_id", g.tenant_id).single().execute()
         
         if not photo.data:
             return jsonify({"error": "Photo not found"}), 404
             
         # Get session
         session_id = photo.data["session_id"]
-        session = supabase.table("photo_sessions").select("*").eq("id", session_id).eq("client_id", g.tenant_id).single().execute()
+        session = loader("photo_sessions").load(session_id)
         
-        if session.data:
+        if session:
             # Update session counts
             update_data = {}
             
             if photo.data["type"] == "before":
-                update_data["before_count"] = max(0, session.data["before_count"] - 1)
+                update_data["before_count"] = max(0, session["before_count"] - 1)
             elif photo.data["type"] == "after":
-                update_data["after_count"] = max(0, session.data["after_count"] - 1)
+                update_data["after_count"] = max(0, session["after_count"] - 1)
             else:
-                update_data["in_progress_count"] = max(0, session.data["in_progress_count"] - 1)
+                update_data["in_progress_count"] = max(0, session["in_progress_count"] - 1)
                 
             # Update session
-            supabase.table("photo_sessions").update(update_data).eq("id", session_id).execute()
+            db.table("photo_sessions").update(update_data).eq("id", session_id).execute()
             
             # If no photos left, remove session
-            if (update_data.get("before_count", session.data["before_count"]) == 0 and
-                update_data.get("after_count", session.data["after_count"]) == 0 and
-                update_data.get("in_progress_count", session.data["in_progress_count"]) == 0):
-                supabase.table("photo_sessions").delete().eq("id", session_id).execute()
+            if (update_data.get("before_count", session["before_count"]) == 0 and
+                update_data.get("after_count", session["after_count"]) == 0 and
+                update_data.get("in_progress_count", session["in_progress_count"]) == 0):
+                db.table("photo_sessions").delete().eq("id", session_id).execute()
                 
         # Delete photo
-        supabase.table("patient_photos").delete().eq("id", photo_id).execute()
+        db.table("patient_photos").delete().eq("id", photo_id).execute()
         
         return jsonify({"message": "Photo deleted successfully"}), 200
     except Exception as e:
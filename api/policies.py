@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+# How a route depends on the tenant resolved from the Host header
+TENANT_REQUIRED = "required"   # resolve tenant, 404 if missing
+TENANT_OPTIONAL = "optional"   # resolve tenant, let the view decide
+TENANT_NONE = "none"           # never resolve, never touch the database
+
+RoutePolicy = namedtuple("RoutePolicy", ["tenant", "module"], defaults=[None])
+
+# Default policy per blueprint (keyed by blueprint name)
+BLUEPRINT_POLICIES = {
+    "auth": RoutePolicy(TENANT_NONE),
+    "super_admin": RoutePolicy(TENANT_NONE),
+    "admin": RoutePolicy(TENANT_REQUIRED, "admin"),
+    "billing": RoutePolicy(TENANT_REQUIRED, "billing"),
+    "crm": RoutePolicy(TENANT_REQUIRED, "crm"),
+    "doctor": RoutePolicy(TENANT_REQUIRED, "doctor"),
+    "hr": RoutePolicy(TENANT_REQUIRED, "hr"),
+    "inventory": RoutePolicy(TENANT_REQUIRED, "inventory"),
+    "payroll": RoutePolicy(TENANT_REQUIRED, "payroll"),
+    "photo_manager": RoutePolicy(TENANT_REQUIRED, "photo_manager"),
+    "reception": RoutePolicy(TENANT_REQUIRED, "reception"),
+    "technician": RoutePolicy(TENANT_REQUIRED, "technician"),
+}
+
+# Per-endpoint overrides (keyed by Flask endpoint name)
+ENDPOINT_POLICIES = {
+    "get_tenant": RoutePolicy(TENANT_OPTIONAL),
+}
+
+# Unmatched URLs (404s) and static files never need a tenant
+NO_TENANT = RoutePolicy(TENANT_NONE)
+
+def route_policy(request):
+    """
+    Look up the policy for the current request. Pure dictionary lookups,
+    so it can run before any I/O in the before_request hook.
+    """
+    # CORS preflights are answered by flask_cors without running the view
+    if request.method == "OPTIONS" or request.endpoint is None:
+        return NO_TENANT
+
+    policy = ENDPOINT_POLICIES.get(request.endpoint)
+    if policy is not None:
+        return policy
+
+    return BLUEPRINT_POLICIES.get(request.blueprint, NO_TENANT)
+
+# Data-API round-trips an endpoint may make per request, not counting
+# cached per-process lookups (tenant, profile, token). Checked after each
+# request; QUERY_BUDGET_MODE=strict turns overruns into failures so N+1
+# regressions show up in tests and benchmark runs.
+DEFAULT_QUERY_BUDGET = 3
+
+QUERY_BUDGETS = {
+    "admin.get_admin_metrics": 4,
+    "admin.get_performance_report": 4,
+    "hr.get_staff_details": 5,
+    "photo_manager.upload_patient_photo": 4,
+    "photo_manager.delete_photo": 5,
+    "super_admin.add_support_ticket_message": 4,
+}
@@ -0,0 +1,149 @@
+from flask import request, jsonify, g
+from .extensions import db
+from .tokens import verify_token, unverified_subject, InvalidToken, AUTH_STRICT_VERIFY
+from .cache import TTLCache, MISSING
+from .fanout import submit, remaining
+from .instrumentation import budget_exempt
+import os
+
+# Per-process profile cache keyed by auth_user_id. Rows embed the
+# user's client (user_profiles + clients(*)) so one select serves both.
+PROFILE_SELECT = "*, clients(*)"
+profile_cache = TTLCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "30"))
+)
+
+# Composed /me payloads, keyed by auth_user_id
+user_payload_cache = TTLCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("USER_PAYLOAD_CACHE_TTL", "15"))
+)
+
+class Principal:
+    """
+    The authenticated caller: verified token claims plus the matching
+    user_profiles row (None when the auth user has no profile yet).
+    The profile is loaded on first access.
+    """
+    __slots__ = ("auth_user_id", "email", "claims", "_profile")
+
+    def __init__(self, claims, profile=MISSING):
+        self.auth_user_id = claims["sub"]
+        self.email = claims.get("email")
+        self.claims = claims
+        self._profile = profile
+
+    @property
+    def profile(self):
+        if self._profile is MISSING:
+            self._profile = load_profile(self.auth_user_id)
+        return self._profile
+
+    @property
+    def id(self):
+        return self.profile["id"] if self.profile else None
+
+    @property
+    def name(self):
+        return self.profile["name"] if self.profile else None
+
+    @property
+    def role(self):
+        return self.profile["role"] if self.profile else None
+
+    @property
+    def client_id(self):
+        return self.profile.get("client_id") if self.profile else None
+
+def bearer_token():
+    auth_header = request.headers.get("Authorization")
+
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+
+    return auth_header.split(" ")[1]
+
+def load_profile(auth_user_id):
+    profile = profile_cache.get(auth_user_id)
+    if profile is None:
+        with budget_exempt():
+            result = db.table("user_profiles").select(PROFILE_SELECT) \
+                    .eq("auth_user_id", auth_user_id).limit(1).execute()
+        if result.data:
+            profile = result.data[0]
+            profile_cache.set(auth_user_id, profile)
+    return profile
+
+def cache_profile(profile):
+    # Prime the cache with a row already fetched with PROFILE_SELECT (e.g. at login)
+    profile_cache.set(profile["auth_user_id"], profile)
+
+def invalidate_profile(auth_user_id):
+    profile_cache.pop(auth_user_id)
+    user_payload_cache.pop(auth_user_id)
+
+def invalidate_client_profiles(client_id):
+    # Cached profiles embed their client row, so client writes must drop them
+    profile_cache.pop_where(lambda profile: profile.get("client_id") == client_id)
+    user_payload_cache.pop_where(lambda user: user.get("client_id") == client_id)
+
+def build_user_payload(profile, email):
+    return {
+        "id": profile["id"],
+        "auth_user_id": profile["auth_user_id"],
+        "name": profile["name"],
+        "email": email,
+        "role": profile["role"],
+        "client_id": profile.get("client_id"),
+        "client": profile.get("clients")
+    }
+
+def _resolve_principal():
+    token = bearer_token()
+    if not token:
+        return None, "Missing or invalid authorization header"
+
+    # The remote check is a network hop of its own, so fetch the profile of
+    # the (not yet verified) subject alongside it. The row is only used if
+    # verification succeeds for that same subject.
+    prefetch = None
+    subject = unverified_subject(token) if AUTH_STRICT_VERIFY else None
+    if subject:
+        prefetch = submit(load_profile, subject)
+
+    try:
+        claims = verify_token(token)
+    except InvalidToken:
+        return None, "Invalid token"
+
+    if prefetch is not None and claims["sub"] == subject:
+        return Principal(claims, prefetch.result(timeout=remaining())), None
+
+    return Principal(claims), None
+
+def get_principal():
+    """
+    Resolve the caller at most once per request and memoize it on flask.g.
+    Returns None for anonymous requests or invalid tokens.
+    """
+    if "principal" not in g:
+        g.principal, g.principal_error = _resolve_principal()
+    return g.principal
+
+def require_principal():
+    """
+    Like get_principal(), but returns (principal, error_response) so guards
+    can hand the 401 straight back to Flask.
+    """
+    principal = get_principal()
+    if principal is None:
+        return None, (jsonify({"error": g.principal_error}), 401)
+    return principal, None
+
+def current_user_name(default="Current User"):
+    # Name for audit fields (changed_by, performed_by, ...)
+    principal = get_principal()
+    if principal is None or principal.name is None:
+        return default
+    return principal.name
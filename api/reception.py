@@ -1,20 +1,14 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .fanout import gather, DeadlineExceeded
+from .loader import loader
+from .reference import reference_response
 import uuid
 from datetime import datetime
 
 reception_bp = Blueprint("reception", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "reception" not in g.modules:
-        return jsonify({"error": "Reception module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get today's appointments
 @reception_bp.route("/reception/appointments/today", methods=["GET"])
 def get_today_appointments():
@@ -28,7 +22,7 @@ def get_today_appointments():
         today = datetime.now().strftime("%Y-%m-%d")
         
         # Get appointments for today
-        result = supabase.table("appointments").select("*").eq("client_id", g.tenant_id).eq("date", today).execute()
+        result = db.table("appointments").select("*").eq("client_id", g.tenant_id).eq("date", today).execute()
         
         return jsonify(result.data), 200
     except Exception as e:
@@ -57,7 +51,7 @@ def register_patient():
         }
         
         # Insert patient
-        result = supabase.table("patients").insert(new_patient).execute()
+        result = db.table("patients").insert(new_patient).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -79,8 +73,8 @@ def book_appointment():
         
         # Get doctor name
         doctor_id = appointment_data.get("doctorId")
-        doctor_query = supabase.table("staff").select("name").eq("id", doctor_id).single().execute()
-        doctor_name = doctor_query.data["name"] if doctor_query.data else "Unknown Doctor"
+        doctor = loader("staff", "id, name").load(doctor_id)
+        doctor_name = doctor["name"] if doctor else "Unknown Doctor"
         
         # Prepare appointment data
         new_appointment = {
@@ -93,7 +87,7 @@ def book_appointment():
         }
         
         # Insert appointment
-        result = supabase.table("appointments").insert(new_appointment).execute()
+        result = db.table("appointments").insert(new_appointment).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -108,7 +102,7 @@ def get_queue_list():
         return module_error
         
     try:
-        result = supabase.table("queue").select("*").eq("client_id", g.tenant_id).execute()
+        result = db.table("queue").select("*").eq("client_id", g.tenant_id).execute()
         
         return jsonify(result.data), 200
     except Exception as e:
@@ -129,7 +123,7 @@ def update_patient_status(patient_id):
             return jsonify({"error": "Status is required"}), 400
             
         # Update patient status
-        result = supabase.table("queue").update({
+        result = db.table("queue").update({
             "status": new_status
         }).eq("id", patient_id).eq("client_id", g.tenant_id).execute()
         
@@ -137,7 +131,7 @@ def update_patient_status(patient_id):
             return jsonify({"error": "Patient not found in queue"}), 404
             
         # Get updated queue
-        queue = supabase.table("queue").select("*").eq("client_id", g.tenant_id).execute()
+        queue = db.table("queue").select("*").eq("client_id", g.tenant_id).execute()
         
         return jsonify(queue.data), 200
     except Exception as e:
@@ -158,7 +152,7 @@ def add_to_queue():
         entry_id = str(uuid.uuid4())
         
         # Get current queue to determine queue number
-        queue_query = supabase.table("queue").select("*").eq("client_id", g.tenant_id).execute()
+        queue_query = db.table("queue").select("*").eq("client_id", g.tenant_id).execute()
         queue_number = len(queue_query.data) + 1
         
         # Prepare queue entry data
@@ -172,7 +166,7 @@ def add_to_queue():
         }
         
         # Insert queue entry
-        result = supabase.table("queue").insert(queue_entry).execute()
+        result = db.table("queue").insert(queue_entry).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -218,7 +212,7 @@ def upload_consent():
         }
         
         # Insert consent form
-        result = supabase.table("consent_forms").insert(consent_form).execute()
+        result = db.table("consent_forms").insert(consent_form).execute()
         
         return jsonify(result.data[0]), 201
     except Exception as e:
@@ -233,14 +227,8 @@ def get_doctors():
         return module_error
         
     try:
-        # Get doctors
-        result = supabase.table("staff") \
-               .select("id, name, specialization, available") \
-               .eq("client_id", g.tenant_id) \
-               .eq("role", "doctor") \
-               .execute()
-               
-        return jsonify(result.data), 200
+        # Get doctors (cached per tenant, revalidated by ETag)
+        return reference_response("doctors")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -260,7 +248,7 @@ def get_available_time_slots():
             return jsonify({"error": "Date and doctor ID are required"}), 400
             
         # Get booked slots
-        booked_query = supabase.table("appointments") \
+        booked_query = db.table("appointments") \
                      .select("time") \
                      .eq("client_id", g.tenant_id) \
                      .eq("date", date) \
@@ -295,25 +283,20 @@ def get_reception_stats():
         # Get today's date
         today = datetime.now().strftime("%Y-%m-%d")
         
-        # Get today's appointments
-        appointments_query = supabase.table("appointments") \
-                           .select("*") \
-                           .eq("client_id", g.tenant_id) \
-                           .eq("date", today) \
-                           .execute()
-                           
-        # Get today's registrations
-        registrations_query = supabase.table("patients") \
-                            .select("*") \
-                            .eq("client_id", g.tenant_id) \
-                            .gte("registered_at", f"{today}T00:00:00") \
-                            .execute()
-                            
-        # Get queue
-        queue_query = supabase.table("queue") \
-                    .select("*") \
-                    .eq("client_id", g.tenant_id) \
-                    .execute()
+        # Today's appointments, today's registrations and the queue, fetched concurrently
+        appointments_query, registrations_query, queue_query = gather(
+            db.table("appointments") \
+              .select("status") \
+              .eq("client_id", g.tenant_id) \
+              .eq("date", today),
+            db.table("patients") \
+              .select("id") \
+              .eq("client_id", g.tenant_id) \
+              .gte("registered_at", f"{today}T00:00:00"),
+            db.table("queue") \
+              .select("id") \
+              .eq("client_id", g.tenant_id)
+        )
                     
         # Calculate stats
         today_appointments = len(appointments_query.data)
@@ -329,5 +312,7 @@ def get_reception_stats():
         }
         
         return jsonify(stats), 200
+    except DeadlineExceeded as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Per-tenant read-through cache for staff reference data.
+
+Doctor, technician and CRM-user pick lists are read on every form open,
+and the HR headcount on every dashboard load, but they only change when
+staff or user profiles are written. Each entry is loaded once per tenant
+per process, kept for REFERENCE_CACHE_TTL seconds, and dropped by
+invalidate_references() from the handlers that write staff or
+user_profiles (other workers pick the change up once their TTL runs out).
+
+Every entry carries a version: a hash of its content, so all workers
+agree on it. reference_response() serves it as the ETag and answers
+If-None-Match with 304 Not Modified.
+"""
+from flask import request, jsonify, g
+from collections import namedtuple
+from .extensions import db
+from .cache import TTLCache, SingleFlight, MISSING
+from datetime import datetime
+import hashlib
+import json
+import os
+
+reference_cache = TTLCache(
+    maxsize=int(os.getenv("REFERENCE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+)
+
+# Concurrent misses for the same tenant and list share one query
+reference_lookups = SingleFlight()
+
+Reference = namedtuple("Reference", ["data", "version"])
+
+CRM_ROLES = ["crm_manager", "lead_specialist", "customer_success", "sales_representative"]
+
+def _headcount(client_id):
+    # New joins are counted for the current month, so the entry records
+    # which month that was
+    month = datetime.now().strftime("%Y-%m")
+    groups = db.rpc("hr_headcount", {"p_client_id": client_id, "p_month": month}).execute().data
+    return {"month": month, "groups": groups}
+
+# Loaders by name, each taking the client id
+REFERENCE_LOADERS = {
+    "doctors": lambda client_id: db.table("staff")
+        .select("id, name, specialization, available")
+        .eq("client_id", client_id)
+        .eq("role", "doctor")
+        .order("id")
+        .execute().data,
+    "technicians": lambda client_id: db.table("staff")
+        .select("id, name, specialization, available")
+        .eq("client_id", client_id)
+        .eq("role", "technician")
+        .eq("available", True)
+        .order("id")
+        .execute().data,
+    "crm_users": lambda client_id: db.table("user_profiles")
+        .select("id, name, role")
+        .eq("client_id", client_id)
+        .in_("role", CRM_ROLES)
+        .eq("is_active", True)
+        .order("id")
+        .execute().data,
+    # Staff counts by (department, branch); see hr.get_hr_stats
+    "headcount": _headcount
+}
+
+def version_of(data):
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def _fetch(key):
+    # Another request may have filled the entry while we waited for the flight
+    entry = reference_cache.get(key, MISSING)
+    if entry is MISSING:
+        client_id, name = key
+        data = REFERENCE_LOADERS[name](client_id)
+        entry = Reference(data, version_of(data))
+        reference_cache.set(key, entry)
+    return entry
+
+def load_reference(name, client_id=None):
+    """The current tenant's (or client_id's) cached Reference for name"""
+    key = (client_id or g.tenant_id, name)
+    entry = reference_cache.get(key, MISSING)
+    if entry is MISSING:
+        entry = reference_lookups.do(key, lambda: _fetch(key))
+    return entry
+
+def invalidate_references(client_id, *names):
+    """Drop a client's cached reference data (all of it, or just names) after staff or profile writes"""
+    for name in names or REFERENCE_LOADERS:
+        reference_cache.pop((client_id, name))
+
+def reference_response(name, columns=None):
+    """
+    200 with the list (projected to columns, if given) and its ETag, or
+    304 when the caller's If-None-Match already has this version.
+    """
+    entry = load_reference(name)
+    data = entry.data
+    if columns:
+        data = [{column: row.get(column) for column in columns} for row in data]
+
+    response = jsonify(data)
+    response.set_etag(entry.version)
+    # Clients may keep the list but must revalidate before using it
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
@@ -0,0 +1,187 @@
+"""
+Failure handling for data-API calls.
+
+Query.execute() goes through call(), which:
+
+  * refuses to start once the request deadline (fanout.deadline) has
+    passed; the HTTP transport also caps each call's timeouts to the time
+    left, so no call outlives its request;
+  * retries idempotent reads on transient upstream errors (connection
+    failures, timeouts, 5xx, statement timeouts) with full-jitter backoff;
+  * keeps a circuit breaker per table: after BREAKER_FAILURE_THRESHOLD
+    consecutive calls fail transiently (once their retries are used up)
+    it opens and calls fail fast with CircuitOpen for
+    BREAKER_RESET_TIMEOUT seconds, then a single trial call decides
+    whether it closes again.
+
+Client errors (4xx, constraint violations, missing rows) are neither
+retried nor counted against the breaker.
+"""
+from .fanout import remaining, DeadlineExceeded
+from postgrest import APIError
+import httpx
+import os
+import random
+import threading
+import time
+
+RETRY_ATTEMPTS = int(os.getenv("SUPABASE_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("SUPABASE_RETRY_BASE_DELAY", "0.05"))
+RETRY_MAX_DELAY = float(os.getenv("SUPABASE_RETRY_MAX_DELAY", "1"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Only reads are safe to repeat; a retried insert could apply twice
+IDEMPOTENT_ACTIONS = frozenset(["select"])
+
+# PostgREST / Postgres codes for an unavailable or overloaded database
+TRANSIENT_CODES = frozenset([
+    "PGRST000", "PGRST001", "PGRST002",
+    "57014",  # statement timeout
+    "57P01", "57P02", "57P03",  # shutdown / cannot connect now
+    "53300",  # too many connections
+    "40001", "40P01"  # serialization failure / deadlock
+])
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpen(Exception):
+    pass
+
+def is_transient(error):
+    """Whether error says the upstream is unavailable, not that the request is wrong"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        code = error.code
+        if isinstance(code, int):
+            return code >= 500
+        return code in TRANSIENT_CODES or str(code).startswith("08")
+    return False
+
+class CircuitBreaker:
+    __slots__ = ("name", "state", "failures", "opened_at", "trial", "rejected", "_lock")
+
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def before(self):
+        """Raise CircuitOpen unless a call may go through now"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= BREAKER_RESET_TIMEOUT:
+                self.state = HALF_OPEN
+                self.trial = False
+
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self.trial:
+                # One caller probes the upstream; the rest keep failing fast
+                self.trial = True
+                return
+
+            self.rejected += 1
+        raise CircuitOpen(f"Upstream unavailable for '{self.name}' (circuit open)")
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= BREAKER_FAILURE_THRESHOLD:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trial = False
+
+    def release(self):
+        # The call ended without a verdict on the upstream (e.g. our own
+        # deadline); let the next caller probe instead
+        with self._lock:
+            self.trial = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "openedSecondsAgo": round(time.monotonic() - self.opened_at, 1) if self.state != CLOSED else None
+        }
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def breaker(name):
+    if name not in _breakers:
+        with _breakers_lock:
+            if name not in _breakers:
+                _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
+
+def breaker_stats():
+    # Breakers that never saw a failure are left out
+    return {
+        name: b.stats()
+        for name, b in sorted(_breakers.items())
+        if b.state != CLOSED or b.failures or b.rejected
+    }
+
+def _reset_after_fork():
+    # Breaker state is per worker, like the connection pool it protects
+    global _breakers, _breakers_lock
+    _breakers = {}
+    _breakers_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def backoff(attempt):
+    """Full-jitter exponential backoff for retry number attempt (1-based)"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+def call(name, fn, idempotent=False):
+    """Run fn() under the breaker for name, retrying transient failures of idempotent calls"""
+    circuit = breaker(name)
+    attempts = RETRY_ATTEMPTS if idempotent else 1
+    attempt = 0
+
+    while True:
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+        circuit.before()
+        attempt += 1
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_transient(e):
+                if isinstance(e, APIError):
+                    # The upstream answered; the request itself was wrong
+                    circuit.success()
+                else:
+                    circuit.release()
+                raise
+
+            # The breaker counts calls, not attempts: only a call that used
+            # up its retries is one failure
+            delay = backoff(attempt)
+            left = remaining()
+            if attempt >= attempts or (left is not None and delay >= left):
+                circuit.failure()
+                raise
+            circuit.release()
+            time.sleep(delay)
+            continue
+
+        circuit.success()
+        return result
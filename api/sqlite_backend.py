@@ -0,0 +1,681 @@
+"""
+In-process SQLite stand-in for the Supabase/PostgREST data API.
+
+The schema is read from supabase/migrations (CREATE TABLE / CREATE INDEX
+statements), so tables, column types, defaults and indexes follow the
+real database. Query builders mimic the subset of the postgrest-py API
+used by the blueprints, which lets endpoints be benchmarked and
+load-tested offline with DATA_BACKEND=sqlite.
+
+SQLITE_MAX_ROWS, if set, caps the rows a select returns like PostgREST's
+db-max-rows does (1000 on Supabase), so code that would be silently cut
+short there is cut short here too.
+"""
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from postgrest.exceptions import APIError
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "supabase", "migrations")
+
+# Stand-ins for Postgres functions called through rpc(), keyed by name.
+# Each takes (connection, params) and returns the JSON-able result.
+FUNCTIONS = {}
+
+def register_function(name):
+    def decorator(fn):
+        FUNCTIONS[name] = fn
+        return fn
+    return decorator
+
+# Run with the connection when a backend is opened, after the schema is
+# applied; used to emulate what Postgres triggers maintain
+SETUP_HOOKS = []
+
+def register_setup(fn):
+    SETUP_HOOKS.append(fn)
+    return fn
+
+class Result:
+    """Same shape as postgrest's APIResponse: .data and .count"""
+    __slots__ = ("data", "count")
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+# ---------------------------------------------------------------- schema
+
+_TYPE_KINDS = [
+    ("BOOL", "bool"),
+    ("JSON", "json"),
+    ("INT", "integer"),
+    ("SERIAL", "integer"),
+    ("NUMERIC", "real"),
+    ("DECIMAL", "real"),
+    ("REAL", "real"),
+    ("DOUBLE", "real"),
+    ("FLOAT", "real"),
+]
+
+_SQL_TYPES = {"text": "TEXT", "integer": "INTEGER", "real": "REAL", "bool": "INTEGER", "json": "TEXT"}
+
+_CONSTRAINT_WORDS = ("PRIMARY", "UNIQUE", "CHECK", "CONSTRAINT", "FOREIGN", "EXCLUDE")
+
+def _column_kind(sql_type):
+    sql_type = sql_type.upper()
+    if sql_type.endswith("[]"):
+        return "json"
+    for prefix, kind in _TYPE_KINDS:
+        if prefix in sql_type:
+            return kind
+    return "text"
+
+def _parse_default(expr, kind, array=False):
+    expr = expr.strip()
+    lowered = expr.lower()
+    if lowered in ("uuid_generate_v4()", "gen_random_uuid()"):
+        return lambda: str(uuid.uuid4())
+    if lowered in ("now()", "current_timestamp"):
+        return lambda: datetime.now().isoformat()
+    if lowered == "current_date":
+        return lambda: datetime.now().strftime("%Y-%m-%d")
+    if lowered in ("true", "false"):
+        value = lowered == "true"
+        return lambda: value
+    if lowered == "null":
+        return None
+
+    literal = re.match(r"^'(.*)'(?:::\w+(?:\[\])?)?$", expr, re.S)
+    if literal:
+        text = literal.group(1)
+        if kind == "json":
+            # '{}' is an empty array literal for TEXT[] columns, an object for JSONB
+            value = [] if array else json.loads(text)
+            return lambda: json.loads(json.dumps(value))
+        return lambda: text
+
+    try:
+        value = int(expr) if kind in ("integer", "bool") else float(expr) if kind == "real" else expr
+    except ValueError:
+        return None
+    return lambda: value
+
+class Table:
+    __slots__ = ("name", "columns", "kinds", "defaults", "primary_key")
+
+    def __init__(self, name):
+        self.name = name
+        self.columns = []
+        self.kinds = {}
+        self.defaults = {}
+        self.primary_key = []
+
+def _split_top_level(text, sep=","):
+    parts, depth, quoted, escaped, current = [], 0, False, False, []
+    for char in text:
+        if escaped:
+            # Inside quotes a backslash makes the next character literal
+            escaped = False
+        elif quoted and char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == sep and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+def _strip_sql_comments(sql):
+    return re.sub(r"--[^\n]*", "", sql)
+
+def load_schema(migrations_dir=MIGRATIONS_DIR):
+    """
+    Parse CREATE TABLE / CREATE INDEX statements from the migrations.
+    Returns ({table: Table}, [(table, ddl)]) ready to be applied to SQLite.
+    """
+    tables, statements = {}, []
+
+    for path in sorted(glob.glob(os.path.join(migrations_dir, "*.sql"))):
+        with open(path) as f:
+            sql = _strip_sql_comments(f.read())
+
+        for match in re.finditer(r"CREATE TABLE (?:IF NOT EXISTS )?(\w+)\s*\((.*?)\);", sql, re.S | re.I):
+            name, body = match.group(1), match.group(2)
+            table = Table(name)
+            definitions = []
+
+            for item in _split_top_level(body):
+                words = item.split()
+                if words[0].upper() in _CONSTRAINT_WORDS:
+                    if words[0].upper() in ("PRIMARY", "UNIQUE"):
+                        definitions.append(item)
+                        if words[0].upper() == "PRIMARY":
+                            columns = re.search(r"\((.*?)\)", item).group(1)
+                            table.primary_key = [c.strip() for c in columns.split(",")]
+                    continue
+
+                column, sql_type = words[0], words[1]
+                kind = _column_kind(sql_type)
+                table.columns.append(column)
+                table.kinds[column] = kind
+
+                definition = f'"{column}" {_SQL_TYPES[kind]}'
+                upper = item.upper()
+                if "PRIMARY KEY" in upper:
+                    definition += " PRIMARY KEY"
+                    table.primary_key = [column]
+                elif re.search(r"\bUNIQUE\b", upper):
+                    definition += " UNIQUE"
+                definitions.append(definition)
+
+                default = re.search(r"\bDEFAULT\s+('[^']*'(?:::\w+(?:\[\])?)?|[\w.]+\(\)|[\w.-]+)", item, re.I)
+                if default:
+                    factory = _parse_default(default.group(1), kind, sql_type.endswith("[]"))
+                    if factory is not None:
+                        table.defaults[column] = factory
+
+            tables[name] = table
+            statements.append((name, f'CREATE TABLE IF NOT EXISTS "{name}" ({", ".join(definitions)})'))
+
+        for match in re.finditer(r"CREATE (UNIQUE )?INDEX (?:IF NOT EXISTS )?(\w+)\s+ON\s+(\w+)\s*(?:USING \w+\s*)?\(([^;]*?)\)\s*(WHERE [^;]*)?;", sql, re.I):
+            unique, index, table, columns, where = match.groups()
+            if unique and where:
+                # A partial unique index without its predicate would be stricter
+                continue
+            statements.append((table, f'CREATE {unique or ""}INDEX IF NOT EXISTS "{index}" ON "{table}" ({columns})'))
+
+    return tables, statements
+
+# ---------------------------------------------------------------- filters
+
+_OPERATORS = {
+    "eq": "=",
+    "neq": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+def _like_to_glob(pattern):
+    return pattern.replace("*", "%").replace("[", "[[]").replace("%", "*").replace("_", "?")
+
+class SQLiteQuery:
+    """
+    Chainable builder with the postgrest-py surface the blueprints use:
+    select / insert / update / upsert / delete, eq / neq / gt / gte / lt /
+    lte / like / ilike / in_ / is_ / filter / or_, order, limit, offset,
+    range, single.
+    """
+
+    def __init__(self, backend, table):
+        self._backend = backend
+        self._table = table
+        self._action = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._on_conflict = None
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+        self._single = False
+
+    # -- actions
+
+    def select(self, *columns, count=None):
+        self._action = "select"
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, json, *, count=None, returning=None, upsert=False):
+        self._action = "upsert" if upsert else "insert"
+        self._payload = json
+        return self
+
+    def upsert(self, json, *, count=None, returning=None, ignore_duplicates=False, on_conflict=""):
+        self._action = "upsert"
+        self._payload = json
+        self._on_conflict = on_conflict or None
+        return self
+
+    def update(self, json, *, count=None, returning=None):
+        self._action = "update"
+        self._payload = json
+        return self
+
+    def delete(self, *, count=None, returning=None):
+        self._action = "delete"
+        return self
+
+    # -- filters
+
+    def _kind(self, column):
+        table = self._backend.tables.get(self._table)
+        return table.kinds.get(column, "text") if table else "text"
+
+    def _value(self, column, value, raw=False):
+        # raw values come from filter strings (or_, filter) and are text
+        kind = self._kind(column)
+        if kind == "bool":
+            if raw:
+                return {"true": 1, "false": 0}.get(str(value).lower(), value)
+            return int(value) if isinstance(value, bool) else value
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+
+    def _condition(self, column, operator, value, raw=False):
+        negate = False
+        if operator.startswith("not."):
+            negate, operator = True, operator[4:]
+
+        quoted = f'"{column}"'
+        if operator in _OPERATORS:
+            sql, params = f"{quoted} {_OPERATORS[operator]} ?", [self._value(column, value, raw)]
+        elif operator == "ilike":
+            sql, params = f"{quoted} LIKE ?", [str(value).replace("*", "%")]
+        elif operator == "like":
+            sql, params = f"{quoted} GLOB ?", [_like_to_glob(str(value))]
+        elif operator == "in":
+            if raw:
+                value = [_unquote(v) for v in _split_top_level(str(value).strip()[1:-1])]
+            values = [self._value(column, v, raw) for v in value]
+            sql = f"{quoted} IN ({', '.join('?' for _ in values)})" if values else "0"
+            params = values
+        elif operator == "is":
+            literal = {"null": "NULL", "true": "1", "false": "0"}.get(str(value).lower(), "NULL")
+            sql, params = f"{quoted} IS {literal}", []
+        else:
+            raise APIError({"message": f"Unsupported operator: {operator}", "code": "PGRST100", "hint": None, "details": None})
+
+        if negate:
+            sql = f"NOT ({sql})"
+        return sql, params
+
+    def _add(self, sql, params):
+        self._where.append(sql)
+        self._params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self._add(*self._condition(column, "eq", value))
+
+    def neq(self, column, value):
+        return self._add(*self._condition(column, "neq", value))
+
+    def gt(self, column, value):
+        return self._add(*self._condition(column, "gt", value))
+
+    def gte(self, column, value):
+        return self._add(*self._condition(column, "gte", value))
+
+    def lt(self, column, value):
+        return self._add(*self._condition(column, "lt", value))
+
+    def lte(self, column, value):
+        return self._add(*self._condition(column, "lte", value))
+
+    def like(self, column, pattern):
+        return self._add(*self._condition(column, "like", pattern))
+
+    def ilike(self, column, pattern):
+        return self._add(*self._condition(column, "ilike", pattern))
+
+    def in_(self, column, values):
+        return self._add(*self._condition(column, "in", list(values)))
+
+    def is_(self, column, value):
+        return self._add(*self._condition(column, "is", "null" if value is None else value))
+
+    def filter(self, column, operator, criteria):
+        return self._add(*self._condition(column, operator, _unquote(str(criteria)) if operator != "in" else criteria, raw=True))
+
+    def _logic_tree(self, text, joiner):
+        clauses, params = [], []
+        for item in _split_top_level(text):
+            negate = item.startswith("not.")
+            if negate:
+                item = item[4:]
+
+            group = re.match(r"^(and|or)\((.*)\)$", item, re.S)
+            if group:
+                sql, item_params = self._logic_tree(group.group(2), " AND " if group.group(1) == "and" else " OR ")
+            else:
+                column, operator, value = item.split(".", 2)
+                if operator == "not":
+                    operator, value = value.split(".", 1)
+                    operator = "not." + operator
+                sql, item_params = self._condition(column, operator, _unquote(value) if operator not in ("in", "not.in") else value, raw=True)
+
+            clauses.append(f"NOT ({sql})" if negate else f"({sql})")
+            params.extend(item_params)
+        return joiner.join(clauses), params
+
+    def or_(self, filters, reference_table=None):
+        sql, params = self._logic_tree(filters, " OR ")
+        return self._add(f"({sql})", params)
+
+    # -- modifiers
+
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        # Postgres puts NULLs last ascending and first descending
+        nulls_first = desc if nullsfirst is None else nullsfirst
+        self._order.append(f'"{column}" {"DESC" if desc else "ASC"} NULLS {"FIRST" if nulls_first else "LAST"}')
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self._limit = size
+        return self
+
+    def offset(self, size):
+        self._offset = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    # -- execution
+
+    def execute(self):
+        return self._backend.run(self)
+
+    def _where_sql(self):
+        return f" WHERE {' AND '.join(self._where)}" if self._where else ""
+
+class RPCQuery:
+    def __init__(self, backend, name, params):
+        self._backend = backend
+        self._name = name
+        self._params = params or {}
+
+    def execute(self):
+        return self._backend.call(self._name, self._params)
+
+class SQLiteBackend:
+    """
+    Holds one SQLite connection (shared across threads behind a lock) and
+    executes SQLiteQuery / RPCQuery builders against it.
+    """
+
+    def __init__(self, path=":memory:", migrations_dir=MIGRATIONS_DIR, max_rows=None):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.max_rows = max_rows
+        self.connection.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.tables, statements = load_schema(migrations_dir)
+        self.adhoc_tables = set()
+
+        with self.lock, self.connection:
+            for _, ddl in statements:
+                self.connection.execute(ddl)
+            for setup in SETUP_HOOKS:
+                setup(self.connection)
+
+    def table(self, name):
+        return SQLiteQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        return RPCQuery(self, name, params)
+
+    def call(self, name, params):
+        fn = FUNCTIONS.get(name)
+        if fn is None:
+            raise APIError({"message": f"Could not find the function public.{name}", "code": "PGRST202", "hint": None, "details": None})
+        with self.lock, self.connection:
+            return Result(fn(self.connection, params))
+
+    # -- schema helpers
+
+    def _table(self, name, columns=()):
+        """
+        Tables not declared in the migrations are created on first use,
+        with columns added as rows bring new keys.
+        """
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = Table(name)
+            table.columns.append("id")
+            table.kinds["id"] = "text"
+            table.primary_key = ["id"]
+            table.defaults["id"] = lambda: str(uuid.uuid4())
+            self.adhoc_tables.add(name)
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ("id" TEXT PRIMARY KEY)')
+
+        for column in columns:
+            if column in table.kinds:
+                continue
+            if name not in self.adhoc_tables:
+                raise APIError({"message": f"Could not find the '{column}' column of '{name}' in the schema cache", "code": "PGRST204", "hint": None, "details": None})
+            table.columns.append(column)
+            table.kinds[column] = "text"
+            self.connection.execute(f'ALTER TABLE "{name}" ADD COLUMN "{column}"')
+        return table
+
+    def _encode(self, table, column, value):
+        kind = table.kinds.get(column, "text")
+        if value is None:
+            return None
+        if kind == "json" or isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    def _decode(self, table, column, value):
+        if value is None:
+            return None
+        kind = table.kinds.get(column, "text")
+        if kind == "json":
+            return json.loads(value)
+        if kind == "bool":
+            return bool(value)
+        return value
+
+    def _decode_row(self, table, row, columns=None):
+        keys = row.keys()
+        return {key: self._decode(table, key, row[key]) for key in keys if columns is None or key in columns}
+
+    # -- select helpers
+
+    def _parse_select(self, columns):
+        plain, embeds = [], []
+        for item in _split_top_level(columns.replace("\n", " ")):
+            embed = re.match(r"^(\w+)(?:!\w+)?\((.*)\)$", item, re.S)
+            if embed:
+                embeds.append((embed.group(1), embed.group(2) or "*"))
+            else:
+                plain.append(item.strip())
+        return plain, embeds
+
+    def _embed(self, table, rows, relation, columns):
+        # Many-to-one via <relation singular>_id on this table, or one-to-many
+        # via <this table singular>_id on the related table
+        related = self.tables.get(relation)
+        plain, _ = self._parse_select(columns)
+        forward = relation.rstrip("s") + "_id"
+        backward = table.name.rstrip("s") + "_id"
+
+        if related is not None and forward in table.kinds:
+            key, many = "id", False
+            values = list({row[forward] for row in rows if row.get(forward) is not None})
+        elif related is not None and backward in related.kinds:
+            key, many = backward, True
+            values = [row["id"] for row in rows]
+        else:
+            raise APIError({"message": f"Could not find a relationship between '{table.name}' and '{relation}'", "code": "PGRST200", "hint": None, "details": None})
+
+        query = SQLiteQuery(self, relation).select(columns).in_(key, values)
+        grouped = {}
+        for item in self._select(query, keep=[key]):
+            value = item[key] if "*" in plain or key in plain else item.pop(key)
+            grouped.setdefault(value, []).append(item)
+
+        for row in rows:
+            if many:
+                row[relation] = grouped.get(row["id"], [])
+            else:
+                row[relation] = grouped.get(row.get(forward), [None])[0]
+
+    def _select(self, query, keep=(), capped=False):
+        table = self._table(query._table)
+        plain, embeds = self._parse_select(query._columns)
+        wanted = None if "*" in plain else set(plain)
+
+        limit = query._limit
+        if capped and self.max_rows is not None:
+            # Top-level results only, as with PostgREST's db-max-rows
+            limit = self.max_rows if limit is None else min(int(limit), self.max_rows)
+
+        sql = f'SELECT * FROM "{table.name}"{query._where_sql()}'
+        if query._order:
+            sql += " ORDER BY " + ", ".join(query._order)
+        if limit is not None or query._offset is not None:
+            sql += f" LIMIT {int(limit) if limit is not None else -1} OFFSET {int(query._offset or 0)}"
+
+        cursor = self.connection.execute(sql, query._params)
+        fetch = None if wanted is None else wanted | set(keep) | {"id"} | {r.rstrip("s") + "_id" for r, _ in embeds}
+        rows = [self._decode_row(table, row, fetch) for row in cursor.fetchall()]
+
+        for relation, columns in embeds:
+            self._embed(table, rows, relation, columns)
+
+        if wanted is not None:
+            hidden = (fetch - wanted) - set(keep)
+            for row in rows:
+                for column in hidden:
+                    row.pop(column, None)
+        return rows
+
+    def _count(self, query):
+        cursor = self.connection.execute(f'SELECT COUNT(*) FROM "{query._table}"{query._where_sql()}', query._params)
+        return cursor.fetchone()[0]
+
+    def _rowids(self, query):
+        cursor = self.connection.execute(f'SELECT rowid FROM "{query._table}"{query._where_sql()}', query._params)
+        return [row[0] for row in cursor.fetchall()]
+
+    def _rows_by_rowid(self, table, rowids):
+        if not rowids:
+            return []
+        placeholders = ", ".join("?" for _ in rowids)
+        cursor = self.connection.execute(f'SELECT * FROM "{table.name}" WHERE rowid IN ({placeholders})', rowids)
+        return [self._decode_row(table, row) for row in cursor.fetchall()]
+
+    # -- writes
+
+    def _insert(self, query, upsert=False):
+        rows = query._payload if isinstance(query._payload, list) else [query._payload]
+        table = self._table(query._table, {key for row in rows for key in row})
+        rowids = []
+
+        for row in rows:
+            values = dict(row)
+            for column, factory in table.defaults.items():
+                if column not in values:
+                    values[column] = factory()
+
+            columns = list(values)
+            quoted = ", ".join(f'"{c}"' for c in columns)
+            placeholders = ", ".join("?" for _ in columns)
+            sql = f'INSERT INTO "{table.name}" ({quoted}) VALUES ({placeholders})'
+
+            if upsert:
+                conflict = [c.strip() for c in query._on_conflict.split(",")] if query._on_conflict else table.primary_key
+                updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c not in conflict)
+                sql += f' ON CONFLICT ({", ".join(conflict)}) DO ' + (f"UPDATE SET {updates}" if updates else "NOTHING")
+                sql += " RETURNING rowid"
+                cursor = self.connection.execute(sql, [self._encode(table, c, values[c]) for c in columns])
+                returned = cursor.fetchone()
+                if returned:
+                    rowids.append(returned[0])
+            else:
+                try:
+                    cursor = self.connection.execute(sql, [self._encode(table, c, values[c]) for c in columns])
+                except sqlite3.IntegrityError as e:
+                    raise APIError({"message": str(e), "code": "23505", "hint": None, "details": None})
+                rowids.append(cursor.lastrowid)
+
+        return self._rows_by_rowid(table, rowids)
+
+    def _update(self, query):
+        table = self._table(query._table, set(query._payload))
+        rowids = self._rowids(query)
+        if rowids:
+            assignments = ", ".join(f'"{c}" = ?' for c in query._payload)
+            params = [self._encode(table, c, v) for c, v in query._payload.items()]
+            placeholders = ", ".join("?" for _ in rowids)
+            self.connection.execute(f'UPDATE "{table.name}" SET {assignments} WHERE rowid IN ({placeholders})', params + rowids)
+        return self._rows_by_rowid(table, rowids)
+
+    def _delete(self, query):
+        table = self._table(query._table)
+        rowids = self._rowids(query)
+        rows = self._rows_by_rowid(table, rowids)
+        if rowids:
+            placeholders = ", ".join("?" for _ in rowids)
+            self.connection.execute(f'DELETE FROM "{table.name}" WHERE rowid IN ({placeholders})', rowids)
+        return rows
+
+    def run(self, query):
+        with self.lock, self.connection:
+            count = None
+            if query._action == "select":
+                self._table(query._table)
+                data = self._select(query, capped=True)
+                if query._count:
+                    count = self._count(query)
+            elif query._action == "insert":
+                data = self._insert(query)
+            elif query._action == "upsert":
+                data = self._insert(query, upsert=True)
+            elif query._action == "update":
+                data = self._update(query)
+            else:
+                data = self._delete(query)
+
+        if query._single:
+            if len(data) != 1:
+                raise APIError({
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "code": "PGRST116",
+                    "hint": None,
+                    "details": f"The result contains {len(data)} rows"
+                })
+            data = data[0]
+
+        return Result(data, count)
+
+# Stand-ins and setup hooks register themselves on import
+from . import sqlite_functions  # noqa: E402,F401
@@ -0,0 +1,291 @@
+"""
+SQLite versions of the Postgres functions defined in supabase/migrations,
+so db.rpc() calls work against DATA_BACKEND=sqlite. Each must return what
+the Postgres function returns through PostgREST.
+"""
+from .sqlite_backend import register_function, register_setup
+
+# -- billing_daily_rollups (20250722090000_billing_daily_rollups.sql)
+
+# One invoice's contribution, added (sign 1) or removed (sign -1); {row}
+# is NEW or OLD inside the triggers. Column defaults are applied by the
+# backend on insert, not by SQLite, so every column is written here.
+_ROLLUP_APPLY = """
+INSERT INTO billing_daily_rollups
+  (client_id, day, doctor_id, payment_mode, invoice_count, invoiced, paid_count, paid_amount, outstanding, refunded, collected)
+SELECT {row}.client_id, substr({row}.created_at, 1, 10), COALESCE({row}.doctor_id, ''), COALESCE({row}.payment_mode, ''),
+       {sign},
+       {sign} * COALESCE({row}.total_amount, 0),
+       CASE WHEN {row}.status = 'paid' THEN {sign} ELSE 0 END,
+       CASE WHEN {row}.status = 'paid' THEN {sign} * COALESCE({row}.paid_amount, 0) ELSE 0 END,
+       CASE WHEN {row}.status IN ('sent', 'partially-paid', 'overdue') THEN {sign} * COALESCE({row}.balance_amount, 0) ELSE 0 END,
+       CASE WHEN {row}.status = 'refunded' THEN {sign} * COALESCE({row}.refund_amount, 0) ELSE 0 END,
+       0
+WHERE {row}.created_at IS NOT NULL
+ON CONFLICT (client_id, day, doctor_id, payment_mode) DO UPDATE SET
+  invoice_count = invoice_count + excluded.invoice_count,
+  invoiced = invoiced + excluded.invoiced,
+  paid_count = paid_count + excluded.paid_count,
+  paid_amount = paid_amount + excluded.paid_amount,
+  outstanding = outstanding + excluded.outstanding,
+  refunded = refunded + excluded.refunded;
+
+INSERT INTO billing_daily_rollups
+  (client_id, day, doctor_id, payment_mode, invoice_count, invoiced, paid_count, paid_amount, outstanding, refunded, collected)
+SELECT {row}.client_id, substr({row}.paid_at, 1, 10), COALESCE({row}.doctor_id, ''), COALESCE({row}.payment_mode, ''),
+       0, 0, 0, 0, 0, 0, {sign} * COALESCE({row}.paid_amount, 0)
+WHERE {row}.status = 'paid' AND {row}.paid_at IS NOT NULL
+ON CONFLICT (client_id, day, doctor_id, payment_mode) DO UPDATE SET
+  collected = collected + excluded.collected;
+
+INSERT INTO billing_daily_patients (client_id, day, patient_id, invoice_count)
+SELECT {row}.client_id, substr({row}.created_at, 1, 10), COALESCE({row}.patient_id, ''), {sign}
+WHERE {row}.created_at IS NOT NULL
+ON CONFLICT (client_id, day, patient_id) DO UPDATE SET
+  invoice_count = invoice_count + excluded.invoice_count;
+
+DELETE FROM billing_daily_patients
+WHERE client_id = {row}.client_id AND day = substr({row}.created_at, 1, 10)
+  AND patient_id = COALESCE({row}.patient_id, '') AND invoice_count <= 0;
+"""
+
+_ROLLUP_TRIGGERS = {
+    "invoices_billing_rollup_insert": ("AFTER INSERT", [("NEW", 1)]),
+    "invoices_billing_rollup_update": ("AFTER UPDATE", [("OLD", -1), ("NEW", 1)]),
+    "invoices_billing_rollup_delete": ("AFTER DELETE", [("OLD", -1)])
+}
+
+@register_setup
+def billing_rollup_triggers(connection):
+    existing = dict(connection.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"))
+    installed = False
+
+    for name, (event, applies) in _ROLLUP_TRIGGERS.items():
+        body = "".join(_ROLLUP_APPLY.format(row=row, sign=sign) for row, sign in applies)
+        sql = f"CREATE TRIGGER {name} {event} ON invoices BEGIN {body} END"
+        if existing.get(name) == sql:
+            continue
+        # Databases created before a change to the trigger body get the new one
+        connection.execute(f"DROP TRIGGER IF EXISTS {name}")
+        connection.execute(sql)
+        installed = True
+
+    # Like the migration, backfill when the triggers are (re)installed
+    if installed:
+        rebuild_billing_rollups(connection, {})
+
+@register_function("rebuild_billing_rollups")
+def rebuild_billing_rollups(connection, params):
+    client_id = params.get("p_client_id")
+    scope = {"client_id": client_id}
+    where = "(:client_id IS NULL OR client_id = :client_id)"
+
+    connection.execute(f"DELETE FROM billing_daily_rollups WHERE {where}", scope)
+    connection.execute(f"DELETE FROM billing_daily_patients WHERE {where}", scope)
+
+    rebuilt = connection.execute(f"""
+        INSERT INTO billing_daily_rollups
+          (client_id, day, doctor_id, payment_mode, invoice_count, invoiced, paid_count, paid_amount, outstanding, refunded, collected)
+        SELECT client_id, day, doctor_id, payment_mode,
+               SUM(invoice_count), SUM(invoiced), SUM(paid_count), SUM(paid_amount), SUM(outstanding), SUM(refunded), SUM(collected)
+        FROM (
+          SELECT client_id, substr(created_at, 1, 10) AS day, COALESCE(doctor_id, '') AS doctor_id,
+                 COALESCE(payment_mode, '') AS payment_mode,
+                 1 AS invoice_count,
+                 COALESCE(total_amount, 0) AS invoiced,
+                 CASE WHEN status = 'paid' THEN 1 ELSE 0 END AS paid_count,
+                 CASE WHEN status = 'paid' THEN COALESCE(paid_amount, 0) ELSE 0 END AS paid_amount,
+                 CASE WHEN status IN ('sent', 'partially-paid', 'overdue') THEN COALESCE(balance_amount, 0) ELSE 0 END AS outstanding,
+                 CASE WHEN status = 'refunded' THEN COALESCE(refund_amount, 0) ELSE 0 END AS refunded,
+                 0 AS collected
+          FROM invoices
+          WHERE created_at IS NOT NULL AND {where}
+          UNION ALL
+          SELECT client_id, substr(paid_at, 1, 10), COALESCE(doctor_id, ''), COALESCE(payment_mode, ''),
+                 0, 0, 0, 0, 0, 0, COALESCE(paid_amount, 0)
+          FROM invoices
+          WHERE status = 'paid' AND paid_at IS NOT NULL AND {where}
+        )
+        GROUP BY client_id, day, doctor_id, payment_mode
+    """, scope).rowcount
+
+    connection.execute(f"""
+        INSERT INTO billing_daily_patients (client_id, day, patient_id, invoice_count)
+        SELECT client_id, substr(created_at, 1, 10), COALESCE(patient_id, ''), COUNT(*)
+        FROM invoices
+        WHERE created_at IS NOT NULL AND {where}
+        GROUP BY 1, 2, 3
+    """, scope)
+
+    return rebuilt
+
+# -- billing_stats (as redefined over the rollups in 20250722090000_billing_daily_rollups.sql)
+
+@register_function("billing_stats")
+def billing_stats(connection, params):
+    today = params["p_day_start"][:10]
+    row = connection.execute(
+        """
+        SELECT
+          COALESCE(SUM(CASE WHEN day = :today THEN paid_amount END), 0),
+          COALESCE(SUM(CASE WHEN day = :today THEN invoice_count END), 0),
+          COALESCE(SUM(outstanding), 0),
+          COALESCE(SUM(CASE WHEN day = :today THEN refunded END), 0),
+          COALESCE(SUM(paid_amount), 0),
+          COALESCE(SUM(paid_amount) / NULLIF(SUM(paid_count), 0), 0)
+        FROM billing_daily_rollups
+        WHERE client_id = :client_id
+        """,
+        {"client_id": params["p_client_id"], "today": today}
+    ).fetchone()
+
+    keys = ("todayRevenue", "invoicesGenerated", "pendingPayments", "refundedToday", "totalRevenue", "averageInvoiceValue")
+    return dict(zip(keys, tuple(row)))
+
+# -- crm_lead_counts (20250724090000_crm_lead_counts.sql)
+
+@register_function("crm_lead_counts")
+def crm_lead_counts(connection, params):
+    rows = connection.execute(
+        """
+        SELECT status, source, COUNT(*),
+               COUNT(CASE WHEN status = 'contacted' AND updated_at < :before THEN 1 END)
+        FROM leads
+        WHERE client_id = :client_id
+        GROUP BY status, source
+        """,
+        {"client_id": params["p_client_id"], "before": params["p_follow_up_before"]}
+    ).fetchall()
+
+    return [
+        {"status": status, "source": source, "leads": leads, "follow_ups_due": follow_ups_due}
+        for status, source, leads, follow_ups_due in rows
+    ]
+
+# -- inventory summary (20250726090000_inventory_summary.sql)
+
+# One active product's contribution, added (sign 1) or removed (sign -1)
+_SUMMARY_APPLY = """
+INSERT INTO inventory_category_summary (client_id, category, product_count, low_stock_count, stock_value)
+SELECT {row}.client_id, {row}.category,
+       {sign},
+       CASE WHEN {row}.current_stock <= {row}.min_stock_level THEN {sign} ELSE 0 END,
+       {sign} * {row}.current_stock * {row}.cost_price
+WHERE {row}.is_active
+ON CONFLICT (client_id, category) DO UPDATE SET
+  product_count = product_count + excluded.product_count,
+  low_stock_count = low_stock_count + excluded.low_stock_count,
+  stock_value = stock_value + excluded.stock_value;
+"""
+
+# One log entry's contribution to the daily auto-deduct counters
+_USAGE_APPLY = """
+INSERT INTO inventory_daily_usage (client_id, day, auto_deduct_count, auto_deduct_quantity)
+SELECT {row}.client_id, substr({row}.created_at, 1, 10), {sign}, {sign} * {row}.quantity
+WHERE {row}.type = 'auto-deduct'
+ON CONFLICT (client_id, day) DO UPDATE SET
+  auto_deduct_count = auto_deduct_count + excluded.auto_deduct_count,
+  auto_deduct_quantity = auto_deduct_quantity + excluded.auto_deduct_quantity;
+"""
+
+_SUMMARY_COLUMNS = "client_id, category, is_active, current_stock, min_stock_level, cost_price"
+_USAGE_COLUMNS = "client_id, type, quantity, created_at"
+
+_SUMMARY_TRIGGERS = {
+    "products_inventory_summary_insert": ("AFTER INSERT ON products", _SUMMARY_APPLY, [("NEW", 1)]),
+    "products_inventory_summary_update": (f"AFTER UPDATE OF {_SUMMARY_COLUMNS} ON products", _SUMMARY_APPLY, [("OLD", -1), ("NEW", 1)]),
+    "products_inventory_summary_delete": ("AFTER DELETE ON products", _SUMMARY_APPLY, [("OLD", -1)]),
+    "inventory_logs_usage_insert": ("AFTER INSERT ON inventory_logs", _USAGE_APPLY, [("NEW", 1)]),
+    "inventory_logs_usage_update": (f"AFTER UPDATE OF {_USAGE_COLUMNS} ON inventory_logs", _USAGE_APPLY, [("OLD", -1), ("NEW", 1)]),
+    "inventory_logs_usage_delete": ("AFTER DELETE ON inventory_logs", _USAGE_APPLY, [("OLD", -1)])
+}
+
+@register_setup
+def inventory_summary_triggers(connection):
+    existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+    for name, (event, apply, applies) in _SUMMARY_TRIGGERS.items():
+        if name in existing:
+            continue
+        body = "".join(apply.format(row=row, sign=sign) for row, sign in applies)
+        connection.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+    if not existing.issuperset(_SUMMARY_TRIGGERS):
+        rebuild_inventory_summary(connection, {})
+
+@register_function("rebuild_inventory_summary")
+def rebuild_inventory_summary(connection, params):
+    scope = {"client_id": params.get("p_client_id")}
+    where = "(:client_id IS NULL OR client_id = :client_id)"
+
+    connection.execute(f"DELETE FROM inventory_category_summary WHERE {where}", scope)
+    connection.execute(f"DELETE FROM inventory_daily_usage WHERE {where}", scope)
+
+    rebuilt = connection.execute(f"""
+        INSERT INTO inventory_category_summary (client_id, category, product_count, low_stock_count, stock_value)
+        SELECT client_id, category,
+               COUNT(*),
+               COUNT(CASE WHEN current_stock <= min_stock_level THEN 1 END),
+               SUM(current_stock * cost_price)
+        FROM products
+        WHERE is_active AND {where}
+        GROUP BY client_id, category
+    """, scope).rowcount
+
+    connection.execute(f"""
+        INSERT INTO inventory_daily_usage (client_id, day, auto_deduct_count, auto_deduct_quantity)
+        SELECT client_id, substr(created_at, 1, 10), COUNT(*), SUM(quantity)
+        FROM inventory_logs
+        WHERE type = 'auto-deduct' AND {where}
+        GROUP BY 1, 2
+    """, scope)
+
+    return rebuilt
+
+@register_function("inventory_stats")
+def inventory_stats(connection, params):
+    scope = {
+        "client_id": params["p_client_id"],
+        "today": params["p_day_start"][:10],
+        "expiry_before": params["p_expiry_before"]
+    }
+    row = connection.execute(
+        """
+        SELECT
+          COALESCE(SUM(product_count), 0),
+          COALESCE(SUM(low_stock_count), 0),
+          (SELECT COUNT(*) FROM products
+           WHERE client_id = :client_id AND is_active AND expiry_date <> '' AND expiry_date <= :expiry_before),
+          COALESCE((SELECT auto_deduct_count FROM inventory_daily_usage
+                    WHERE client_id = :client_id AND day = :today), 0),
+          COALESCE(SUM(stock_value), 0),
+          COUNT(CASE WHEN product_count > 0 THEN 1 END)
+        FROM inventory_category_summary
+        WHERE client_id = :client_id
+        """,
+        scope
+    ).fetchone()
+
+    keys = ("totalProducts", "lowStockAlerts", "expiringSoon", "autoDeductToday", "totalValue", "categoriesCount")
+    return dict(zip(keys, tuple(row)))
+
+# -- hr_headcount (20250728090000_hr_headcount.sql)
+
+@register_function("hr_headcount")
+def hr_headcount(connection, params):
+    rows = connection.execute(
+        """
+        SELECT department, branch, COUNT(*),
+               COUNT(CASE WHEN substr(join_date, 1, length(:month)) = :month THEN 1 END)
+        FROM staff
+        WHERE client_id = :client_id
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """,
+        {"client_id": params["p_client_id"], "month": params["p_month"]}
+    ).fetchall()
+
+    return [
+        {"department": department, "branch": branch, "staff": staff, "new_joins": new_joins}
+        for department, branch, staff, new_joins in rows
+    ]
@@ -0,0 +1,67 @@
+"""
+Streamed JSON array responses.
+
+A list endpoint called with ?stream=true returns every matching row as
+one JSON array, but neither the rows nor the encoded body are held in
+full: rows are fetched in chunks (see pagination.iter_keyset) and encoded
+as the response is written.
+
+The first chunk is fetched before the response starts, so bad requests
+and upstream errors still get a proper status code. A failure after that
+can only cut the body short, which leaves it invalid JSON; clients
+detect the truncation when parsing. Only the first chunk shows up in
+Server-Timing and the round-trip budget; the rest are fetched after the
+headers have gone out.
+"""
+from flask import Response, current_app, request, stream_with_context
+from .fanout import start_deadline
+import logging
+import os
+
+# Rows per upstream query while streaming
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "500"))
+
+# Rows encoded per write to the socket
+STREAM_BUFFER_ROWS = int(os.getenv("STREAM_BUFFER_ROWS", "100"))
+
+logger = logging.getLogger("api.streaming")
+
+def wants_stream():
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+def stream_json_array(rows):
+    """Encode an iterable of rows as a JSON array, a few rows per piece"""
+    dumps = current_app.json.dumps
+    buffer = ["["]
+    separator = ""
+    for row in rows:
+        buffer.append(separator)
+        buffer.append(dumps(row))
+        separator = ","
+        if len(buffer) >= 2 * STREAM_BUFFER_ROWS:
+            yield "".join(buffer)
+            buffer = []
+    buffer.append("]")
+    yield "".join(buffer)
+
+def stream_response(chunks):
+    """Streamed 200 response for an iterator of row lists"""
+    chunks = iter(chunks)
+    first = next(chunks, [])
+
+    def rows():
+        yield from first
+        try:
+            while True:
+                # The request deadline bounds each upstream call, not the
+                # whole transfer, which can outlast it on big tenants
+                start_deadline()
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield from chunk
+        except Exception:
+            logger.exception("Streaming %s failed after the response started", request.path)
+            raise
+
+    return Response(stream_with_context(stream_json_array(rows())), mimetype="application/json")
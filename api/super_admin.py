@@ -1,5 +1,12 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db, pool_stats
+from .middleware import invalidate_tenant, tenant_cache, unknown_tenant_cache
+from .principal import require_principal, invalidate_client_profiles, profile_cache
+from .tokens import verified_tokens
+from .pagination import Page, InvalidPageRequest, iter_rows
+from .fields import SYSTEM_LOG_FIELDS, USAGE_LOG_FIELDS, InvalidFields
+from .resilience import breaker_stats
+import os
 import uuid
 from datetime import datetime, timedelta
 
@@ -7,31 +14,24 @@ super_admin_bp = Blueprint("super_admin", __name__)
 
 # Middleware to check if user is super admin
 def require_super_admin():
-    auth_header = request.headers.get("Authorization")
-    
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Missing or invalid authorization header"}), 401
-        
-    token = auth_header.split(" ")[1]
-    
     try:
-        # Verify token and get user
-        user = supabase.auth.get_user(token)
-        
-        if not user:
-            return jsonify({"error": "Invalid token"}), 401
-            
-        # Get user profile
-        profile = supabase.table("user_profiles").select("*") \
-                .eq("auth_user_id", user.user.id).single().execute()
+        # Token and profile are resolved once per request and shared
+        principal, auth_error = require_principal()
+        if auth_error:
+            return auth_error
                 
-        if not profile.data or profile.data["role"] != "super_admin":
+        if not principal.profile or principal.role != "super_admin":
             return jsonify({"error": "Unauthorized - Super Admin access required"}), 403
             
         return None
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Names of the modules switched on in a clients.modules map. Tenants are
+# resolved from modules_enabled, so every write of modules sets both.
+def enabled_modules(modules):
+    return [name for name, enabled in modules.items() if enabled]
+
 # Get all clients
 @super_admin_bp.route("/super-admin/clients", methods=["GET"])
 def get_all_clients():
@@ -41,7 +41,7 @@ def get_all_clients():
         
     try:
         # Apply filters if provided
-        query = supabase.table("clients").select("*")
+        query = db.table("clients").select("*")
         
         plan = request.args.get("plan")
         if plan and plan != "all":
@@ -69,13 +69,13 @@ def get_client_details(client_id):
         return auth_error
         
     try:
-        result = supabase.table("clients").select("*").eq("id", client_id).single().execute()
+        result = db.table("clients").select("*").eq("id", client_id).single().execute()
         
         if not result.data:
             return jsonify({"error": "Client not found"}), 404
             
         # Get client branches
-        branches = supabase.table("client_branches").select("*").eq("client_id", client_id).execute()
+        branches = db.table("client_branches").select("*").eq("client_id", client_id).execute()
         
         # Combine data
         client_data = result.data
@@ -119,12 +119,14 @@ def create_client():
             "contact_email": data.get("contact_email"),
             "contact_phone": data.get("contact_phone"),
             "modules": data.get("modules", {}),
+            "modules_enabled": enabled_modules(data.get("modules", {})),
             "api_usage": 0,
             "active_users": 0
         }
         
         # Insert client
-        client_result = supabase.table("clients").insert(client_data).execute()
+        client_result = db.table("clients").insert(client_data).execute()
+        invalidate_tenant(subdomain=client_data["subdomain"])
         
         # Insert branches if provided
         branches = data.get("branches", [])
@@ -133,7 +135,7 @@ def create_client():
                 branch["client_id"] = client_id
                 branch["created_at"] = created_at
                 
-            supabase.table("client_branches").insert(branches).execute()
+            db.table("client_branches").insert(branches).execute()
         
         return jsonify(client_result.data[0]), 201
     except Exception as e:
@@ -154,7 +156,7 @@ def toggle_client_module(client_id):
             return jsonify({"error": "Module name is required"}), 400
             
         # Get current client data
-        client = supabase.table("clients").select("*").eq("id", client_id).single().execute()
+        client = db.table("clients").select("*").eq("id", client_id).single().execute()
         
         if not client.data:
             return jsonify({"error": "Client not found"}), 404
@@ -164,7 +166,12 @@ def toggle_client_module(client_id):
         modules[module] = enabled
         
         # Update client
-        result = supabase.table("clients").update({"modules": modules}).eq("id", client_id).execute()
+        result = db.table("clients").update({
+            "modules": modules,
+            "modules_enabled": enabled_modules(modules)
+        }).eq("id", client_id).execute()
+        invalidate_tenant(client_id)
+        invalidate_client_profiles(client_id)
         
         return jsonify(result.data[0]), 200
     except Exception as e:
@@ -181,7 +188,7 @@ def set_client_dashboards(client_id):
         dashboards = request.json.get("dashboards", [])
         
         # Get current client data
-        client = supabase.table("clients").select("*").eq("id", client_id).single().execute()
+        client = db.table("clients").select("*").eq("id", client_id).single().execute()
         
         if not client.data:
             return jsonify({"error": "Client not found"}), 404
@@ -199,7 +206,12 @@ def set_client_dashboards(client_id):
             modules[dashboard] = True
             
         # Update client
-        result = supabase.table("clients").update({"modules": modules}).eq("id", client_id).execute()
+        result = db.table("clients").update({
+            "modules": modules,
+            "modules_enabled": enabled_modules(modules)
+        }).eq("id", client_id).execute()
+        invalidate_tenant(client_id)
+        invalidate_client_profiles(client_id)
         
         return jsonify(result.data[0]), 200
     except Exception as e:
@@ -220,7 +232,7 @@ def assign_role_permissions(client_id):
             return jsonify({"error": "Role is required"}), 400
             
         # Get current client data
-        client = supabase.table("clients").select("*").eq("id", client_id).single().execute()
+        client = db.table("clients").select("*").eq("id", client_id).single().execute()
         
         if not client.data:
             return jsonify({"error": "Client not found"}), 404
@@ -230,7 +242,9 @@ def assign_role_permissions(client_id):
         role_permissions[role] = permissions
         
         # Update client
-        result = supabase.table("clients").update({"role_permissions": role_permissions}).eq("id", client_id).execute()
+        result = db.table("clients").update({"role_permissions": role_permissions}).eq("id", client_id).execute()
+        invalidate_tenant(client_id)
+        invalidate_client_profiles(client_id)
         
         return jsonify({"role": role, "permissions": permissions}), 200
     except Exception as e:
@@ -250,7 +264,9 @@ def update_client_status(client_id):
             return jsonify({"error": "Status is required"}), 400
             
         # Update client
-        result = supabase.table("clients").update({"status": status}).eq("id", client_id).execute()
+        result = db.table("clients").update({"status": status}).eq("id", client_id).execute()
+        invalidate_tenant(client_id)
+        invalidate_client_profiles(client_id)
         
         if not result.data:
             return jsonify({"error": "Client not found"}), 404
@@ -267,25 +283,32 @@ def get_client_usage_logs(client_id):
         return auth_error
         
     try:
-        # Apply filters if provided
-        query = supabase.table("usage_logs").select("*").eq("client_id", client_id)
+        page = Page.from_request()
+        columns = USAGE_LOG_FIELDS.from_request("id", "timestamp")
         
-        date_from = request.args.get("date_from")
-        date_to = request.args.get("date_to")
-        
-        if date_from and date_to:
-            query = query.gte("timestamp", date_from).lte("timestamp", date_to)
-            
-        search = request.args.get("search")
-        if search:
-            query = query.or_(f"endpoint.ilike.%{search}%,method.ilike.%{search}%,ip_address.ilike.%{search}%")
-            
-        # Order by timestamp (newest first)
-        query = query.order("timestamp", desc=True)
+        # Filters from the query string; rebuilt per chunk when streaming
+        def usage_logs():
+            query = db.table("usage_logs").select(columns, count=page.count).eq("client_id", client_id)
         
-        result = query.execute()
+            date_from = request.args.get("date_from")
+            date_to = request.args.get("date_to")
         
-        return jsonify(result.data), 200
+            if date_from and date_to:
+                query = query.gte("timestamp", date_from).lte("timestamp", date_to)
+            
+            search = request.args.get("search")
+            if search:
+                query = query.or_(f"endpoint.ilike.%{search}%,method.ilike.%{search}%,ip_address.ilike.%{search}%")
+            return query
+        
+        # Order by timestamp (newest first): streamed in full, or one page at a time
+        if page.stream:
+            return page.stream_response(usage_logs, "timestamp", desc=True)
+        result = page.apply(usage_logs(), "timestamp", desc=True).execute()
+        
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -297,33 +320,40 @@ def get_system_logs():
         return auth_error
         
     try:
-        # Apply filters if provided
-        query = supabase.table("system_logs").select("*")
+        page = Page.from_request()
+        columns = SYSTEM_LOG_FIELDS.from_request("id", "timestamp")
         
-        client_id = request.args.get("client_id")
-        if client_id:
-            query = query.eq("client_id", client_id)
-            
-        log_type = request.args.get("type")
-        if log_type and log_type != "all":
-            query = query.eq("type", log_type)
-            
-        date_from = request.args.get("date_from")
-        date_to = request.args.get("date_to")
+        # Filters from the query string; rebuilt per chunk when streaming
+        def system_logs():
+            query = db.table("system_logs").select(columns, count=page.count)
         
-        if date_from and date_to:
-            query = query.gte("timestamp", date_from).lte("timestamp", date_to)
+            client_id = request.args.get("client_id")
+            if client_id:
+                query = query.eq("client_id", client_id)
             
-        search = request.args.get("search")
-        if search:
-            query = query.or_(f"action.ilike.%{search}%,details.ilike.%{search}%,ip_address.ilike.%{search}%")
+            log_type = request.args.get("type")
+            if log_type and log_type != "all":
+                query = query.eq("type", log_type)
             
-        # Order by timestamp (newest first)
-        query = query.order("timestamp", desc=True)
-        
-        result = query.execute()
+            date_from = request.args.get("date_from")
+            date_to = request.args.get("date_to")
         
-        return jsonify(result.data), 200
+            if date_from and date_to:
+                query = query.gte("timestamp", date_from).lte("timestamp", date_to)
+            
+            search = request.args.get("search")
+            if search:
+                query = query.or_(f"action.ilike.%{search}%,details.ilike.%{search}%,ip_address.ilike.%{search}%")
+            return query
+        
+        # Order by timestamp (newest first): streamed in full, or one page at a time
+        if page.stream:
+            return page.stream_response(system_logs, "timestamp", desc=True)
+        result = page.apply(system_logs(), "timestamp", desc=True).execute()
+        
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -336,7 +366,7 @@ def get_support_tickets():
         
     try:
         # Apply filters if provided
-        query = supabase.table("support_tickets").select("*")
+        query = db.table("support_tickets").select("*")
         
         status = request.args.get("status")
         if status and status != "all":
@@ -360,13 +390,13 @@ def get_support_ticket_details(ticket_id):
         
     try:
         # Get ticket
-        ticket = supabase.table("support_tickets").select("*").eq("id", ticket_id).single().execute()
+        ticket = db.table("support_tickets").select("*").eq("id", ticket_id).single().execute()
         
         if not ticket.data:
             return jsonify({"error": "Support ticket not found"}), 404
             
         # Get ticket messages
-        messages = supabase.table("ticket_messages").select("*").eq("ticket_id", ticket_id).order("timestamp", desc=False).execute()
+        messages = db.table("ticket_messages").select("*").eq("ticket_id", ticket_id).order("timestamp", desc=False).execute()
         
         # Combine data
         ticket_data = ticket.data
@@ -387,7 +417,7 @@ def update_support_ticket(ticket_id):
         updates = request.json
         
         # Update ticket
-        result = supabase.table("support_tickets").update({
+        result = db.table("support_tickets").update({
             **updates,
             "updated_at": datetime.now().isoformat()
         }).eq("id", ticket_id).execute()
@@ -424,16 +454,16 @@ def add_support_ticket_message(ticket_id):
             "timestamp": datetime.now().isoformat()
         }
         
-        message_result = supabase.table("ticket_messages").insert(message_data).execute()
+        message_result = db.table("ticket_messages").insert(message_data).execute()
         
         # Update ticket updated_at
-        supabase.table("support_tickets").update({
+        db.table("support_tickets").update({
             "updated_at": datetime.now().isoformat()
         }).eq("id", ticket_id).execute()
         
         # Get updated ticket with messages
-        ticket = supabase.table("support_tickets").select("*").eq("id", ticket_id).single().execute()
-        messages = supabase.table("ticket_messages").select("*").eq("ticket_id", ticket_id).order("timestamp", desc=False).execute()
+        ticket = db.table("support_tickets").select("*").eq("id", ticket_id).single().execute()
+        messages = db.table("ticket_messages").select("*").eq("ticket_id", ticket_id).order("timestamp", desc=False).execute()
         
         ticket_data = ticket.data
         ticket_data["messages"] = messages.data
@@ -450,32 +480,35 @@ def get_super_admin_stats():
         return auth_error
         
     try:
-        # Get all clients
-        clients = supabase.table("clients").select("*").execute()
-        
-        # Get today's API hits
+        # Get today's API hits and open support tickets (counted upstream)
         today = datetime.now().strftime("%Y-%m-%d")
-        api_hits = supabase.table("usage_logs").select("id").gte("timestamp", f"{today}T00:00:00").execute()
-        
-        # Get open support tickets
-        open_tickets = supabase.table("support_tickets").select("id").in_("status", ["open", "in-progress"]).execute()
-        
-        # Calculate stats
-        total_clients = len(clients.data)
-        active_subscriptions = len([c for c in clients.data if c["status"] in ["active", "trial"]])
-        api_hits_today = len(api_hits.data)
-        inactive_trial_clinics = len([c for c in clients.data if c["status"] in ["inactive", "trial"]])
-        
-        # Calculate revenue
-        revenue_this_month = sum([
-            999 if c["plan"] == "enterprise" else
-            299 if c["plan"] == "professional" else
-            99 if c["plan"] == "basic" else 0
-            for c in clients.data if c["status"] == "active"
-        ])
+        api_hits = db.table("usage_logs").select("id", count="exact").gte("timestamp", f"{today}T00:00:00").limit(1).execute()
+        open_tickets = db.table("support_tickets").select("id", count="exact").in_("status", ["open", "in-progress"]).limit(1).execute()
+        
+        # Aggregate clients chunk by chunk
+        total_clients = 0
+        active_subscriptions = 0
+        inactive_trial_clinics = 0
+        revenue_this_month = 0
+        total_users = 0
+        
+        for c in iter_rows(lambda: db.table("clients").select("status, plan, active_users"), prefetch=True):
+            total_clients += 1
+            if c["status"] in ["active", "trial"]:
+                active_subscriptions += 1
+            if c["status"] in ["inactive", "trial"]:
+                inactive_trial_clinics += 1
+            
+            # Calculate revenue
+            if c["status"] == "active":
+                revenue_this_month += 999 if c["plan"] == "enterprise" else \
+                                      299 if c["plan"] == "professional" else \
+                                      99 if c["plan"] == "basic" else 0
+            
+            # Calculate total users
+            total_users += c.get("active_users") or 0
         
-        # Calculate total users
-        total_users = sum([c.get("active_users", 0) for c in clients.data])
+        api_hits_today = api_hits.count or 0
         
         # Return stats
         stats = {
@@ -485,9 +518,33 @@ def get_super_admin_stats():
             "inactiveTrialClinics": inactive_trial_clinics,
             "revenueThisMonth": revenue_this_month,
             "totalUsers": total_users,
-            "openSupportTickets": len(open_tickets.data)
+            "openSupportTickets": open_tickets.count or 0
         }
         
         return jsonify(stats), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+# Get runtime metrics for the worker serving this request
+@super_admin_bp.route("/super-admin/metrics", methods=["GET"])
+def get_worker_metrics():
+    auth_error = require_super_admin()
+    if auth_error:
+        return auth_error
+        
+    try:
+        metrics = {
+            "pid": os.getpid(),
+            "httpPool": pool_stats(),
+            "circuitBreakers": breaker_stats(),
+            "caches": {
+                "tenants": len(tenant_cache),
+                "unknownTenants": len(unknown_tenant_cache),
+                "profiles": len(profile_cache),
+                "verifiedTokens": len(verified_tokens)
+            }
+        }
+        
+        return jsonify(metrics), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,20 +1,14 @@
 from flask import Blueprint, request, jsonify, g
-from .extensions import supabase
+from .extensions import db
+from .permissions import check_module_access
+from .pagination import Page, InvalidPageRequest
+from .fields import SESSION_HISTORY_FIELDS, InvalidFields
+from .reference import reference_response
 import uuid
 from datetime import datetime
 
 tech_bp = Blueprint("technician", __name__)
 
-# Middleware to check if module is enabled
-def check_module_access():
-    if not g.tenant_id:
-        return jsonify({"error": "Tenant not found"}), 404
-        
-    if "technician" not in g.modules:
-        return jsonify({"error": "Technician module is not enabled for this tenant"}), 403
-        
-    return None
-
 # Get assigned procedures
 @tech_bp.route("/technician/procedures", methods=["GET"])
 def get_assigned_procedures():
@@ -25,7 +19,7 @@ def get_assigned_procedures():
         
     try:
         # Apply filters if provided
-        query = supabase.table("procedures").select("*").eq("client_id", g.tenant_id)
+        query = db.table("procedures").select("*").eq("client_id", g.tenant_id)
         
         status = request.args.get("status")
         if status and status != "all":
@@ -53,7 +47,7 @@ def get_procedure_details(procedure_id):
         return module_error
         
     try:
-        result = supabase.table("procedures").select("*").eq("id", procedure_id).eq("client_id", g.tenant_id).single().execute()
+        result = db.table("procedures").select("*").eq("id", procedure_id).eq("client_id", g.tenant_id).single().execute()
         
         if not result.data:
             return jsonify({"error": "Procedure not found"}), 404
@@ -72,13 +66,13 @@ def start_session(procedure_id):
         
     try:
         # Get procedure
-        procedure = supabase.table("procedures").select("*").eq("id", procedure_id).eq("client_id", g.tenant_id).single().execute()
+        procedure = db.table("procedures").select("*").eq("id", procedure_id).eq("client_id", g.tenant_id).single().execute()
         
         if not procedure.data:
             return jsonify({"error": "Procedure not found"}), 404
             
         # Update procedure
-        result = supabase.table("procedures").update({
+        result = db.table("procedures").update({
             "status": "in-progress",
             "start_time": datetime.now().isoformat()
         }).eq("id", procedure_id).execute()
@@ -99,7 +93,7 @@ def complete_session(procedure_id):
         completion_data = request.json
         
         # Get procedure
-        procedure = supabase.table("procedures").select("*").eq("id", procedure_id).eq("client_id", g.tenant_id).single().execute()
+        procedure = db.table("procedures").select("*").eq("id", procedure_id).eq("client_id", g.tenant_id).single().execute()
         
         if not procedure.data:
             return jsonify({"error": "Procedure not found"}), 404
@@ -107,7 +101,7 @@ def complete_session(procedure_id):
         # Update procedure
         now = datetime.now().isoformat()
         
-        completed_procedure = supabase.table("procedures").update({
+        completed_procedure = db.table("procedures").update({
             "status": "completed",
             "end_time": now,
             "completion_notes": completion_data.get("notes"),
@@ -132,7 +126,7 @@ def complete_session(procedure_id):
             "notes": completion_data.get("notes")
         }
         
-        supabase.table("session_history").insert(history_entry).execute()
+        db.table("session_history").insert(history_entry).execute()
         
         return jsonify(completed_procedure.data[0]), 200
     except Exception as e:
@@ -147,8 +141,11 @@ def get_session_history():
         return module_error
         
     try:
+        page = Page.from_request()
+        columns = SESSION_HISTORY_FIELDS.from_request("id", "date")
+        
         # Apply filters if provided
-        query = supabase.table("session_history").select("*").eq("client_id", g.tenant_id)
+        query = db.table("session_history").select(columns, count=page.count).eq("client_id", g.tenant_id)
         
         date_from = request.args.get("dateFrom")
         date_to = request.args.get("dateTo")
@@ -172,12 +169,12 @@ def get_session_history():
         if search:
             query = query.or_(f"patient_name.ilike.%{search}%,procedure.ilike.%{search}%,assigned_by.ilike.%{search}%")
             
-        # Order by date (newest first)
-        query = query.order("date", desc=True)
+        # Order by date (newest first), one page at a time
+        result = page.apply(query, "date", desc=True).execute()
         
-        result = query.execute()
-        
-        return jsonify(result.data), 200
+        return page.response(result)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -194,11 +191,11 @@ def get_technician_stats():
         today = datetime.now().strftime("%Y-%m-%d")
         
         # Get procedures
-        procedures_query = supabase.table("procedures").select("*").eq("client_id", g.tenant_id).eq("date", today).execute()
+        procedures_query = db.table("procedures").select("status, date, scheduled_time").eq("client_id", g.tenant_id).eq("date", today).execute()
         procedures = procedures_query.data
         
         # Get session history
-        history_query = supabase.table("session_history").select("*").eq("client_id", g.tenant_id).execute()
+        history_query = db.table("session_history").select("id").eq("client_id", g.tenant_id).execute()
         
         # Calculate stats
         assigned_today = len(procedures)
@@ -262,13 +259,7 @@ def get_doctors():
         return module_error
         
     try:
-        # Get doctors
-        result = supabase.table("staff") \
-               .select("id, name") \
-               .eq("client_id", g.tenant_id) \
-               .eq("role", "doctor") \
-               .execute()
-               
-        return jsonify(result.data), 200
+        # Get doctors (cached per tenant, revalidated by ETag)
+        return reference_response("doctors", columns=("id", "name"))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
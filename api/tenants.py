@@ -0,0 +1,74 @@
+import sys
+from .extensions import db
+from .cache import MISSING
+from .permissions import compile_role_permissions
+from .instrumentation import budget_exempt
+
+# Narrow projection used when resolving tenants; role_permissions and the
+# contact / usage columns are not needed on the request path
+TENANT_COLUMNS = "id, name, subdomain, logo, plan, status, modules_enabled"
+
+class Tenant:
+    """
+    Immutable, compact view of a clients row as seen by the request path.
+    Cached per process, so it holds only what requests read: the enabled
+    modules as a frozenset and the compiled role permissions, which are
+    fetched and compiled on first use.
+    """
+    __slots__ = ("id", "name", "subdomain", "logo", "plan", "status", "modules", "_permissions")
+
+    def __init__(self, id, name, subdomain, logo=None, plan=None, status=None, modules=(), permissions=MISSING):
+        set_attr = object.__setattr__
+        set_attr(self, "id", id)
+        set_attr(self, "name", name)
+        set_attr(self, "subdomain", subdomain)
+        set_attr(self, "logo", logo)
+        set_attr(self, "plan", plan)
+        set_attr(self, "status", status)
+        # Module names repeat across every tenant, so share the strings
+        set_attr(self, "modules", frozenset(sys.intern(m) for m in modules or ()))
+        set_attr(self, "_permissions", permissions)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Tenant is immutable")
+
+    def __repr__(self):
+        return f"Tenant({self.subdomain!r})"
+
+    @classmethod
+    def from_row(cls, row):
+        permissions = MISSING
+        if "role_permissions" in row:
+            permissions = compile_role_permissions(row["role_permissions"])
+
+        return cls(
+            id=row["id"],
+            name=row["name"],
+            subdomain=row["subdomain"],
+            logo=row.get("logo"),
+            plan=row.get("plan"),
+            status=row.get("status"),
+            modules=row.get("modules_enabled"),
+            permissions=permissions
+        )
+
+    @property
+    def permissions(self):
+        # Loaded lazily: only tenants whose callers hit a role check pay for it
+        if self._permissions is MISSING:
+            with budget_exempt():
+                result = db.table("clients").select("role_permissions").eq("id", self.id).limit(1).execute()
+            role_permissions = result.data[0].get("role_permissions") if result.data else None
+            object.__setattr__(self, "_permissions", compile_role_permissions(role_permissions))
+        return self._permissions
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "subdomain": self.subdomain,
+            "logo": self.logo,
+            "plan": self.plan,
+            "status": self.status,
+            "modules_enabled": sorted(self.modules)
+        }
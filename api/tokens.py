@@ -0,0 +1,143 @@
+import os
+import time
+import hashlib
+import jwt
+from gotrue.errors import AuthApiError
+from .extensions import supabase
+from .cache import TTLCache
+from .instrumentation import budget_exempt, track
+
+# Supabase signs access tokens either with the project's shared JWT secret
+# (HS256) or with an asymmetric key published as JWKS. Both are verified
+# locally; the remote get_user() hop is only used in strict mode.
+#
+# SUPABASE_JWT_SECRET may hold several comma-separated secrets while a
+# secret is being rotated: the current one first, the previous one after.
+JWT_SECRETS = [s.strip() for s in os.getenv("SUPABASE_JWT_SECRET", "").split(",") if s.strip()]
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or f"{os.getenv('SUPABASE_URL', '').rstrip('/')}/auth/v1/.well-known/jwks.json"
+JWKS_CACHE_TTL = int(os.getenv("SUPABASE_JWKS_CACHE_TTL", "600"))
+AUTH_STRICT_VERIFY = os.getenv("AUTH_STRICT_VERIFY", "false").lower() in ("1", "true", "yes")
+
+# Results of the remote check, keyed by a hash of the token (never the token
+# itself). An entry never outlives the token's own "exp" claim.
+verified_tokens = TTLCache(
+    maxsize=int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("VERIFIED_TOKEN_CACHE_TTL", "300"))
+)
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+class InvalidToken(Exception):
+    pass
+
+_jwks_client = None
+
+def _jwks():
+    # PyJWKClient caches the key set and refetches it when it sees an
+    # unknown "kid", which is how rotated signing keys get picked up
+    global _jwks_client
+    if _jwks_client is None:
+        _jwks_client = jwt.PyJWKClient(
+            JWKS_URL,
+            cache_keys=True,
+            lifespan=JWKS_CACHE_TTL,
+            headers={"apikey": os.getenv("SUPABASE_KEY", "")}
+        )
+    return _jwks_client
+
+def _decode(token, key, algorithm):
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]}
+    )
+
+def verify_token_locally(token):
+    try:
+        algorithm = jwt.get_unverified_header(token).get("alg")
+
+        if algorithm == "HS256":
+            last_error = None
+            for secret in JWT_SECRETS:
+                try:
+                    return _decode(token, secret, algorithm)
+                except jwt.InvalidSignatureError as e:
+                    last_error = e
+            raise InvalidToken(str(last_error))
+
+        if algorithm in ASYMMETRIC_ALGORITHMS:
+            signing_key = _jwks().get_signing_key_from_jwt(token)
+            return _decode(token, signing_key.key, algorithm)
+
+        raise InvalidToken(f"Unsupported token algorithm: {algorithm}")
+    except (jwt.PyJWTError, jwt.PyJWKClientError) as e:
+        raise InvalidToken(str(e))
+
+def _token_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _unverified_claims(token):
+    try:
+        return jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return {}
+
+def verify_token_remotely(token):
+    key = _token_key(token)
+    claims = verified_tokens.get(key)
+    if claims is not None:
+        return claims
+
+    try:
+        with budget_exempt(), track("auth", "get_user"):
+            user = supabase.auth.get_user(token)
+    except AuthApiError as e:
+        raise InvalidToken(str(e))
+
+    if not user or not user.user:
+        raise InvalidToken("Invalid token")
+
+    # The auth server accepted the token, so its exp claim can be trusted
+    exp = _unverified_claims(token).get("exp")
+    claims = {
+        "sub": user.user.id,
+        "email": user.user.email,
+        "role": user.user.role,
+        "exp": exp
+    }
+
+    if exp:
+        ttl = min(verified_tokens.ttl, exp - time.time())
+        if ttl > 0:
+            verified_tokens.set(key, claims, ttl=ttl)
+
+    return claims
+
+def forget_token(token):
+    # Called on logout so the remote path re-checks this token
+    verified_tokens.pop(_token_key(token))
+
+def unverified_subject(token):
+    # Only for prefetching; never trust this without verify_token()
+    return _unverified_claims(token).get("sub")
+
+def verify_token(token):
+    """
+    Verify a Supabase access token and return its claims ("sub", "email", ...).
+    Raises InvalidToken. Falls back to the remote check when strict mode is
+    on, or when no HS256 secret is configured for an HS256 token.
+    """
+    if AUTH_STRICT_VERIFY:
+        return verify_token_remotely(token)
+
+    if not JWT_SECRETS:
+        try:
+            if jwt.get_unverified_header(token).get("alg") not in ASYMMETRIC_ALGORITHMS:
+                return verify_token_remotely(token)
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+
+    return verify_token_locally(token)
@@ -6,14 +6,14 @@ from datetime import datetime, timedelta
 
 # Add parent directory to path to import extensions
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from api.extensions import supabase
+from api.extensions import db
 
 def seed_clients():
     """Seed clients table with demo data"""
     print("Seeding clients...")
     
     # Check if clients already exist
-    existing = supabase.table("clients").select("*").execute()
+    existing = db.table("clients").select("*").execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing clients. Skipping client seeding.")
         return
@@ -125,7 +125,7 @@ def seed_clients():
         "last_login": datetime.now().isoformat()
     }
     
-    supabase.table("clients").insert([demo, beauty_med, laser_tech]).execute()
+    db.table("clients").insert([demo, beauty_med, laser_tech]).execute()
     print("Clients seeded successfully!")
     return demo["id"]
 
@@ -134,7 +134,7 @@ def seed_branches(client_id):
     print("Seeding branches...")
     
     # Check if branches already exist
-    existing = supabase.table("client_branches").select("*").eq("client_id", client_id).execute()
+    existing = db.table("client_branches").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing branches. Skipping branch seeding.")
         return
@@ -160,7 +160,7 @@ def seed_branches(client_id):
         }
     ]
     
-    supabase.table("client_branches").insert(branches).execute()
+    db.table("client_branches").insert(branches).execute()
     print("Branches seeded successfully!")
 
 def seed_users(client_id):
@@ -168,7 +168,7 @@ def seed_users(client_id):
     print("Seeding users...")
     
     # Check if users already exist
-    existing = supabase.table("user_profiles").select("*").eq("client_id", client_id).execute()
+    existing = db.table("user_profiles").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing users. Skipping user seeding.")
         return
@@ -225,7 +225,7 @@ def seed_users(client_id):
     
     users.append(super_admin)
     
-    supabase.table("user_profiles").insert(users).execute()
+    db.table("user_profiles").insert(users).execute()
     print("Users seeded successfully!")
 
 def seed_patients(client_id):
@@ -233,7 +233,7 @@ def seed_patients(client_id):
     print("Seeding patients...")
     
     # Check if patients already exist
-    existing = supabase.table("patients").select("*").eq("client_id", client_id).execute()
+    existing = db.table("patients").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing patients. Skipping patient seeding.")
         return
@@ -280,7 +280,7 @@ def seed_patients(client_id):
         }
     ]
     
-    supabase.table("patients").insert(patients).execute()
+    db.table("patients").insert(patients).execute()
     print("Patients seeded successfully!")
 
 def seed_appointments(client_id):
@@ -288,7 +288,7 @@ def seed_appointments(client_id):
     print("Seeding appointments...")
     
     # Check if appointments already exist
-    existing = supabase.table("appointments").select("*").eq("client_id", client_id).execute()
+    existing = db.table("appointments").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing appointments. Skipping appointment seeding.")
         return
@@ -347,7 +347,7 @@ def seed_appointments(client_id):
         }
     ]
     
-    supabase.table("appointments").insert(appointments).execute()
+    db.table("appointments").insert(appointments).execute()
     print("Appointments seeded successfully!")
 
 def seed_procedures(client_id):
@@ -355,7 +355,7 @@ def seed_procedures(client_id):
     print("Seeding procedures...")
     
     # Check if procedures already exist
-    existing = supabase.table("procedures").select("*").eq("client_id", client_id).execute()
+    existing = db.table("procedures").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing procedures. Skipping procedure seeding.")
         return
@@ -418,7 +418,7 @@ def seed_procedures(client_id):
         }
     ]
     
-    supabase.table("procedures").insert(procedures).execute()
+    db.table("procedures").insert(procedures).execute()
     print("Procedures seeded successfully!")
 
 def seed_products(client_id):
@@ -426,7 +426,7 @@ def seed_products(client_id):
     print("Seeding products...")
     
     # Check if products already exist
-    existing = supabase.table("products").select("*").eq("client_id", client_id).execute()
+    existing = db.table("products").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing products. Skipping product seeding.")
         return
@@ -486,7 +486,7 @@ def seed_products(client_id):
         }
     ]
     
-    supabase.table("products").insert(products).execute()
+    db.table("products").insert(products).execute()
     print("Products seeded successfully!")
 
 def seed_invoices(client_id):
@@ -494,7 +494,7 @@ def seed_invoices(client_id):
     print("Seeding invoices...")
     
     # Check if invoices already exist
-    existing = supabase.table("invoices").select("*").eq("client_id", client_id).execute()
+    existing = db.table("invoices").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing invoices. Skipping invoice seeding.")
         return
@@ -581,7 +581,7 @@ def seed_invoices(client_id):
         }
     ]
     
-    supabase.table("invoices").insert(invoices).execute()
+    db.table("invoices").insert(invoices).execute()
     print("Invoices seeded successfully!")
 
 def seed_leads(client_id):
@@ -589,7 +589,7 @@ def seed_leads(client_id):
     print("Seeding leads...")
     
     # Check if leads already exist
-    existing = supabase.table("leads").select("*").eq("client_id", client_id).execute()
+    existing = db.table("leads").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing leads. Skipping lead seeding.")
         return
@@ -675,7 +675,7 @@ def seed_leads(client_id):
         }
     ]
     
-    supabase.table("leads").insert(leads).execute()
+    db.table("leads").insert(leads).execute()
     print("Leads seeded successfully!")
 
 def seed_staff(client_id):
@@ -683,7 +683,7 @@ def seed_staff(client_id):
     print("Seeding staff...")
     
     # Check if staff already exist
-    existing = supabase.table("staff").select("*").eq("client_id", client_id).execute()
+    existing = db.table("staff").select("*").eq("client_id", client_id).execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing staff. Skipping staff seeding.")
         return
@@ -754,7 +754,7 @@ def seed_staff(client_id):
         }
     ]
     
-    supabase.table("staff").insert(staff).execute()
+    db.table("staff").insert(staff).execute()
     print("Staff seeded successfully!")
 
 def seed_system_logs():
@@ -762,13 +762,13 @@ def seed_system_logs():
     print("Seeding system logs...")
     
     # Check if logs already exist
-    existing = supabase.table("system_logs").select("*").execute()
+    existing = db.table("system_logs").select("*").execute()
     if existing.data and len(existing.data) > 10:
         print(f"Found {len(existing.data)} existing system logs. Skipping log seeding.")
         return
     
     # Get clients
-    clients_query = supabase.table("clients").select("id, name").execute()
+    clients_query = db.table("clients").select("id, name").execute()
     clients = clients_query.data
     
     # Calculate dates
@@ -820,7 +820,7 @@ def seed_system_logs():
             
         logs.append(log)
     
-    supabase.table("system_logs").insert(logs).execute()
+    db.table("system_logs").insert(logs).execute()
     print("System logs seeded successfully!")
 
 def seed_support_tickets():
@@ -828,13 +828,13 @@ def seed_support_tickets():
     print("Seeding support tickets...")
     
     # Check if tickets already exist
-    existing = supabase.table("support_tickets").select("*").execute()
+    existing = db.table("support_tickets").select("*").execute()
     if existing.data:
         print(f"Found {len(existing.data)} existing support tickets. Skipping ticket seeding.")
         return
     
     # Get clients
-    clients_query = supabase.table("clients").select("id, name, contact_name, contact_email, contact_phone").execute()
+    clients_query = db.table("clients").select("id, name, contact_name, contact_email, contact_phone").execute()
     clients = clients_query.data
     
     if not clients:
@@ -903,11 +903,11 @@ def seed_support_tickets():
     # Insert tickets
     for ticket in tickets:
         messages = ticket.pop("messages")
-        supabase.table("support_tickets").insert(ticket).execute()
+        db.table("support_tickets").insert(ticket).execute()
         
         # Insert messages
         if messages:
-            supabase.table("ticket_messages").insert(messages).execute()
+            db.table("ticket_messages").insert(messages).execute()
     
     print("Support tickets seeded successfully!")
 
@@ -934,7 +934,7 @@ def main():
     
     # If no client_id returned, get the first client
     if not client_id:
-        client_query = supabase.table("clients").select("id").eq("subdomain", "skinova").single().execute()
+        client_query = db.table("clients").select("id").eq("subdomain", "skinova").single().execute()
         if client_query.data:
             client_id = client_query.data["id"]
         else:
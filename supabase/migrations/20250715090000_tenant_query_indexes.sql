@@ -0,0 +1,43 @@
+-- Composite indexes for the tenant-scoped access paths used by the API.
+-- Every list endpoint filters on client_id and orders by one column, so
+-- (client_id, sort key) serves both the filter and the ORDER BY.
+
+-- Auth / tenant resolution
+CREATE INDEX IF NOT EXISTS idx_user_profiles_auth_user_id ON user_profiles (auth_user_id);
+CREATE INDEX IF NOT EXISTS idx_user_profiles_client_role ON user_profiles (client_id, role);
+
+-- Billing
+CREATE INDEX IF NOT EXISTS idx_invoices_client_created ON invoices (client_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_payments_invoice ON payments (invoice_id);
+
+-- CRM
+CREATE INDEX IF NOT EXISTS idx_leads_client_created ON leads (client_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_converted_leads_client_converted ON converted_leads (client_id, converted_at DESC);
+
+-- Reception / doctor / technician
+CREATE INDEX IF NOT EXISTS idx_appointments_client_date ON appointments (client_id, date);
+CREATE INDEX IF NOT EXISTS idx_procedures_client_date ON procedures (client_id, date, scheduled_time);
+CREATE INDEX IF NOT EXISTS idx_session_history_client_date ON session_history (client_id, date DESC);
+CREATE INDEX IF NOT EXISTS idx_treatment_records_client_date ON treatment_records (client_id, date DESC);
+CREATE INDEX IF NOT EXISTS idx_soap_notes_client_patient ON soap_notes (client_id, patient_id);
+CREATE INDEX IF NOT EXISTS idx_queue_client_status ON queue (client_id, status);
+
+-- Inventory
+CREATE INDEX IF NOT EXISTS idx_products_client_name ON products (client_id, name);
+CREATE INDEX IF NOT EXISTS idx_inventory_logs_client_created ON inventory_logs (client_id, created_at DESC);
+
+-- HR / payroll
+CREATE INDEX IF NOT EXISTS idx_staff_client_name ON staff (client_id, name);
+CREATE INDEX IF NOT EXISTS idx_attendance_staff_date ON attendance (staff_id, date DESC);
+CREATE INDEX IF NOT EXISTS idx_payslips_client_period ON payslips (client_id, year DESC, month DESC);
+
+-- Photo manager
+CREATE INDEX IF NOT EXISTS idx_patient_photos_client_uploaded ON patient_photos (client_id, uploaded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_photo_sessions_client_date ON photo_sessions (client_id, date DESC);
+
+-- Logs / support
+CREATE INDEX IF NOT EXISTS idx_activity_logs_client_timestamp ON activity_logs (client_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs (timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_usage_logs_timestamp ON usage_logs (timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_support_tickets_updated ON support_tickets (updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_ticket_messages_ticket_timestamp ON ticket_messages (ticket_id, timestamp);
@@ -0,0 +1,24 @@
+-- Aggregate behind GET /billing/stats: one pass over the tenant's
+-- invoices with conditional sums, instead of shipping every invoice to
+-- the API. p_day_start is the start of "today" as the API sees it.
+CREATE OR REPLACE FUNCTION billing_stats(p_client_id UUID, p_day_start TIMESTAMPTZ)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT json_build_object(
+    'todayRevenue', COALESCE(SUM(paid_amount) FILTER (WHERE status = 'paid' AND created_at >= p_day_start), 0),
+    'invoicesGenerated', COUNT(*) FILTER (WHERE created_at >= p_day_start),
+    'pendingPayments', COALESCE(SUM(balance_amount) FILTER (WHERE status IN ('sent', 'partially-paid', 'overdue')), 0),
+    'refundedToday', COALESCE(SUM(COALESCE(refund_amount, 0)) FILTER (
+      WHERE status = 'refunded'
+        AND created_at >= p_day_start
+        AND refunded_at >= p_day_start
+        AND refunded_at < p_day_start + INTERVAL '1 day'
+    ), 0),
+    'totalRevenue', COALESCE(SUM(paid_amount) FILTER (WHERE status = 'paid'), 0),
+    'averageInvoiceValue', COALESCE(AVG(paid_amount) FILTER (WHERE status = 'paid'), 0)
+  )
+  FROM invoices
+  WHERE client_id = p_client_id;
+$$;
@@ -0,0 +1,181 @@
+-- Per-tenant daily billing rollups, kept in step with invoices by a
+-- trigger so dashboards and reports read O(days) rows instead of every
+-- invoice. Days are UTC dates.
+--
+-- Measures on the day an invoice was created:
+--   invoice_count, invoiced (total_amount),
+--   paid_count / paid_amount (invoices in status 'paid'),
+--   outstanding (balance of sent / partially-paid / overdue invoices),
+--   refunded (refund_amount of refunded invoices)
+-- Measured on the day an invoice was paid (paid_at):
+--   collected (paid_amount of invoices in status 'paid')
+CREATE TABLE IF NOT EXISTS billing_daily_rollups (
+  client_id UUID NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+  day DATE NOT NULL,
+  doctor_id TEXT NOT NULL,
+  payment_mode TEXT NOT NULL,
+  invoice_count INTEGER NOT NULL DEFAULT 0,
+  invoiced NUMERIC NOT NULL DEFAULT 0,
+  paid_count INTEGER NOT NULL DEFAULT 0,
+  paid_amount NUMERIC NOT NULL DEFAULT 0,
+  outstanding NUMERIC NOT NULL DEFAULT 0,
+  refunded NUMERIC NOT NULL DEFAULT 0,
+  collected NUMERIC NOT NULL DEFAULT 0,
+  PRIMARY KEY (client_id, day, doctor_id, payment_mode)
+);
+
+-- Distinct patients invoiced per day (not additive, so kept per patient)
+CREATE TABLE IF NOT EXISTS billing_daily_patients (
+  client_id UUID NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+  day DATE NOT NULL,
+  patient_id TEXT NOT NULL,
+  invoice_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (client_id, day, patient_id)
+);
+
+ALTER TABLE billing_daily_rollups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE billing_daily_patients ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can read their own client's billing rollups" ON billing_daily_rollups
+  FOR SELECT USING (
+    client_id = (SELECT client_id FROM user_profiles WHERE auth_user_id = auth.uid())
+  );
+
+CREATE POLICY "Users can read their own client's billing patients" ON billing_daily_patients
+  FOR SELECT USING (
+    client_id = (SELECT client_id FROM user_profiles WHERE auth_user_id = auth.uid())
+  );
+
+-- Add (sign = 1) or remove (sign = -1) one invoice's contribution.
+-- Runs as the owner: callers can write invoices but not the rollups.
+CREATE OR REPLACE FUNCTION billing_rollup_apply(inv invoices, sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  created_day DATE := (inv.created_at AT TIME ZONE 'UTC')::date;
+  is_paid BOOLEAN := inv.status = 'paid';
+BEGIN
+  INSERT INTO billing_daily_rollups AS r
+    (client_id, day, doctor_id, payment_mode, invoice_count, invoiced, paid_count, paid_amount, outstanding, refunded)
+  VALUES (
+    inv.client_id, created_day, inv.doctor_id, inv.payment_mode,
+    sign,
+    sign * inv.total_amount,
+    CASE WHEN is_paid THEN sign ELSE 0 END,
+    CASE WHEN is_paid THEN sign * inv.paid_amount ELSE 0 END,
+    CASE WHEN inv.status IN ('sent', 'partially-paid', 'overdue') THEN sign * inv.balance_amount ELSE 0 END,
+    CASE WHEN inv.status = 'refunded' THEN sign * COALESCE(inv.refund_amount, 0) ELSE 0 END
+  )
+  ON CONFLICT (client_id, day, doctor_id, payment_mode) DO UPDATE SET
+    invoice_count = r.invoice_count + EXCLUDED.invoice_count,
+    invoiced = r.invoiced + EXCLUDED.invoiced,
+    paid_count = r.paid_count + EXCLUDED.paid_count,
+    paid_amount = r.paid_amount + EXCLUDED.paid_amount,
+    outstanding = r.outstanding + EXCLUDED.outstanding,
+    refunded = r.refunded + EXCLUDED.refunded;
+
+  IF is_paid AND inv.paid_at IS NOT NULL THEN
+    INSERT INTO billing_daily_rollups AS r (client_id, day, doctor_id, payment_mode, collected)
+    VALUES (inv.client_id, (inv.paid_at AT TIME ZONE 'UTC')::date, inv.doctor_id, inv.payment_mode, sign * inv.paid_amount)
+    ON CONFLICT (client_id, day, doctor_id, payment_mode) DO UPDATE SET
+      collected = r.collected + EXCLUDED.collected;
+  END IF;
+
+  INSERT INTO billing_daily_patients AS p (client_id, day, patient_id, invoice_count)
+  VALUES (inv.client_id, created_day, inv.patient_id, sign)
+  ON CONFLICT (client_id, day, patient_id) DO UPDATE SET
+    invoice_count = p.invoice_count + EXCLUDED.invoice_count;
+
+  DELETE FROM billing_daily_patients
+  WHERE client_id = inv.client_id AND day = created_day AND patient_id = inv.patient_id AND invoice_count <= 0;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION billing_rollup_trigger()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM billing_rollup_apply(OLD, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM billing_rollup_apply(NEW, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS invoices_billing_rollup ON invoices;
+CREATE TRIGGER invoices_billing_rollup
+  AFTER INSERT OR UPDATE OR DELETE ON invoices
+  FOR EACH ROW EXECUTE FUNCTION billing_rollup_trigger();
+
+-- Recompute the rollups from invoices, for one client or (NULL) all.
+-- Used to backfill and to repair drift: flask billing rebuild-rollups
+CREATE OR REPLACE FUNCTION rebuild_billing_rollups(p_client_id UUID DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  rebuilt INTEGER;
+BEGIN
+  DELETE FROM billing_daily_rollups WHERE p_client_id IS NULL OR client_id = p_client_id;
+  DELETE FROM billing_daily_patients WHERE p_client_id IS NULL OR client_id = p_client_id;
+
+  INSERT INTO billing_daily_rollups
+    (client_id, day, doctor_id, payment_mode, invoice_count, invoiced, paid_count, paid_amount, outstanding, refunded, collected)
+  SELECT client_id, day, doctor_id, payment_mode,
+         SUM(invoice_count), SUM(invoiced), SUM(paid_count), SUM(paid_amount), SUM(outstanding), SUM(refunded), SUM(collected)
+  FROM (
+    SELECT client_id, (created_at AT TIME ZONE 'UTC')::date AS day, doctor_id, payment_mode,
+           1 AS invoice_count,
+           total_amount AS invoiced,
+           CASE WHEN status = 'paid' THEN 1 ELSE 0 END AS paid_count,
+           CASE WHEN status = 'paid' THEN paid_amount ELSE 0 END AS paid_amount,
+           CASE WHEN status IN ('sent', 'partially-paid', 'overdue') THEN balance_amount ELSE 0 END AS outstanding,
+           CASE WHEN status = 'refunded' THEN COALESCE(refund_amount, 0) ELSE 0 END AS refunded,
+           0 AS collected
+    FROM invoices
+    WHERE p_client_id IS NULL OR client_id = p_client_id
+    UNION ALL
+    SELECT client_id, (paid_at AT TIME ZONE 'UTC')::date, doctor_id, payment_mode, 0, 0, 0, 0, 0, 0, paid_amount
+    FROM invoices
+    WHERE status = 'paid' AND paid_at IS NOT NULL AND (p_client_id IS NULL OR client_id = p_client_id)
+  ) contributions
+  GROUP BY client_id, day, doctor_id, payment_mode;
+  GET DIAGNOSTICS rebuilt = ROW_COUNT;
+
+  INSERT INTO billing_daily_patients (client_id, day, patient_id, invoice_count)
+  SELECT client_id, (created_at AT TIME ZONE 'UTC')::date, patient_id, COUNT(*)
+  FROM invoices
+  WHERE p_client_id IS NULL OR client_id = p_client_id
+  GROUP BY 1, 2, 3;
+
+  RETURN rebuilt;
+END;
+$$;
+
+SELECT rebuild_billing_rollups();
+
+-- /billing/stats now reads the rollups. "Today" is the UTC day of
+-- p_day_start; refunds are counted on the invoice's creation day.
+CREATE OR REPLACE FUNCTION billing_stats(p_client_id UUID, p_day_start TIMESTAMPTZ)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT json_build_object(
+    'todayRevenue', COALESCE(SUM(paid_amount) FILTER (WHERE day = (p_day_start AT TIME ZONE 'UTC')::date), 0),
+    'invoicesGenerated', COALESCE(SUM(invoice_count) FILTER (WHERE day = (p_day_start AT TIME ZONE 'UTC')::date), 0),
+    'pendingPayments', COALESCE(SUM(outstanding), 0),
+    'refundedToday', COALESCE(SUM(refunded) FILTER (WHERE day = (p_day_start AT TIME ZONE 'UTC')::date), 0),
+    'totalRevenue', COALESCE(SUM(paid_amount), 0),
+    'averageInvoiceValue', COALESCE(SUM(paid_amount) / NULLIF(SUM(paid_count), 0), 0)
+  )
+  FROM billing_daily_rollups
+  WHERE client_id = p_client_id;
+$$;
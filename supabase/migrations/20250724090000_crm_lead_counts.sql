@@ -0,0 +1,19 @@
+-- Grouped lead counts behind GET /crm/stats and the admin CRM funnel:
+-- one row per (status, source) with its lead count and how many of them
+-- are contacted leads not updated since p_follow_up_before. Replaces
+-- shipping every lead (with its history arrays) to the API to count it.
+CREATE INDEX IF NOT EXISTS idx_leads_client_status_source ON leads (client_id, status, source, updated_at);
+
+CREATE OR REPLACE FUNCTION crm_lead_counts(p_client_id UUID, p_follow_up_before TIMESTAMPTZ)
+RETURNS TABLE (status TEXT, source TEXT, leads BIGINT, follow_ups_due BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT l.status,
+         l.source,
+         COUNT(*),
+         COUNT(*) FILTER (WHERE l.status = 'contacted' AND l.updated_at < p_follow_up_before)
+  FROM leads l
+  WHERE l.client_id = p_client_id
+  GROUP BY l.status, l.source;
+$$;
@@ -0,0 +1,195 @@
+-- Per-tenant inventory summary, kept in step with products and
+-- inventory_logs by triggers so /inventory/stats reads a handful of rows
+-- instead of every product and every log entry.
+--
+-- inventory_category_summary, one row per (client, category) over active
+-- products:
+--   product_count, low_stock_count (current_stock <= min_stock_level),
+--   stock_value (current_stock * cost_price)
+-- inventory_daily_usage, one row per (client, UTC day of created_at):
+--   auto_deduct_count / auto_deduct_quantity of 'auto-deduct' log entries
+--
+-- The expiry window moves with the clock, so it is not counted ahead of
+-- time; active products are kept in expiry order by a partial index and
+-- the window is a range count over it.
+CREATE TABLE IF NOT EXISTS inventory_category_summary (
+  client_id UUID NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+  category TEXT NOT NULL,
+  product_count INTEGER NOT NULL DEFAULT 0,
+  low_stock_count INTEGER NOT NULL DEFAULT 0,
+  stock_value NUMERIC NOT NULL DEFAULT 0,
+  PRIMARY KEY (client_id, category)
+);
+
+CREATE TABLE IF NOT EXISTS inventory_daily_usage (
+  client_id UUID NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+  day DATE NOT NULL,
+  auto_deduct_count INTEGER NOT NULL DEFAULT 0,
+  auto_deduct_quantity INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (client_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_products_client_expiry ON products (client_id, expiry_date) WHERE is_active AND expiry_date <> '';
+
+ALTER TABLE inventory_category_summary ENABLE ROW LEVEL SECURITY;
+ALTER TABLE inventory_daily_usage ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can read their own client's inventory summary" ON inventory_category_summary
+  FOR SELECT USING (
+    client_id = (SELECT client_id FROM user_profiles WHERE auth_user_id = auth.uid())
+  );
+
+CREATE POLICY "Users can read their own client's inventory usage" ON inventory_daily_usage
+  FOR SELECT USING (
+    client_id = (SELECT client_id FROM user_profiles WHERE auth_user_id = auth.uid())
+  );
+
+-- Add (sign = 1) or remove (sign = -1) one product's contribution.
+-- Runs as the owner: callers can write products but not the summary.
+CREATE OR REPLACE FUNCTION inventory_summary_apply(p products, sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF NOT p.is_active THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO inventory_category_summary AS s (client_id, category, product_count, low_stock_count, stock_value)
+  VALUES (
+    p.client_id, p.category,
+    sign,
+    CASE WHEN p.current_stock <= p.min_stock_level THEN sign ELSE 0 END,
+    sign * p.current_stock * p.cost_price
+  )
+  ON CONFLICT (client_id, category) DO UPDATE SET
+    product_count = s.product_count + EXCLUDED.product_count,
+    low_stock_count = s.low_stock_count + EXCLUDED.low_stock_count,
+    stock_value = s.stock_value + EXCLUDED.stock_value;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION inventory_summary_trigger()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM inventory_summary_apply(OLD, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM inventory_summary_apply(NEW, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+-- Stock movements (add-stock, deduct, adjust) only touch current_stock,
+-- last_used and updated_at; the trigger skips updates that can't move the summary
+DROP TRIGGER IF EXISTS products_inventory_summary ON products;
+CREATE TRIGGER products_inventory_summary
+  AFTER INSERT OR DELETE OR UPDATE OF client_id, category, is_active, current_stock, min_stock_level, cost_price ON products
+  FOR EACH ROW EXECUTE FUNCTION inventory_summary_trigger();
+
+-- Same for one log entry's contribution to the daily usage counters
+CREATE OR REPLACE FUNCTION inventory_usage_apply(log inventory_logs, sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF log.type <> 'auto-deduct' THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO inventory_daily_usage AS u (client_id, day, auto_deduct_count, auto_deduct_quantity)
+  VALUES (log.client_id, (log.created_at AT TIME ZONE 'UTC')::date, sign, sign * log.quantity)
+  ON CONFLICT (client_id, day) DO UPDATE SET
+    auto_deduct_count = u.auto_deduct_count + EXCLUDED.auto_deduct_count,
+    auto_deduct_quantity = u.auto_deduct_quantity + EXCLUDED.auto_deduct_quantity;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION inventory_usage_trigger()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM inventory_usage_apply(OLD, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM inventory_usage_apply(NEW, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS inventory_logs_usage ON inventory_logs;
+CREATE TRIGGER inventory_logs_usage
+  AFTER INSERT OR DELETE OR UPDATE OF client_id, type, quantity, created_at ON inventory_logs
+  FOR EACH ROW EXECUTE FUNCTION inventory_usage_trigger();
+
+-- Recompute the summary from products and inventory_logs, for one client
+-- or (NULL) all. Used to backfill and to repair drift:
+-- flask inventory rebuild-summary
+CREATE OR REPLACE FUNCTION rebuild_inventory_summary(p_client_id UUID DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  rebuilt INTEGER;
+BEGIN
+  DELETE FROM inventory_category_summary WHERE p_client_id IS NULL OR client_id = p_client_id;
+  DELETE FROM inventory_daily_usage WHERE p_client_id IS NULL OR client_id = p_client_id;
+
+  INSERT INTO inventory_category_summary (client_id, category, product_count, low_stock_count, stock_value)
+  SELECT client_id, category,
+         COUNT(*),
+         COUNT(*) FILTER (WHERE current_stock <= min_stock_level),
+         SUM(current_stock * cost_price)
+  FROM products
+  WHERE is_active AND (p_client_id IS NULL OR client_id = p_client_id)
+  GROUP BY client_id, category;
+  GET DIAGNOSTICS rebuilt = ROW_COUNT;
+
+  INSERT INTO inventory_daily_usage (client_id, day, auto_deduct_count, auto_deduct_quantity)
+  SELECT client_id, (created_at AT TIME ZONE 'UTC')::date, COUNT(*), SUM(quantity)
+  FROM inventory_logs
+  WHERE type = 'auto-deduct' AND (p_client_id IS NULL OR client_id = p_client_id)
+  GROUP BY 1, 2;
+
+  RETURN rebuilt;
+END;
+$$;
+
+SELECT rebuild_inventory_summary();
+
+-- Everything GET /inventory/stats returns. "Today" is the UTC day of
+-- p_day_start; products expiring on or before p_expiry_before (a
+-- YYYY-MM-DD date, like expiry_date) count as expiring soon.
+CREATE OR REPLACE FUNCTION inventory_stats(p_client_id UUID, p_day_start TIMESTAMPTZ, p_expiry_before TEXT)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT json_build_object(
+    'totalProducts', COALESCE(SUM(s.product_count), 0),
+    'lowStockAlerts', COALESCE(SUM(s.low_stock_count), 0),
+    'expiringSoon', (
+      SELECT COUNT(*) FROM products p
+      WHERE p.client_id = p_client_id AND p.is_active AND p.expiry_date <> '' AND p.expiry_date <= p_expiry_before
+    ),
+    'autoDeductToday', COALESCE((
+      SELECT u.auto_deduct_count FROM inventory_daily_usage u
+      WHERE u.client_id = p_client_id AND u.day = (p_day_start AT TIME ZONE 'UTC')::date
+    ), 0),
+    'totalValue', COALESCE(SUM(s.stock_value), 0),
+    'categoriesCount', COUNT(*) FILTER (WHERE s.product_count > 0)
+  )
+  FROM inventory_category_summary s
+  WHERE s.client_id = p_client_id;
+$$;
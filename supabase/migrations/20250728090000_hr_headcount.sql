@@ -0,0 +1,24 @@
+-- Grouped staff counts behind GET /hr/stats: one row per (department,
+-- branch) with its headcount and how many of those joined in p_month
+-- (the YYYY-MM prefix of join_date). The row count is bounded by the
+-- departments and branches in use, not by history. The API folds these
+-- into its department, branch and new-join figures, and caches them per
+-- tenant until staff is written or the month changes.
+CREATE INDEX IF NOT EXISTS idx_staff_client_department_branch ON staff (client_id, department, branch, join_date);
+
+DROP FUNCTION IF EXISTS hr_headcount(UUID);
+
+CREATE OR REPLACE FUNCTION hr_headcount(p_client_id UUID, p_month TEXT)
+RETURNS TABLE (department TEXT, branch TEXT, staff BIGINT, new_joins BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT s.department,
+         s.branch,
+         COUNT(*),
+         COUNT(*) FILTER (WHERE starts_with(s.join_date, p_month))
+  FROM staff s
+  WHERE s.client_id = p_client_id
+  GROUP BY 1, 2
+  ORDER BY 1, 2;
+$$;
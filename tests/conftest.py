@@ -0,0 +1,101 @@
+import os
+import time
+import uuid
+import jwt
+import pytest
+
+# The client is built from these on import; nothing here reaches Supabase.
+# Table reads and writes go to an in-memory SQLite database built from
+# supabase/migrations, and tokens are verified locally with JWT_SECRET.
+JWT_SECRET = "test-secret"
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", jwt.encode({"role": "anon"}, "test", algorithm="HS256"))
+os.environ.setdefault("DATA_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+os.environ.setdefault("SUPABASE_JWT_SECRET", JWT_SECRET)
+
+@pytest.fixture(scope="session")
+def app():
+    from api import create_app
+    return create_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def db():
+    from api.extensions import db
+    return db
+
+@pytest.fixture
+def make_client(db):
+    """Insert a clients row and return it"""
+    def make(modules=None, **fields):
+        modules = modules if modules is not None else {}
+        row = {
+            "id": str(uuid.uuid4()),
+            "name": "Test Clinic",
+            "subdomain": f"clinic-{uuid.uuid4().hex[:8]}",
+            "plan": "professional",
+            "status": "active",
+            "expires_at": "2099-01-01T00:00:00",
+            "contact_name": "Test",
+            "contact_email": "test@example.com",
+            "modules": modules,
+            "modules_enabled": [name for name, enabled in modules.items() if enabled],
+            **fields
+        }
+        return db.table("clients").insert(row).execute().data[0]
+    return make
+
+@pytest.fixture
+def auth_headers(db):
+    """Headers for a new user with role at the given client's subdomain"""
+    def make(role, tenant=None):
+        auth_user_id = str(uuid.uuid4())
+        db.table("user_profiles").insert({
+            "id": str(uuid.uuid4()),
+            "auth_user_id": auth_user_id,
+            "name": role,
+            "email": f"{role}@example.com",
+            "role": role,
+            "client_id": tenant["id"] if tenant else None
+        }).execute()
+
+        token = jwt.encode({
+            "sub": auth_user_id,
+            "aud": "authenticated",
+            "email": f"{role}@example.com",
+            "exp": int(time.time()) + 3600
+        }, JWT_SECRET, algorithm="HS256")
+
+        host = f"{tenant['subdomain']}.example.com" if tenant else "admin.example.com"
+        return {"Host": host, "Authorization": f"Bearer {token}"}
+    return make
+
+@pytest.fixture
+def make_product(db):
+    """Insert a product for the tenant and return it"""
+    def make(tenant, name, **fields):
+        row = {
+            "id": str(uuid.uuid4()),
+            "client_id": tenant["id"],
+            "name": name,
+            "category": "supplies",
+            "batch_number": "B-1",
+            "vendor": "Vendor",
+            "cost_price": 10,
+            "current_stock": 5,
+            "min_stock_level": 1,
+            "max_stock_level": 10,
+            "unit": "pcs",
+            "location": "Shelf",
+            "created_at": "2025-01-01T00:00:00+00:00",
+            "updated_at": "2025-01-01T00:00:00+00:00",
+            "treatment_types": [],
+            **fields
+        }
+        return db.table("products").insert(row).execute().data[0]
+    return make
@@ -0,0 +1,178 @@
+import uuid
+import pytest
+from datetime import datetime, timedelta
+
+TODAY = datetime.now().strftime("%Y-%m-%d")
+MEASURES = ("invoice_count", "invoiced", "paid_count", "paid_amount", "outstanding", "refunded", "collected")
+
+@pytest.fixture
+def billing_tenant(make_client, auth_headers):
+    tenant = make_client(modules={"dashboard": True, "billing": True, "admin": True})
+    return tenant, auth_headers("admin", tenant)
+
+def invoice_row(tenant, days_ago=0, **fields):
+    """An invoices row created days_ago days before now, sent and unpaid"""
+    created_at = (datetime.now() - timedelta(days=days_ago)).isoformat()
+    return {
+        "id": str(uuid.uuid4()),
+        "client_id": tenant["id"],
+        "invoice_number": "INV0001",
+        "patient_id": "patient-1",
+        "patient_name": "Patient",
+        "patient_phone": "555-0100",
+        "doctor_id": "doctor-1",
+        "doctor_name": "Doctor",
+        "procedures": [],
+        "subtotal": 100,
+        "tax_rate": 0,
+        "tax_amount": 0,
+        "discount_rate": 0,
+        "discount_amount": 0,
+        "total_amount": 100,
+        "paid_amount": 0,
+        "balance_amount": 100,
+        "payment_mode": "cash",
+        "status": "sent",
+        "created_at": created_at,
+        "updated_at": created_at,
+        "due_date": "2099-01-01",
+        **fields
+    }
+
+@pytest.fixture
+def billing_history(client, db, billing_tenant):
+    """
+    A tenant's invoices, written the ways the app writes them: created,
+    partly and fully paid, refunded, edited and deleted, today and before
+    """
+    tenant, headers = billing_tenant
+
+    # Older history, written directly
+    for days_ago, fields in [
+        (3, {"status": "paid", "paid_amount": 100, "balance_amount": 0, "paid_at": datetime.now().isoformat()}),
+        (3, {"status": "overdue", "total_amount": 250.5, "balance_amount": 250.5, "patient_id": "patient-2"}),
+        (2, {"status": "partially-paid", "paid_amount": 40, "balance_amount": 60, "payment_mode": "card"}),
+        (2, {"status": "refunded", "paid_amount": 100, "balance_amount": 0, "refund_amount": 30,
+             "refunded_at": datetime.now().isoformat(), "doctor_id": "doctor-2"}),
+        (1, {"status": "draft", "total_amount": 75, "balance_amount": 75, "patient_id": "patient-3"}),
+    ]:
+        db.table("invoices").insert(invoice_row(tenant, days_ago, **fields)).execute()
+
+    # Today's invoices, through the endpoints
+    def create(**fields):
+        payload = invoice_row(tenant, **fields)
+        for key in ("id", "client_id", "created_at", "updated_at"):
+            payload.pop(key)
+        response = client.post("/api/billing/invoices", json=payload, headers=headers)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()["id"]
+
+    paid = create(total_amount=120, balance_amount=120)
+    client.post(f"/api/billing/invoices/{paid}/pay", json={"amount": 50, "payment_mode": "upi"}, headers=headers)
+    client.post(f"/api/billing/invoices/{paid}/pay", json={"amount": 70, "payment_mode": "upi"}, headers=headers)
+
+    partly_paid = create(patient_id="patient-2", doctor_id="doctor-2")
+    client.post(f"/api/billing/invoices/{partly_paid}/pay", json={"amount": 25.5, "payment_mode": "card"}, headers=headers)
+
+    refunded = create(patient_id="patient-4")
+    client.post(f"/api/billing/invoices/{refunded}/pay", json={"amount": 100, "payment_mode": "cash"}, headers=headers)
+    client.post(f"/api/billing/invoices/{refunded}/refund", json={"amount": 60, "reason": "Cancelled"}, headers=headers)
+
+    # Edits and deletes move rows between (and out of) the totals
+    edited = create(patient_id="patient-5")
+    db.table("invoices").update({"total_amount": 90, "balance_amount": 90, "doctor_id": "doctor-3"}).eq("id", edited).execute()
+    deleted = create(patient_id="patient-6", status="paid", paid_amount=100, balance_amount=0,
+                     paid_at=datetime.now().isoformat())
+    db.table("invoices").delete().eq("id", deleted).execute()
+
+    return tenant, headers
+
+def invoices_of(db, tenant):
+    return db.table("invoices").select("*").eq("client_id", tenant["id"]).execute().data
+
+def old_billing_stats(invoices, today):
+    # GET /billing/stats as computed in Python over every invoice
+    today_invoices = [i for i in invoices if i["created_at"] >= f"{today}T00:00:00"]
+    today_revenue = sum(i["paid_amount"] for i in today_invoices if i["status"] == "paid")
+    refunded_today = sum(i.get("refund_amount") or 0 for i in today_invoices
+                         if i["status"] == "refunded" and (i.get("refunded_at") or "").startswith(today))
+
+    pending_payments = sum(i["balance_amount"] for i in invoices if i["status"] in ["sent", "partially-paid", "overdue"])
+    paid = [i["paid_amount"] for i in invoices if i["status"] == "paid"]
+    return {
+        "todayRevenue": today_revenue,
+        "invoicesGenerated": len(today_invoices),
+        "pendingPayments": pending_payments,
+        "refundedToday": refunded_today,
+        "totalRevenue": sum(paid),
+        "averageInvoiceValue": sum(paid) / len(paid) if paid else 0
+    }
+
+def test_billing_stats_match_the_python_totals(client, db, billing_history):
+    tenant, headers = billing_history
+
+    response = client.get("/api/billing/stats", headers=headers)
+    assert response.status_code == 200
+    expected = old_billing_stats(invoices_of(db, tenant), TODAY)
+    assert response.get_json() == pytest.approx(expected)
+    # The fixture leaves something in every total
+    assert all(expected.values())
+
+def test_billing_stats_for_a_tenant_without_invoices(client, billing_tenant):
+    _, headers = billing_tenant
+    response = client.get("/api/billing/stats", headers=headers)
+    assert response.get_json() == old_billing_stats([], TODAY)
+
+def rollups_of(db, tenant):
+    # Rows every measure of which is back to zero carry nothing
+    rows = db.table("billing_daily_rollups").select("*").eq("client_id", tenant["id"]).execute().data
+    return sorted((row for row in rows if any(row[m] for m in MEASURES)),
+                  key=lambda row: (row["day"], row["doctor_id"], row["payment_mode"]))
+
+def test_rollups_kept_by_the_triggers_match_a_rebuild(db, billing_history):
+    tenant, _ = billing_history
+    maintained = rollups_of(db, tenant)
+    patients = db.table("billing_daily_patients").select("*").eq("client_id", tenant["id"]).execute().data
+
+    db.rpc("rebuild_billing_rollups", {"p_client_id": tenant["id"]}).execute()
+    assert maintained == rollups_of(db, tenant)
+    rebuilt = db.table("billing_daily_patients").select("*").eq("client_id", tenant["id"]).execute().data
+    key = lambda row: (row["day"], row["patient_id"])
+    assert sorted(patients, key=key) == sorted(rebuilt, key=key)
+
+def test_admin_revenue_today_matches_paid_invoices(client, db, billing_history):
+    tenant, headers = billing_history
+
+    response = client.get("/api/admin/metrics", headers=headers)
+    assert response.status_code == 200
+    # Previously: paid_amount of every paid invoice with paid_at today
+    expected = sum(i["paid_amount"] for i in invoices_of(db, tenant)
+                   if i["status"] == "paid" and i["paid_at"] >= f"{TODAY}T00:00:00")
+    assert expected and response.get_json()["revenueToday"] == pytest.approx(expected)
+
+def old_revenue_report(invoices):
+    # GET /admin/reports/revenue as computed in Python over every invoice
+    dates = {}
+    for invoice in invoices:
+        data = dates.setdefault(invoice["created_at"].split("T")[0], {"revenue": 0, "patients": set()})
+        data["revenue"] += invoice["total_amount"]
+        data["patients"].add(invoice["patient_id"])
+    return [
+        {"date": date, "revenue": data["revenue"], "patients": len(data["patients"]),
+         "avgBill": data["revenue"] / len(data["patients"])}
+        for date, data in sorted(dates.items())
+    ]
+
+@pytest.mark.parametrize("days", [None, 2])
+def test_revenue_report_matches_the_invoices(client, db, billing_history, days):
+    tenant, headers = billing_history
+    invoices = invoices_of(db, tenant)
+    args = {}
+    if days:
+        date_from = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        args = {"date_from": date_from, "date_to": f"{TODAY}T23:59:59"}
+        invoices = [i for i in invoices if date_from <= i["created_at"] <= args["date_to"]]
+
+    response = client.get("/api/admin/reports/revenue", headers=headers, query_string=args)
+    assert response.status_code == 200
+    assert response.get_json() == [pytest.approx(day) for day in old_revenue_report(invoices)]
@@ -0,0 +1,26 @@
+import time
+from flask import g
+from api import fanout, middleware
+
+def test_deadline_starts_when_the_request_does(app):
+    with app.test_request_context("/api/tenant", headers={"Host": "unknown.example.com"}):
+        assert fanout.deadline() is None
+        started = time.monotonic()
+        app.preprocess_request()
+        assert started <= g.deadline - fanout.REQUEST_DEADLINE <= time.monotonic()
+
+def test_time_spent_resolving_the_tenant_counts_against_the_deadline(client, make_client, auth_headers, monkeypatch):
+    tenant = make_client(modules={"crm": True})
+    staff = auth_headers("crm_manager", tenant)
+    assert client.get("/api/crm/stats", headers=staff).status_code == 200
+
+    load_tenant = middleware.load_tenant
+    def slow_load_tenant(sub):
+        time.sleep(0.2)
+        return load_tenant(sub)
+    monkeypatch.setattr(middleware, "load_tenant", slow_load_tenant)
+    monkeypatch.setattr(fanout, "REQUEST_DEADLINE", 0.1)
+
+    response = client.get("/api/crm/stats", headers=staff)
+    assert response.status_code == 500
+    assert "deadline" in response.get_json()["error"]
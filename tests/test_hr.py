@@ -0,0 +1,84 @@
+import pytest
+from datetime import datetime
+from api import reference
+
+THIS_MONTH = datetime.now().strftime("%Y-%m")
+
+@pytest.fixture
+def hr_tenant(client, make_client, auth_headers):
+    """A tenant with staff hired over several years, some moved since"""
+    tenant = make_client(modules={"dashboard": True, "hr": True})
+    headers = auth_headers("hr_manager", tenant)
+
+    def add(department, branch, join_date):
+        response = client.post("/api/hr/staff", headers=headers, json={
+            "name": "Staff", "role": "nurse", "department": department, "branch": branch,
+            "email": "staff@example.com", "phone": "555-0100", "join_date": join_date, "status": "active"
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()["id"]
+
+    for year in range(2015, 2025):
+        for month in ("01", "06", "11"):
+            add("Nursing", "Downtown", f"{year}-{month}-15")
+    add("Nursing", "Uptown", f"{THIS_MONTH}-01")
+    add("Dermatology", "Downtown", f"{THIS_MONTH}-02")
+    moved = add("Front desk", "Uptown", "2020-03-01")
+    rehired = add("Front desk", "Uptown", "2019-07-01")
+
+    client.patch(f"/api/hr/staff/{moved}", headers=headers, json={"department": "Dermatology"})
+    client.patch(f"/api/hr/staff/{rehired}", headers=headers, json={"join_date": f"{THIS_MONTH}-03"})
+    return tenant, headers
+
+def old_hr_counts(staff, current_month):
+    # The staff figures of GET /hr/stats as computed in Python over every member
+    departments, branches = {}, {}
+    for member in staff:
+        departments[member["department"]] = departments.get(member["department"], 0) + 1
+        branches[member["branch"]] = branches.get(member["branch"], 0) + 1
+    return {
+        "totalStaff": len(staff),
+        "newJoinsThisMonth": sum(1 for member in staff if member["join_date"].startswith(current_month)),
+        "departmentCounts": departments,
+        "branchCounts": branches
+    }
+
+def test_hr_stats_match_the_per_member_counts(client, db, hr_tenant):
+    tenant, headers = hr_tenant
+
+    response = client.get("/api/hr/stats", headers=headers)
+    assert response.status_code == 200
+    staff = db.table("staff").select("*").eq("client_id", tenant["id"]).execute().data
+    expected = old_hr_counts(staff, THIS_MONTH)
+    assert {key: response.get_json()[key] for key in expected} == expected
+    assert expected["newJoinsThisMonth"] == 3
+
+def test_headcount_has_one_row_per_department_and_branch(db, hr_tenant):
+    tenant, _ = hr_tenant
+    # Thirty join months of history still fold into three groups
+    rows = db.rpc("hr_headcount", {"p_client_id": tenant["id"], "p_month": THIS_MONTH}).execute().data
+    assert [(row["department"], row["branch"], row["staff"], row["new_joins"]) for row in rows] == [
+        ("Dermatology", "Downtown", 1, 1),
+        ("Dermatology", "Uptown", 1, 0),
+        ("Front desk", "Uptown", 1, 1),
+        ("Nursing", "Downtown", 30, 0),
+        ("Nursing", "Uptown", 1, 1),
+    ]
+
+def test_headcount_cached_last_month_is_recounted(client, hr_tenant, monkeypatch):
+    tenant, headers = hr_tenant
+
+    class LastMonth(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2000, 1, 31, 23, 59)
+
+    # Fill the cache as if the last request came in before the month turned
+    monkeypatch.setattr(reference, "datetime", LastMonth)
+    reference.invalidate_references(tenant["id"])
+    assert reference.load_reference("headcount", tenant["id"]).data["month"] == "2000-01"
+    monkeypatch.undo()
+
+    response = client.get("/api/hr/stats", headers=headers)
+    assert response.get_json()["newJoinsThisMonth"] == 3
+    assert reference.load_reference("headcount", tenant["id"]).data["month"] == THIS_MONTH
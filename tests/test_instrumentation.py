@@ -0,0 +1,25 @@
+import threading
+from flask import g
+from api import instrumentation
+from api.fanout import gather
+
+def test_queries_list_exists_before_any_fan_out(app):
+    with app.test_request_context("/api/tenant", headers={"Host": "unknown.example.com"}):
+        app.preprocess_request()
+        assert g.queries == []
+
+def test_concurrent_first_records_are_all_kept(app):
+    with app.test_request_context("/api/tenant", headers={"Host": "unknown.example.com"}):
+        app.preprocess_request()
+        workers = 8
+        barrier = threading.Barrier(workers)
+
+        def recorder(table):
+            def run():
+                barrier.wait()
+                instrumentation.record(table, "select")
+            return run
+
+        gather(*[recorder(f"table_{i}") for i in range(workers)])
+
+        assert sorted(q.table for q in g.queries) == sorted(f"table_{i}" for i in range(workers))
@@ -0,0 +1,106 @@
+import uuid
+import pytest
+from datetime import datetime, timedelta
+
+def days_from_now(days):
+    return (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
+
+@pytest.fixture
+def inventory_history(client, db, make_client, auth_headers, make_product):
+    """
+    A tenant's products and logs, moved by add-stock, deduct and adjust,
+    plus direct edits and deletes of both
+    """
+    tenant = make_client(modules={"dashboard": True, "inventory": True})
+    headers = auth_headers("inventory_manager", tenant)
+
+    gauze = make_product(tenant, "Gauze", current_stock=2, min_stock_level=3, cost_price=1.5)
+    filler = make_product(tenant, "Filler", category="medications", current_stock=8, min_stock_level=2,
+                          cost_price=120, expiry_date=days_from_now(10))
+    serum = make_product(tenant, "Serum", category="medications", current_stock=4, min_stock_level=1,
+                         cost_price=35.5, expiry_date=days_from_now(45))
+    laser = make_product(tenant, "Laser tip", category="equipment", current_stock=1, min_stock_level=1,
+                         cost_price=300, expiry_date="")
+    peel = make_product(tenant, "Peel", category="consumables", current_stock=6, min_stock_level=2,
+                        cost_price=12, expiry_date=days_from_now(-5))
+    make_product(tenant, "Retired", category="consumables", current_stock=0, min_stock_level=5,
+                 cost_price=50, is_active=False, expiry_date=days_from_now(3))
+    doomed = make_product(tenant, "Doomed", current_stock=9, cost_price=4)
+
+    def post(url, json):
+        response = client.post(url, headers=headers, json=json)
+        assert response.status_code == 200, response.get_json()
+
+    # Gauze leaves the low-stock set, filler enters it
+    post(f"/api/inventory/products/{gauze['id']}/add-stock", {"quantity": 5})
+    post(f"/api/inventory/products/{filler['id']}/deduct", {"quantity": 3, "reason": "Treatment"})
+    post(f"/api/inventory/products/{filler['id']}/deduct", {"quantity": 4, "reason": "Treatment"})
+    post("/api/inventory/products/adjust", {"productId": serum["id"], "quantity": 2, "type": "remove", "reason": "Damaged"})
+    post("/api/inventory/products/adjust", {"productId": laser["id"], "quantity": 3, "type": "add", "reason": "Recount"})
+
+    # Direct edits: recategorise, reprice, retire and delete
+    db.table("products").update({"category": "supplies", "cost_price": 15}).eq("id", peel["id"]).execute()
+    db.table("products").update({"is_active": False}).eq("id", serum["id"]).execute()
+    db.table("products").delete().eq("id", doomed["id"]).execute()
+
+    # Yesterday's auto-deductions don't count today; a deleted one not at all
+    def log(days_ago, **fields):
+        row = {
+            "id": str(uuid.uuid4()), "client_id": tenant["id"], "product_id": gauze["id"],
+            "product_name": "Gauze", "type": "auto-deduct", "quantity": 1, "previous_stock": 2,
+            "new_stock": 1, "reason": "Treatment", "performed_by": "System",
+            "created_at": (datetime.now() - timedelta(days=days_ago)).isoformat(), **fields
+        }
+        return db.table("inventory_logs").insert(row).execute().data[0]
+    log(1)
+    db.table("inventory_logs").delete().eq("id", log(0)["id"]).execute()
+    db.table("inventory_logs").update({"type": "stock-out"}).eq("id", log(0)["id"]).execute()
+
+    return tenant, headers
+
+def old_inventory_stats(products, logs):
+    # GET /inventory/stats as computed in Python over every product and log
+    thirty_days_from_now = days_from_now(30)
+    today, tomorrow = days_from_now(0), days_from_now(1)
+    active = [p for p in products if p["is_active"]]
+    return {
+        "totalProducts": len(active),
+        "lowStockAlerts": sum(1 for p in active if p["current_stock"] <= p["min_stock_level"]),
+        "expiringSoon": sum(1 for p in active if p.get("expiry_date") and p["expiry_date"] <= thirty_days_from_now),
+        "autoDeductToday": sum(1 for log in logs if log["type"] == "auto-deduct" and today <= log["created_at"] < tomorrow),
+        "totalValue": sum(p["current_stock"] * p["cost_price"] for p in active),
+        "categoriesCount": len({p["category"] for p in active})
+    }
+
+def rows_of(db, table, tenant):
+    return db.table(table).select("*").eq("client_id", tenant["id"]).execute().data
+
+def test_inventory_stats_match_the_per_product_totals(client, db, inventory_history):
+    tenant, headers = inventory_history
+
+    response = client.get("/api/inventory/stats", headers=headers)
+    assert response.status_code == 200
+    expected = old_inventory_stats(rows_of(db, "products", tenant), rows_of(db, "inventory_logs", tenant))
+    assert response.get_json() == pytest.approx(expected)
+    # The fixture leaves something in every total
+    assert all(expected.values())
+
+def test_summary_kept_by_the_triggers_matches_a_rebuild(db, inventory_history):
+    tenant, _ = inventory_history
+
+    def summary():
+        # Categories that emptied keep a zero row; a rebuild has none
+        categories = [row for row in rows_of(db, "inventory_category_summary", tenant) if row["product_count"]]
+        usage = [row for row in rows_of(db, "inventory_daily_usage", tenant) if row["auto_deduct_count"]]
+        return (sorted(categories, key=lambda row: row["category"]), sorted(usage, key=lambda row: row["day"]))
+
+    maintained = summary()
+    db.rpc("rebuild_inventory_summary", {"p_client_id": tenant["id"]}).execute()
+    rebuilt = summary()
+    assert maintained[1] == rebuilt[1]
+    assert [pytest.approx(row) for row in maintained[0]] == rebuilt[0]
+
+def test_inventory_stats_for_a_tenant_without_products(client, make_client, auth_headers):
+    tenant = make_client(modules={"dashboard": True, "inventory": True})
+    response = client.get("/api/inventory/stats", headers=auth_headers("inventory_manager", tenant))
+    assert response.get_json() == old_inventory_stats([], [])
@@ -0,0 +1,53 @@
+import uuid
+import pytest
+from flask import g
+from api.loader import load_related
+
+POSTGREST_MAX_ROWS = 1000
+
+@pytest.fixture
+def capped(db, monkeypatch):
+    # Cap selects like PostgREST's db-max-rows does
+    monkeypatch.setattr(db.backend, "max_rows", POSTGREST_MAX_ROWS)
+
+@pytest.fixture
+def busy_doctor(db, make_client):
+    tenant = make_client(modules={"admin": True})
+    doctor_id = str(uuid.uuid4())
+    db.table("staff").insert({
+        "id": doctor_id, "client_id": tenant["id"], "name": "Dr. Busy", "role": "doctor",
+        "department": "Medical", "branch": "Main", "email": "busy@example.com", "phone": "1",
+        "join_date": "2025-01-01", "status": "active"
+    }).execute()
+
+    db.table("appointments").insert([
+        {"client_id": tenant["id"], "doctor_id": doctor_id, "patient_id": f"patient-{i}", "status": "completed"}
+        for i in range(POSTGREST_MAX_ROWS + 200)
+    ]).execute()
+    db.table("shifts").insert([
+        {"client_id": tenant["id"], "staff_id": doctor_id, "status": "completed",
+         "start_time": "2025-01-01T09:00:00", "end_time": "2025-01-01T10:00:00"}
+        for _ in range(POSTGREST_MAX_ROWS + 100)
+    ]).execute()
+    db.table("treatment_records").insert([
+        {"client_id": tenant["id"], "performed_by_id": doctor_id, "patient_id": f"patient-{i}"}
+        for i in range(POSTGREST_MAX_ROWS + 50)
+    ]).execute()
+    return tenant, doctor_id
+
+def test_load_related_returns_rows_past_the_row_cap(app, capped, busy_doctor):
+    tenant, doctor_id = busy_doctor
+    with app.test_request_context():
+        g.tenant_id = tenant["id"]
+        grouped = load_related("appointments", "doctor_id", [doctor_id], "doctor_id, patient_id")
+    assert len(grouped[doctor_id]) == POSTGREST_MAX_ROWS + 200
+
+def test_performance_report_counts_rows_past_the_row_cap(client, capped, busy_doctor, auth_headers):
+    tenant, _ = busy_doctor
+    response = client.get("/api/admin/reports/performance", headers=auth_headers("admin", tenant))
+    assert response.status_code == 200
+
+    [doctor] = response.get_json()
+    assert doctor["patients"] == POSTGREST_MAX_ROWS + 200
+    assert doctor["hours"] == POSTGREST_MAX_ROWS + 100
+    assert doctor["procedures"] == POSTGREST_MAX_ROWS + 50
@@ -0,0 +1,54 @@
+from api import middleware
+from api.middleware import tenant_cache, unknown_tenant_cache, invalidate_tenant, load_tenant
+from api.tenants import Tenant
+
+def test_invalidate_tenant_by_client_id_drops_every_subdomain():
+    tenant_cache.clear()
+    skinova = Tenant(id="client-1", name="Skinova", subdomain="skinova")
+    tenant_cache.set("skinova", skinova)
+    tenant_cache.set("skinova-old", skinova)
+    tenant_cache.set("lasertech", Tenant(id="client-2", name="Lasertech", subdomain="lasertech"))
+
+    invalidate_tenant(client_id="client-1")
+
+    assert "skinova" not in tenant_cache
+    assert "skinova-old" not in tenant_cache
+    assert "lasertech" in tenant_cache
+
+def test_invalidate_tenant_by_subdomain():
+    tenant_cache.clear()
+    tenant_cache.set("skinova", Tenant(id="client-1", name="Skinova", subdomain="skinova"))
+    unknown_tenant_cache.set("newclinic", True)
+
+    invalidate_tenant(subdomain="skinova")
+    invalidate_tenant(subdomain="newclinic")
+
+    assert "skinova" not in tenant_cache
+    assert "newclinic" not in unknown_tenant_cache
+
+def test_unknown_subdomains_are_cached_without_evicting_tenants(app, make_client, monkeypatch):
+    tenant_cache.clear()
+    unknown_tenant_cache.clear()
+    monkeypatch.setattr(unknown_tenant_cache, "maxsize", 5)
+    clinic = make_client()
+
+    with app.app_context():
+        assert load_tenant(clinic["subdomain"]).id == clinic["id"]
+        for i in range(50):
+            assert load_tenant(f"probe-{i}") is None
+
+    assert clinic["subdomain"] in tenant_cache
+    assert len(tenant_cache) == 1
+    assert len(unknown_tenant_cache) == 5
+
+def test_unknown_subdomain_is_looked_up_once(app, db, monkeypatch):
+    unknown_tenant_cache.clear()
+    lookups = []
+    table = db.table
+    monkeypatch.setattr(middleware.db, "table", lambda name: lookups.append(name) or table(name))
+
+    with app.app_context():
+        assert load_tenant("nobody") is None
+        assert load_tenant("nobody") is None
+
+    assert lookups == ["clients"]
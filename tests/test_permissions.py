@@ -0,0 +1,27 @@
+import pytest
+
+@pytest.fixture
+def restricted_tenant(make_client):
+    return make_client(modules={"dashboard": True, "crm": True, "reception": True},
+                       role_permissions={"crm_manager": ["crm"], "receptionist": ["reception"]})
+
+def test_restricted_module_requires_a_token(client, restricted_tenant):
+    headers = {"Host": f"{restricted_tenant['subdomain']}.example.com"}
+    response = client.get("/api/crm/stats", headers=headers)
+    assert response.status_code == 401
+
+def test_restricted_module_rejects_a_garbage_token(client, restricted_tenant):
+    headers = {"Host": f"{restricted_tenant['subdomain']}.example.com",
+               "Authorization": "Bearer not-a-jwt"}
+    response = client.get("/api/crm/stats", headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()["error"] == "Invalid token"
+
+def test_restricted_module_rejects_a_role_without_the_grant(client, restricted_tenant, auth_headers):
+    response = client.get("/api/crm/stats", headers=auth_headers("receptionist", restricted_tenant))
+    assert response.status_code == 403
+    assert "receptionist" in response.get_json()["error"]
+
+def test_restricted_module_admits_a_granted_role(client, restricted_tenant, auth_headers):
+    response = client.get("/api/crm/stats", headers=auth_headers("crm_manager", restricted_tenant))
+    assert response.status_code == 200
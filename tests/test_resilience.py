@@ -0,0 +1,57 @@
+import pytest
+import httpx
+from flask import g
+from api import instrumentation, resilience
+from api.sqlite_backend import SQLiteQuery
+
+def fail_first(monkeypatch, table, failures):
+    """Make the next failures selects of table fail with a connection error"""
+    execute = SQLiteQuery.execute
+    left = {"failures": failures}
+
+    def flaky(query):
+        if query._table == table and left["failures"]:
+            left["failures"] -= 1
+            raise httpx.ConnectError("connection refused")
+        return execute(query)
+    monkeypatch.setattr(SQLiteQuery, "execute", flaky)
+    monkeypatch.setattr(resilience, "backoff", lambda attempt: 0)
+
+def test_retried_read_is_recorded_once(app, db, make_client, monkeypatch):
+    tenant = make_client(modules={"crm": True})
+    fail_first(monkeypatch, "leads", 2)
+
+    with app.test_request_context("/api/tenant", headers={"Host": "unknown.example.com"}):
+        app.preprocess_request()
+        db.table("leads").select("id").eq("client_id", tenant["id"]).execute()
+
+        [query] = [q for q in g.queries if q.table == "leads"]
+        assert (query.table, query.attempts, query.error) == ("leads", 3, None)
+
+def test_retries_do_not_count_against_the_query_budget(client, make_client, auth_headers, monkeypatch):
+    tenant = make_client(modules={"crm": True})
+    staff = auth_headers("crm_manager", tenant)
+    monkeypatch.setattr(instrumentation, "QUERY_BUDGET_MODE", "strict")
+    monkeypatch.setitem(instrumentation.QUERY_BUDGETS, "crm.get_leads", 1)
+    assert client.get("/api/crm/leads", headers=staff).status_code == 200
+
+    fail_first(monkeypatch, "leads", 2)
+    response = client.get("/api/crm/leads", headers=staff)
+    assert response.status_code == 200
+    assert '"1 calls"' in response.headers["Server-Timing"]
+
+def test_breaker_counts_one_failure_per_call(app, db, make_client, monkeypatch):
+    tenant = make_client(modules={"crm": True})
+    monkeypatch.setattr(resilience, "_breakers", {})
+    fail_first(monkeypatch, "leads", resilience.RETRY_ATTEMPTS)
+
+    with app.test_request_context("/api/tenant", headers={"Host": "unknown.example.com"}):
+        app.preprocess_request()
+        with pytest.raises(httpx.ConnectError):
+            db.table("leads").select("id").eq("client_id", tenant["id"]).execute()
+        assert resilience.breaker("leads").failures == 1
+
+        # A call that succeeds on a retry is not a failure at all
+        fail_first(monkeypatch, "leads", resilience.RETRY_ATTEMPTS - 1)
+        db.table("leads").select("id").eq("client_id", tenant["id"]).execute()
+        assert resilience.breaker("leads").failures == 0
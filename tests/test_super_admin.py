@@ -0,0 +1,29 @@
+def test_toggling_a_module_takes_effect_on_the_next_request(client, make_client, auth_headers):
+    tenant = make_client(modules={"dashboard": True, "crm": True})
+    staff = auth_headers("crm_manager", tenant)
+    super_admin = auth_headers("super_admin")
+
+    # Warm the tenant cache with CRM enabled
+    assert client.get("/api/crm/stats", headers=staff).status_code == 200
+
+    response = client.patch(f"/api/super-admin/clients/{tenant['id']}/modules",
+                            json={"module": "crm", "enabled": False}, headers=super_admin)
+    assert response.status_code == 200
+    assert "crm" not in response.get_json()["modules_enabled"]
+    assert client.get("/api/crm/stats", headers=staff).status_code == 403
+
+    client.patch(f"/api/super-admin/clients/{tenant['id']}/modules",
+                 json={"module": "crm", "enabled": True}, headers=super_admin)
+    assert client.get("/api/crm/stats", headers=staff).status_code == 200
+
+def test_setting_dashboards_updates_enabled_modules(client, make_client, auth_headers):
+    tenant = make_client(modules={"dashboard": True, "crm": True, "hr": False})
+    staff = auth_headers("crm_manager", tenant)
+    super_admin = auth_headers("super_admin")
+    assert client.get("/api/crm/stats", headers=staff).status_code == 200
+
+    response = client.patch(f"/api/super-admin/clients/{tenant['id']}/dashboards",
+                            json={"dashboards": ["hr"]}, headers=super_admin)
+    assert response.status_code == 200
+    assert sorted(response.get_json()["modules_enabled"]) == ["dashboard", "hr"]
+    assert client.get("/api/crm/stats", headers=staff).status_code == 403
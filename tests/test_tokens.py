@@ -0,0 +1,97 @@
+import json
+import time
+from types import SimpleNamespace
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from gotrue.errors import AuthApiError
+from api import tokens
+from api.tokens import InvalidToken, verify_token, verify_token_locally
+
+CURRENT_SECRET = "current-secret"
+PREVIOUS_SECRET = "previous-secret"
+
+@pytest.fixture(autouse=True)
+def rotated_secrets(monkeypatch):
+    monkeypatch.setattr(tokens, "JWT_SECRETS", [CURRENT_SECRET, PREVIOUS_SECRET])
+    monkeypatch.setattr(tokens, "AUTH_STRICT_VERIFY", False)
+    tokens.verified_tokens.clear()
+
+def claims(**overrides):
+    return {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 3600, **overrides}
+
+def hs256(secret=CURRENT_SECRET, **overrides):
+    return jwt.encode(claims(**overrides), secret, algorithm="HS256")
+
+def test_valid_token_is_verified_locally():
+    assert verify_token(hs256())["sub"] == "user-1"
+
+def test_expired_token_is_rejected():
+    with pytest.raises(InvalidToken):
+        verify_token(hs256(exp=int(time.time()) - 10))
+
+def test_wrong_audience_is_rejected():
+    with pytest.raises(InvalidToken):
+        verify_token(hs256(aud="service_role"))
+
+def test_token_signed_with_the_previous_secret_is_accepted():
+    assert verify_token(hs256(PREVIOUS_SECRET))["sub"] == "user-1"
+
+def test_token_signed_with_an_unknown_secret_is_rejected():
+    with pytest.raises(InvalidToken):
+        verify_token(hs256("some-other-secret"))
+
+@pytest.fixture
+def signing_key(monkeypatch):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    jwks = {"keys": [{**jwk, "kid": "key-1", "alg": "RS256", "use": "sig"}]}
+
+    client = jwt.PyJWKClient("http://localhost/jwks.json", cache_keys=True)
+    monkeypatch.setattr(client, "fetch_data", lambda: jwks)
+    monkeypatch.setattr(tokens, "_jwks_client", client)
+    return key
+
+def test_asymmetric_token_with_known_kid_is_accepted(signing_key):
+    token = jwt.encode(claims(), signing_key, algorithm="RS256", headers={"kid": "key-1"})
+    assert verify_token_locally(token)["sub"] == "user-1"
+
+def test_asymmetric_token_with_unknown_kid_is_rejected(signing_key):
+    token = jwt.encode(claims(), signing_key, algorithm="RS256", headers={"kid": "key-2"})
+    with pytest.raises(InvalidToken):
+        verify_token(token)
+
+@pytest.fixture
+def auth_server(monkeypatch):
+    """Stand-in for supabase.auth.get_user, recording the tokens it sees"""
+    seen = []
+
+    def get_user(token):
+        seen.append(token)
+        if token == "rejected":
+            raise AuthApiError("invalid JWT", 401)
+        return SimpleNamespace(user=SimpleNamespace(id="user-1", email="user@example.com", role="authenticated"))
+
+    monkeypatch.setattr(tokens, "supabase", SimpleNamespace(auth=SimpleNamespace(get_user=get_user)))
+    return seen
+
+def test_hs256_token_falls_back_to_remote_check_without_a_secret(monkeypatch, auth_server):
+    monkeypatch.setattr(tokens, "JWT_SECRETS", [])
+    token = hs256("secret-we-do-not-have")
+
+    assert verify_token(token)["sub"] == "user-1"
+    # The result is cached until the token expires
+    assert verify_token(token)["sub"] == "user-1"
+    assert auth_server == [token]
+
+def test_strict_mode_always_checks_remotely(monkeypatch, auth_server):
+    monkeypatch.setattr(tokens, "AUTH_STRICT_VERIFY", True)
+    token = hs256()
+
+    assert verify_token(token)["email"] == "user@example.com"
+    assert auth_server == [token]
+
+def test_remote_rejection_is_an_invalid_token(monkeypatch, auth_server):
+    monkeypatch.setattr(tokens, "AUTH_STRICT_VERIFY", True)
+    with pytest.raises(InvalidToken):
+        verify_token("rejected")